@@ -0,0 +1,67 @@
+"""
+Side-by-side parse + select time of the bs4 tree builders on saved Bestpack pages.
+
+    python benchmark_html.py listing=pages/category.html product=pages/product.html --repeat 20
+
+Selectors mirror parsers/parser_products.py and parsers/parser_characteristic_and_pictures.py.
+The match counts must be the same for every builder, otherwise a selector depends on how the
+builder repairs the markup.
+"""
+import argparse
+import time
+
+from bs4 import BeautifulSoup
+
+from utils.markup import HTML_PARSERS, resolve_html_parser
+
+SELECTORS = {
+    'listing': (
+        'ul.pagination li.pag a[href]',
+        'body > div.section.page > div:nth-child(1) > ul > li:nth-child(3) > a',
+        'div.product_item.share_item',
+        'div.product_item.share_item a.product_name',
+        'div.product_item.share_item div.product_total_price',
+        'div.product_item.share_item div.amount_block[data-type="box"]',
+        'div.product_item.share_item div.share_price span.share_price_current',
+        'div.product_item.share_item div.share_price span.share_price_old',
+        'div.product_item.share_item a.share_img',
+        'div.product_item.share_item div.product_articul',
+    ),
+    'product': (
+        'div.prod_chars_row div.prod_chars_name',
+        'div.prod_chars_row div.prod_chars_value',
+        'div.product_dots img',
+    ),
+}
+
+
+def parse_and_select(html_text: str, kind: str, builder: str) -> list:
+    soup = BeautifulSoup(html_text, builder)
+    return [len(soup.select(selector)) for selector in SELECTORS[kind]]
+
+
+def main():
+    arguments = argparse.ArgumentParser()
+    arguments.add_argument('pages', nargs='+', help='kind=path, kind is one of: ' + ', '.join(SELECTORS))
+    arguments.add_argument('--repeat', type=int, default=20)
+    args = arguments.parse_args()
+
+    builders = [name for name in HTML_PARSERS if resolve_html_parser(name) == name]
+    print(f"{'page':40} {'builder':12} {'ms/page':>10} matches")
+
+    for page in args.pages:
+        kind, path = page.split('=', 1)
+        with open(path, encoding='utf-8') as file:
+            html_text = file.read()
+
+        for builder in builders:
+            matches = parse_and_select(html_text, kind, builder)
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                parse_and_select(html_text, kind, builder)
+            elapsed = (time.perf_counter() - started) / args.repeat * 1000
+            print(f"{path[-40:]:40} {builder:12} {elapsed:10.1f} {matches}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,75 @@
+import argparse
 import asyncio
+import json
 from scrapyx import ClientFactory
+from models import Characteristic, CharacteristicName, CityPrice, Picture, PriceHistory, PriceHistoryRecord, Product
 from parsers import ParserCategory, ParserProducts, ParserCharacteristicAndPicture
+from utils import BulkLoader, CachedRequests, CharacteristicDictionary, Channel, Checkpoint, CrawlPool, DbWriter, DeltaLoader, FileStore, HtmlExecutor, HttpCache, PriceTracker, ResponseMemo, Spool, StagingLoader, configure_html_parser
 
 
 async def main():
+    arguments = argparse.ArgumentParser()
+    arguments.add_argument('--resume', action='store_true', help='continue the interrupted run from its last checkpoint')
+    args = arguments.parse_args()
 
     factory = ClientFactory(config_path='config.json')
+    with open('config.json') as file:
+        config = json.load(file)
 
     logger = factory.clients.logger
-    requests = factory.clients.requests
+    # crawl frontier of the run, --resume continues from it instead of starting over
+    checkpoint = Checkpoint(logger=logger, **config['parser']['checkpoint'])
+    if not args.resume:
+        checkpoint.reset()
+    categories = checkpoint.get('categories')
+    resume = categories is not None
+    # ETag / Last-Modified of the previous run: unchanged pages and images come back as 304
+    http_cache = HttpCache(path=config['parser']['http_cache_path'], logger=logger)
+    # pages asked for by more than one stage are fetched once per run
+    response_memo = ResponseMemo(logger=logger, max_bytes=config['parser']['response_memo_bytes'])
+    requests = CachedRequests(request_dispatcher=factory.clients.requests, cache=http_cache, logger=logger, memo=response_memo)
     postgresql_parsing = factory.clients.postgresql.postgresql_parsing
-    files = factory.clients.files
+    # products, characteristics and pictures go through COPY, the ORM client keeps the rest.
+    # delta mode upserts only new / changed rows instead of writing the full snapshot (not with the
+    # Talend job that truncates these tables after loading them, see DeltaLoader),
+    # staging mode loads a copy of the tables and swaps it in when the run is complete
+    if config['parser']['load_mode'] == 'delta':
+        bulk_loader = DeltaLoader(models=(Product, Characteristic, Picture), logger=logger, add_columns=((Characteristic, 'characteristic_id'),), **config['scrapyx']['postgresql']['parsing'])
+    elif config['parser']['load_mode'] == 'staging':
+        bulk_loader = StagingLoader(models=(Product, Characteristic, Picture), logger=logger, resume=resume, add_columns=((Characteristic, 'characteristic_id'),), **config['scrapyx']['postgresql']['parsing'])
+    else:
+        bulk_loader = BulkLoader(add_columns=((Characteristic, 'characteristic_id'),), **config['scrapyx']['postgresql']['parsing'])
+    await bulk_loader.open()
+    # the product x city price matrix is not a scrapyx table, the loader creates it. It is rebuilt by every
+    # run (the city pass is not checkpointed, --resume runs it again) in a staging copy swapped in at the
+    # end, whatever the load mode: until then readers keep the previous matrix, after it stale cells are gone
+    city_loader = StagingLoader(models=(CityPrice,), logger=logger, create_models=(CityPrice,), **config['scrapyx']['postgresql']['parsing'])
+    await city_loader.open()
+    # inserts run in the background: one buffer and flush task per table
+    db_writer = DbWriter(loader=bulk_loader, logger=logger, **config['parser']['db_writer'])
+    city_writer = DbWriter(loader=city_loader, logger=logger, **config['parser']['db_writer'])
+    # price changes against the last known prices go to the append-only history table
+    price_tracker = PriceTracker(model=PriceHistory, record=PriceHistoryRecord, loader=bulk_loader, db_writer=db_writer, logger=logger)
+    await price_tracker.open()
+    # characteristic rows carry the id of the name, new names are added page by page
+    characteristic_dictionary = CharacteristicDictionary(model=CharacteristicName, loader=bulk_loader, logger=logger)
+    await characteristic_dictionary.open()
+    # images are streamed to disk by FileStore instead of scrapyx Files.write_file
+    files = FileStore(**config['scrapyx']['files'])
+
+    # one pool per run: host limits are shared by every stage. Every stage crawls the same site and each
+    # stage has a window of its own, so per_host_limit is the only cap on the total load put on the site
+    crawl_pool = CrawlPool(**config['parser']['crawl_pool'])
+
+    # before the executors: their workers take the builder of this process
+    configure_html_parser(config['parser']['html_parser'])
+
+    # html parsing per parser: 0 workers parses on the event loop, otherwise in a process pool
+    products_executor = HtmlExecutor(workers=config['parser']['html_workers']['products'])
+    characteristic_and_pictures_executor = HtmlExecutor(workers=config['parser']['html_workers']['characteristic_and_pictures'])
+
+    # default city listing the other cities are checked against, kept on disk past the memory budget
+    default_listed = Spool(**config['parser']['spool'])
 
     parser_categories = ParserCategory(
         logger=logger,
@@ -22,25 +81,76 @@ async def main():
         logger=logger,
         request_dispatcher=requests,
         database=postgresql_parsing,
-        files=files
+        db_writer=db_writer,
+        characteristic_dictionary=characteristic_dictionary,
+        checkpoint=checkpoint,
+        files=files,
+        crawl_pool=crawl_pool,
+        html_executor=characteristic_and_pictures_executor
     )
 
     parser_product = ParserProducts(
         logger=logger,
         request_dispatcher=requests,
-        database=postgresql_parsing
+        database=postgresql_parsing,
+        db_writer=db_writer,
+        city_writer=city_writer,
+        price_tracker=price_tracker,
+        checkpoint=checkpoint,
+        crawl_pool=crawl_pool,
+        html_executor=products_executor,
+        default_listed=default_listed,
+        city_mode=config['parser']['city_mode']
     )
 
-    await postgresql_parsing.inspect_parser_status()
+    if not resume:
+        await postgresql_parsing.inspect_parser_status()
 
-    category_name_id_map = await parser_categories.parse()
-    full_category_urls = await parser_categories.extract_cities()
+        category_name_id_map = await parser_categories.parse()
+        full_category_urls = await parser_categories.extract_cities()
+        checkpoint.set('categories', {'category_name_id_map': category_name_id_map, 'full_category_urls': full_category_urls})
+    else:
+        category_name_id_map = categories['category_name_id_map']
+        full_category_urls = categories['full_category_urls']
+        # rows written after the last checkpoint are dropped, their pages are crawled again. Only products of the
+        # interrupted run are touched: the ones it wrote (intended) but did not checkpoint lose their product row,
+        # the ones not done lose their characteristics and pictures
+        intended = set(checkpoint.intended('product'))
+        products = set(checkpoint.items('product'))
+        products_done = set(checkpoint.items('product', done=True))
+        await bulk_loader.rewind(Product, 'product_url_hash', [ParserProducts.product_url_hash(url) for url in intended - products])
+        products_undone = [ParserProducts.product_url_hash(url) for url in (intended | products) - products_done]
+        await bulk_loader.rewind(Characteristic, 'product_url_hash', products_undone)
+        await bulk_loader.rewind(Picture, 'product_url_hash', products_undone)
 
-    product_urls = await parser_product.parse(category_name_id_map= category_name_id_map, full_category_urls=full_category_urls)
+    checkpoint.start(barrier=db_writer.flush)
 
-    await parser_characteristic_and_pictures.parse(product_urls=product_urls)
+    # listing -> detail -> media stages overlap, connected by bounded channels
+    product_urls = Channel(maxsize=1000)
+    await asyncio.gather(
+        parser_product.parse(category_name_id_map=category_name_id_map, full_category_urls=full_category_urls, product_urls=product_urls),
+        parser_characteristic_and_pictures.parse(product_urls=product_urls)
+    )
 
+    # every buffered row has to be in the database before the run is marked successful
+    await checkpoint.stop()
+    await db_writer.close()
+    await bulk_loader.finish()
+    await city_writer.close()
+    await city_loader.finish()
+    price_tracker.report()
+    characteristic_dictionary.report()
+    response_memo.report()
     await postgresql_parsing.parsed_successfully()
+    # the run is complete, the next --resume starts a new one
+    checkpoint.reset()
+    checkpoint.close()
+    default_listed.close()
+    http_cache.close()
+    await bulk_loader.close()
+    await city_loader.close()
+    products_executor.close()
+    characteristic_and_pictures_executor.close()
 
 if __name__ == '__main__':
     asyncio.run(main())
\ No newline at end of file
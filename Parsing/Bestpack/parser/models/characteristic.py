@@ -1,5 +1,5 @@
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import BIGINT, TEXT, INTEGER
+from sqlalchemy import BIGINT, TEXT, INTEGER, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column
 
 Base = declarative_base()
@@ -7,9 +7,13 @@ Base = declarative_base()
 class Characteristic(Base):
 
     __tablename__ = "bestpack_characteristics"
-    __table_args__ = {'schema': 'marketplaces'}
+    # conflict key of the delta load mode (DeltaLoader)
+    __table_args__ = (UniqueConstraint('product_url_hash', 'characteristic', name='bestpack_characteristics_product_url_hash_characteristic_key'), {'schema': 'marketplaces'})
 
     id: Mapped[int] = mapped_column(BIGINT, primary_key=True, autoincrement=True)
     product_url_hash: Mapped[str] = mapped_column(TEXT)
     characteristic: Mapped[str] = mapped_column(TEXT)
-    value: Mapped[str] = mapped_column(TEXT)
\ No newline at end of file
+    value: Mapped[str] = mapped_column(TEXT)
+    # id in the bestpack_characteristic_names dictionary. The name stays in characteristic for the Talend
+    # jobs that read it; tables made before the dictionary get this column in BulkLoader.open() (add_columns)
+    characteristic_id: Mapped[int] = mapped_column(INTEGER)
\ No newline at end of file
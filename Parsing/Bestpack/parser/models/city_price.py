@@ -0,0 +1,23 @@
+from typing import Optional
+
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import BIGINT, BOOLEAN, NUMERIC, TEXT, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+Base = declarative_base()
+
+
+class CityPrice(Base):
+    __tablename__ = "bestpack_city_prices"
+    # product x city matrix, sparse: no row means the city has the default (Astana) prices
+    __table_args__ = (UniqueConstraint('product_url_hash', 'city', name='bestpack_city_prices_product_url_hash_city_key'), {'schema': 'marketplaces'})
+
+    id: Mapped[int] = mapped_column(BIGINT, primary_key=True, autoincrement=True)
+    product_url_hash: Mapped[str] = mapped_column(TEXT)
+    city: Mapped[str] = mapped_column(TEXT)
+    overall_pack_price: Mapped[Optional[float]] = mapped_column(NUMERIC(10, 2), nullable=True)
+    overall_box_price: Mapped[Optional[float]] = mapped_column(NUMERIC(10, 2), nullable=True)
+    per_price: Mapped[Optional[float]] = mapped_column(NUMERIC(10, 2), nullable=True)
+    per_discount_price: Mapped[Optional[float]] = mapped_column(NUMERIC(10, 2), nullable=True)
+    # false: listed in the default city but not in this one, prices are NULL
+    available: Mapped[bool] = mapped_column(BOOLEAN)
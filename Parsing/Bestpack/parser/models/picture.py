@@ -1,5 +1,5 @@
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import TEXT, INTEGER, BIGINT
+from sqlalchemy import TEXT, INTEGER, BIGINT, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column
 
 Base = declarative_base()
@@ -7,7 +7,8 @@ Base = declarative_base()
 class Picture(Base):
 
     __tablename__ = "bestpack_pictures"
-    __table_args__ = {'schema': 'marketplaces'}
+    # conflict key of the delta load mode (DeltaLoader)
+    __table_args__ = (UniqueConstraint('product_url_hash', 'image_url', name='bestpack_pictures_product_url_hash_image_url_key'), {'schema': 'marketplaces'})
 
     id: Mapped[int] = mapped_column(BIGINT, primary_key=True, autoincrement=True)
     product_url_hash: Mapped[str] = mapped_column(TEXT)
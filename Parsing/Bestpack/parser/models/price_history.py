@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import BIGINT, NUMERIC, TEXT, TIMESTAMP, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+Base = declarative_base()
+
+
+class PriceHistory(Base):
+    __tablename__ = "bestpack_price_history"
+    # append-only: a row is written only when the prices of (product, city) changed since the last one
+    __table_args__ = (Index('bestpack_price_history_product_url_hash_city_observed_at_idx', 'product_url_hash', 'city', 'observed_at'), {'schema': 'marketplaces'})
+
+    id: Mapped[int] = mapped_column(BIGINT, primary_key=True, autoincrement=True)
+    product_url_hash: Mapped[str] = mapped_column(TEXT)
+    # NULL for sites with a single price list
+    city: Mapped[Optional[str]] = mapped_column(TEXT, nullable=True)
+    overall_pack_price: Mapped[float] = mapped_column(NUMERIC(10, 2))
+    overall_box_price: Mapped[float] = mapped_column(NUMERIC(10, 2))
+    per_price: Mapped[float] = mapped_column(NUMERIC(10, 2))
+    per_discount_price: Mapped[Optional[float]] = mapped_column(NUMERIC(10, 2), nullable=True)
+    observed_at: Mapped[datetime] = mapped_column(TIMESTAMP)
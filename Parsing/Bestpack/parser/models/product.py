@@ -1,5 +1,5 @@
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import TEXT, INTEGER, NUMERIC
+from sqlalchemy import TEXT, INTEGER, NUMERIC, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column
 
 Base = declarative_base()
@@ -7,7 +7,8 @@ Base = declarative_base()
 class Product(Base):
 
     __tablename__ = "bestpack_products"
-    __table_args__ = {'schema': 'marketplaces'}
+    # conflict key of the delta load mode (DeltaLoader)
+    __table_args__ = (UniqueConstraint('product_url_hash', name='bestpack_products_product_url_hash_key'), {'schema': 'marketplaces'})
 
     product_id: Mapped[int] = mapped_column(INTEGER, primary_key=True, autoincrement=True)
     source_code: Mapped[str] = mapped_column(TEXT, nullable=True)
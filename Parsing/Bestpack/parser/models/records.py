@@ -0,0 +1,50 @@
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+
+# Rows of the extraction layer. Field order is the column order of the table (without the
+# autoincrement id), so a record is handed to BulkLoader.copy_records as is.
+
+class ProductRecord(NamedTuple):
+    source_code: Optional[str]
+    title: str
+    category_id: int
+    overall_pack_price: float
+    overall_box_price: float
+    per_price: float
+    per_discount_price: Optional[float]
+    product_url: str
+    product_url_hash: str
+
+
+class CharacteristicRecord(NamedTuple):
+    product_url_hash: str
+    characteristic: str
+    value: str
+    characteristic_id: int
+
+
+class PictureRecord(NamedTuple):
+    product_url_hash: str
+    image_url: str
+    path: str
+
+
+class PriceHistoryRecord(NamedTuple):
+    product_url_hash: str
+    city: Optional[str]
+    overall_pack_price: float
+    overall_box_price: float
+    per_price: float
+    per_discount_price: Optional[float]
+    observed_at: datetime
+
+
+class CityPriceRecord(NamedTuple):
+    product_url_hash: str
+    city: str
+    overall_pack_price: Optional[float]
+    overall_box_price: Optional[float]
+    per_price: Optional[float]
+    per_discount_price: Optional[float]
+    available: bool
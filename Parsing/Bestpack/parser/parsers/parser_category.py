@@ -2,26 +2,27 @@ from logging import Logger
 
 from bs4 import Tag
 from scrapyx.base import BaseScraperSync
-from scrapyx.clients import Requests, PostgreSQL
+from scrapyx.clients import PostgreSQL
 from scrapyx.utils import normalize_text
 
 from models import Category
+from utils import CachedRequests, html_parser
 
 class ParserCategory(BaseScraperSync):
     URL = "https://bestpack.kz/products"
 
-    def __init__(self, request_dispatcher: Requests, logger: Logger, database: PostgreSQL):
-        self.request_dispatcher: Requests = request_dispatcher
+    def __init__(self, request_dispatcher: CachedRequests, logger: Logger, database: PostgreSQL):
+        self.request_dispatcher: CachedRequests = request_dispatcher
         self.logger: Logger = logger
         self.db: PostgreSQL = database
         self.category_links_without_city = []
 
     async def parse(self) -> dict:
-        async with self.request_dispatcher.get(self.URL) as response:
-            if not response.ok:
-                self.logger.exception(f"Failed to get categories from  {response.URL}: {response.status}")
-            html_text = await response.text()
-
+        # extract_cities reads the same page, the run's response memo fetches it once
+        html_text = await self.request_dispatcher.get_text(self.URL, shared=True)
+        if html_text is None:
+            self.logger.error(f"Failed to get categories from {self.URL}")
+            return {}
 
         category_name_id_map = {}
         categories_name = await self.extract_categories(html_text=html_text, category_name_id_map=category_name_id_map)
@@ -33,12 +34,12 @@ class ParserCategory(BaseScraperSync):
 
 
     async def extract_cities(self) -> list:
-        async with self.request_dispatcher.get(self.URL) as response:
-            if not response.ok:
-                self.logger.exception(f"Failed to get categories from  {response.URL}: {response.status}")
-            html_text = await response.text()
+        html_text = await self.request_dispatcher.get_text(self.URL, shared=True)
+        if html_text is None:
+            self.logger.error(f"Failed to get cities from {self.URL}")
+            return []
 
-        soup = self.get_bs4_object(content=html_text, markup='html.parser')
+        soup = self.get_bs4_object(content=html_text, markup=html_parser())
         # default city : Astana (Nur-Sultan)
         full_category_urls = []
         for category in self.category_links_without_city:
@@ -60,7 +61,7 @@ class ParserCategory(BaseScraperSync):
         return full_category_urls
 
     async def extract_categories(self, html_text: str, category_name_id_map: dict) -> list:
-        soup = self.get_bs4_object(content=html_text, markup='html.parser')
+        soup = self.get_bs4_object(content=html_text, markup=html_parser())
         # take elements
         category_elements = soup.select("ul.catalog_cats_list > li")
         if not category_elements:
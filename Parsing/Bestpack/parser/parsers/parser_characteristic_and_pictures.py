@@ -2,41 +2,50 @@ import asyncio
 import hashlib
 import re
 import uuid
+from functools import partial
 from pathlib import Path
 from logging import Logger, raiseExceptions
 from urllib.parse import urlparse
 from uuid import NAMESPACE_URL
-from typing import Optional
-from scrapyx.clients import Requests, Files, PostgreSQL
+from typing import AsyncIterable, Optional
+from bs4 import BeautifulSoup
+from aiohttp import ClientResponse
+from scrapyx.clients import PostgreSQL
 from scrapyx.base import BaseScraperSync
-from models import Characteristic, Picture, Source
+from models import Characteristic, CharacteristicRecord, Picture, PictureRecord, Source
+from utils import CachedRequests, CharacteristicDictionary, Channel, Checkpoint, CrawlPool, DbWriter, DigestSet, ExtractionError, FileStore, HtmlExecutor, html_parser
 from scrapyx.utils import normalize_text
 
 class ParserCharacteristicAndPicture(BaseScraperSync):
     BATCH_SIZE_ASYNC = 20
-    BATCH_SIZE_INSERT = 500
+    QUEUE_SIZE = 1000
     SOURCE_NAME = "Bestpack"
 
-    def __init__(self, request_dispatcher: Requests, logger: Logger, database: PostgreSQL, files: Files):
-        self.request_dispatcher: Requests = request_dispatcher
+    def __init__(self, request_dispatcher: CachedRequests, logger: Logger, database: PostgreSQL, db_writer: DbWriter, characteristic_dictionary: CharacteristicDictionary, checkpoint: Checkpoint, files: FileStore, crawl_pool: CrawlPool, html_executor: HtmlExecutor):
+        self.request_dispatcher: CachedRequests = request_dispatcher
         self.logger: Logger = logger
         self.db: PostgreSQL = database
-        self.file = files
-        self.unique_urls = set()
-        self.all_pictures = []
-
-    async def parse(self, product_urls: list) -> None:
-        if not product_urls:
-            self.logger.error("No product URLs provided for characteristic and pictures extraction.")
-            return None
-
-        # characteristic
-        await self.extract_characteristic(product_urls)
-        self.logger.info(f"Characteristics extracted successfully.")
+        self.db_writer: DbWriter = db_writer
+        self.characteristic_dictionary: CharacteristicDictionary = characteristic_dictionary
+        self.checkpoint: Checkpoint = checkpoint
+        self.file: FileStore = files
+        self.crawl_pool: CrawlPool = crawl_pool
+        self.html_executor: HtmlExecutor = html_executor
+        self.unique_urls = DigestSet()
+        # product url -> pictures still to be written, the product is done in the checkpoint at 0
+        self.pictures_left = {}
+
+    async def parse(self, product_urls: AsyncIterable[str]) -> None:
+        source_folder = await self.find_source_id()
+        if not source_folder:
+            raise Exception(f"Source '{self.SOURCE_NAME}' not found in the database.")
 
-        # pictures
-        await self.parse_pictures(self.all_pictures)
-        self.all_pictures.clear()
+        # pictures are downloaded while characteristic pages are still being parsed
+        pictures = Channel(maxsize=self.QUEUE_SIZE)
+        await asyncio.gather(
+            self.extract_characteristic(product_urls, pictures=pictures),
+            self.parse_pictures(pictures_info=pictures, source_folder=source_folder)
+        )
 
         # Info
         self.logger.info(f"Characteristics and Pictures parsed successfully and inserted into database!")
@@ -44,99 +53,110 @@ class ParserCharacteristicAndPicture(BaseScraperSync):
         return None
 
 
-    async def extract_characteristic(self, product_links: list) -> None:
-        if not product_links:
-            self.logger.error("No product links provided for characteristic and pictures extraction.")
-            return None
+    async def extract_characteristic(self, product_links: AsyncIterable[str], pictures: Channel) -> None:
+        products_parsed = 0
 
-        product_characteristics = []
+        try:
+            async for url, product_char, product_pictures in self.crawl_pool.imap(self.parse_single_product, product_links, window=self.BATCH_SIZE_ASYNC):
+                products_parsed += 1
+                # rows are flushed in the background, the crawl only waits when the buffer is full
+                await self.db_writer.put_many(Characteristic, product_char)
 
-        for i in range(0, len(product_links), self.BATCH_SIZE_ASYNC):
-            batch = product_links[i : i + self.BATCH_SIZE_ASYNC]
+                if not product_pictures:
+                    self.checkpoint.done('product', url)
+                    continue
 
-            tasks = [self.parse_single_product(link) for link in batch]
-            products_chars = await asyncio.gather(*tasks)
+                self.pictures_left[url] = len(product_pictures)
+                for picture in product_pictures:
+                    await pictures.put({**picture, 'product_url': url})
+        finally:
+            await pictures.close()
 
-            for product_char in products_chars:
-                if product_char:
-                    product_characteristics.extend(product_char)
+        if not products_parsed:
+            self.logger.error("No product links provided for characteristic and pictures extraction.")
 
-            if len(product_characteristics) >= self.BATCH_SIZE_INSERT:
-                await self.db.insert_batch(product_characteristics)
-                product_characteristics.clear()
 
-        if product_characteristics:
-            await self.db.insert_batch(product_characteristics)
+        self.logger.info(f"Characteristics extracted successfully.")
         return None
 
-    async def parse_single_product(self, url: str) -> list:
+    async def parse_single_product(self, url: str) -> tuple[str, list, list]:
         try:
-            async with self.request_dispatcher.get(url) as response:
-                if not response.ok:
-                    self.logger.warning(f"Failed to get product {url} with status {response.status}")
-                    return []
-                html_text = await response.text()
-
-            soup = self.get_bs4_object(content=html_text, markup='html.parser')
-
-            # product_hash_id
-            product_hash_pattern = re.sub(r'.*(?=/products/)', '', url)
-            product_url_hash = self.hash_string(string=product_hash_pattern)
-            if not product_url_hash:
-                self.logger.error(f"Failed to extract product hash ID from {url}")
-                return []
-
-            # take product characteristics
-            take_characteristics = soup.select("div.prod_chars_row")
-            if not take_characteristics:
-                self.logger.error(f"Failed to get product characteristics {url}")
-                return []
-
-            product_characteristics = []
-            check_duplicate = set()
-
-            for characteristic in take_characteristics:
-                key = characteristic.select_one("div.prod_chars_name")
-                value = characteristic.select_one("div.prod_chars_value")
-
-                if not key or not value or not key.text or not value.text:
-                    continue
+            html_text = await self.request_dispatcher.get_text(url)
+            if html_text is None:
+                return url, [], []
+
+            page = await self.html_executor.run(self.extract_product, html_text=html_text, url=url)
+            for message in page['warnings']:
+                self.logger.error(message)
+
+            characteristic_ids = await self.characteristic_dictionary.intern([key for key, _ in page['characteristics']])
+            product_characteristics = [
+                CharacteristicRecord(page['product_url_hash'], name, value, characteristic_id)
+                for characteristic_id, (name, value) in zip(characteristic_ids, page['characteristics'])
+            ]
+            return url, product_characteristics, page['pictures']
+        except ExtractionError as e:
+            self.logger.error(str(e))
+            return url, [], []
+        except Exception as e:
+            self.logger.exception(f"Error while parsing product {url}: {e}")
+            return url, [], []
 
-                key_text = normalize_text(text=key.text, case='u')
-                value_text = normalize_text(text=value.text, case='u')
+    @staticmethod
+    def extract_product(html_text: str, url: str) -> dict:
+        """Runs in the html executor: plain fields only, Characteristic is built by the caller."""
+        soup = BeautifulSoup(html_text, html_parser())
+        warnings = []
+
+        # product_hash_id
+        product_hash_pattern = re.sub(r'.*(?=/products/)', '', url)
+        product_url_hash = ParserCharacteristicAndPicture.hash_string(string=product_hash_pattern)
+        if not product_url_hash:
+            raise ExtractionError(f"Failed to extract product hash ID from {url}")
+
+        # take product characteristics
+        take_characteristics = soup.select("div.prod_chars_row")
+        if not take_characteristics:
+            raise ExtractionError(f"Failed to get product characteristics {url}")
 
-                key_text = key_text.replace(':', '')
+        product_characteristics = []
+        check_duplicate = set()
 
-                if key_text in check_duplicate or value_text == '-':
-                    continue
+        for characteristic in take_characteristics:
+            key = characteristic.select_one("div.prod_chars_name")
+            value = characteristic.select_one("div.prod_chars_value")
 
-                product_characteristics.append(Characteristic(
-                    product_url_hash=product_url_hash,
-                    characteristic=key_text,
-                    value=value_text
-                ))
-                check_duplicate.add(key_text)
-
-            # take images
-            image_link = soup.select("div.product_dots img")
-            if not image_link:
-                self.logger.error(f"Failed to get product images {url}")
-                return product_characteristics
-
-            for image in image_link:
-                curr_image = image.get('src')
-                if not curr_image:
-                    continue
+            if not key or not value or not key.text or not value.text:
+                continue
 
-                self.all_pictures.append({
-                    "product_url_hash": product_url_hash,
-                    "image_url": f"https://bestpack.kz/{curr_image}"
-                })
+            key_text = normalize_text(text=key.text, case='u')
+            value_text = normalize_text(text=value.text, case='u')
 
-            return product_characteristics
-        except Exception as e:
-            self.logger.exception(f"Error while parsing product {url}: {e}")
-            return []
+            key_text = key_text.replace(':', '')
+
+            if key_text in check_duplicate or value_text == '-':
+                continue
+
+            product_characteristics.append((key_text, value_text))
+            check_duplicate.add(key_text)
+
+        # take images
+        pictures_info = []
+        image_link = soup.select("div.product_dots img")
+        if not image_link:
+            warnings.append(f"Failed to get product images {url}")
+
+        for image in image_link:
+            curr_image = image.get('src')
+            if not curr_image:
+                continue
+
+            pictures_info.append({
+                "product_url_hash": product_url_hash,
+                "image_url": f"https://bestpack.kz/{curr_image}"
+            })
+
+        return {'product_url_hash': product_url_hash, 'characteristics': product_characteristics, 'pictures': pictures_info, 'warnings': warnings}
 
     @staticmethod
     def hash_string(string, algorithm="sha256") -> Optional[str]:
@@ -148,44 +168,30 @@ class ParserCharacteristicAndPicture(BaseScraperSync):
         return hasher.hexdigest()
 
     # picture part
-    async def parse_pictures(self, pictures_info: list) -> None:
-        if not pictures_info:
-            self.logger.exception("No pictures to process.")
-            return None
+    async def parse_pictures(self, pictures_info: AsyncIterable[dict], source_folder: str) -> None:
+        process_picture = partial(self.process_picture, source_folder=source_folder)
 
-        tasks = []
-        pictures = []
+        async for product_url, picture in self.crawl_pool.imap(process_picture, pictures_info, window=self.BATCH_SIZE_ASYNC, key=lambda pic: pic.get('image_url')):
+            if picture:
+                await self.db_writer.put(Picture, picture)
 
-        source_folder = await self.find_source_id()
-        if not source_folder:
-            raise Exception(f"Source '{self.SOURCE_NAME}' not found in the database.")
-
-        for pic in pictures_info:
-            product_url_hash = pic.get('product_url_hash')
-            image_url = pic.get('image_url')
-            if not product_url_hash or not image_url or not isinstance(product_url_hash, str):
-                self.logger.error(f"Invalid product code or image URL or trash image: {product_url_hash}, {image_url}")
-                continue
-
-            ext = Path(urlparse(image_url).path).suffix if Path(urlparse(image_url).path).suffix else '.jpg'
-
-            tasks.append(self.process_file(source_folder=source_folder, product_url_hash=product_url_hash, url=image_url, extension=ext))
-
-            if len(tasks) >= self.BATCH_SIZE_ASYNC:
-                pictures += await self.filter_urls(await asyncio.gather(*tasks, return_exceptions=True))
-                tasks.clear()
+            self.pictures_left[product_url] -= 1
+            if not self.pictures_left[product_url]:
+                del self.pictures_left[product_url]
+                self.checkpoint.done('product', product_url)
 
-            if len(pictures) >= self.BATCH_SIZE_INSERT:
-                await self.db.insert_batch(pictures)
-                pictures.clear()
+        return None
 
-        if tasks:
-            pictures += await self.filter_urls(await asyncio.gather(*tasks))
+    async def process_picture(self, pic: dict, source_folder: str) -> tuple[str, Optional[PictureRecord]]:
+        product_url_hash = pic.get('product_url_hash')
+        image_url = pic.get('image_url')
+        if not product_url_hash or not image_url or not isinstance(product_url_hash, str):
+            self.logger.error(f"Invalid product code or image URL or trash image: {product_url_hash}, {image_url}")
+            return pic['product_url'], None
 
-        if pictures:
-            await self.db.insert_batch(pictures)
+        ext = Path(urlparse(image_url).path).suffix if Path(urlparse(image_url).path).suffix else '.jpg'
 
-        return None
+        return pic['product_url'], await self.process_file(source_folder=source_folder, product_url_hash=product_url_hash, url=image_url, extension=ext)
 
     async def find_source_id(self) -> Optional[str]:
         sources = await self.db.select_all(Source)
@@ -194,21 +200,17 @@ class ParserCharacteristicAndPicture(BaseScraperSync):
                 return str(source.id)
         return None
 
-    async def process_file(self, source_folder: str,product_url_hash: str, url: str, extension: str) -> Optional[Picture]:
+    async def process_file(self, source_folder: str,product_url_hash: str, url: str, extension: str) -> Optional[PictureRecord]:
         try:
-            async with self.request_dispatcher.get(url=url, raise_on_status=False, log_info=False) as response:
-                if response.status != 200:
-                    return None
-                content = await response.read()
-
-            # build the path and download the file
-            path = await self.download_file(source_folder=source_folder, product_url_hash=product_url_hash, extension=extension, content=content)
+            # build the path and stream the file to disk, 304 reuses the path of the previous run
+            save = partial(self.download_file, source_folder=source_folder, product_url_hash=product_url_hash, extension=extension)
+            path = await self.request_dispatcher.download(url=url, save=save, reuse=self.file.exists, log_info=False)
 
             if not path or path in self.unique_urls:
                 return None
 
             self.unique_urls.add(path)
-            return Picture(
+            return PictureRecord(
                 product_url_hash=product_url_hash,
                 image_url=url,
                 path=path
@@ -217,21 +219,15 @@ class ParserCharacteristicAndPicture(BaseScraperSync):
             self.logger.exception(f"Failed to process file {url}: {e}")
             return None
 
-    async def download_file(self, source_folder: str, product_url_hash: str, extension: str, content: [str | bytes]) -> Optional[str]:
+    async def download_file(self, source_folder: str, product_url_hash: str, extension: str, response: ClientResponse) -> Optional[str]:
         folder = await self.__generate_uuid(product_url_hash)
-        filename = await self.__generate_uuid(str(content))
-        path = await self.file.write_file(
-            filename=str(f"{filename}{extension}"),
+        path = await self.file.save(
+            response=response,
             path=f"{source_folder}/{folder}",
-            content=content,
-            return_type='r'
+            extension=extension
         )
         return path
 
     @staticmethod
     async def __generate_uuid(name: str) -> str:
-        return str(uuid.uuid5(namespace=NAMESPACE_URL, name=name))
-
-    @staticmethod
-    async def filter_urls(urls: list):
-        return [u for u in urls if u]
\ No newline at end of file
+        return str(uuid.uuid5(namespace=NAMESPACE_URL, name=name))
\ No newline at end of file
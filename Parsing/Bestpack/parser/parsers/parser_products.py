@@ -1,168 +1,347 @@
-import asyncio
 import hashlib
+from functools import partial
 import re
 from logging import Logger
 from typing import Optional
 
-from scrapyx.clients import Requests, PostgreSQL
+from bs4 import BeautifulSoup
+from scrapyx.clients import PostgreSQL
 from scrapyx.utils import normalize_text
 from scrapyx.base import BaseScraperSync
 
-from models import Product
+from models import CityPrice, CityPriceRecord, Product, ProductRecord
+from utils import CachedRequests, Channel, Checkpoint, CrawlPool, DbWriter, DigestSet, HtmlExecutor, PriceTracker, Spool, html_parser
 
 
 class ParserProducts(BaseScraperSync):
     BATCH_SIZE_ASYNC = 10
-    BATCH_SIZE_INSERT = 500
     URL = "https://bestpack.kz"
+    # category pages without a city prefix show the Astana prices
+    DEFAULT_CITY = "nur-sultan"
+    PRICE_FIELDS = ('overall_pack_price', 'overall_box_price', 'per_price', 'per_discount_price')
 
-    def __init__(self, request_dispatcher: Requests, logger: Logger, database: PostgreSQL):
-        self.request_dispatcher: Requests = request_dispatcher
+    def __init__(self, request_dispatcher: CachedRequests, logger: Logger, database: PostgreSQL, db_writer: DbWriter, city_writer: DbWriter, price_tracker: PriceTracker, checkpoint: Checkpoint, crawl_pool: CrawlPool, html_executor: HtmlExecutor, default_listed: Spool, city_mode: str = 'differential'):
+        self.request_dispatcher: CachedRequests = request_dispatcher
         self.logger: Logger = logger
         self.db: PostgreSQL = database
-        self.check_product_url_for_duplicate = set()
+        self.db_writer: DbWriter = db_writer
+        # price matrix cells, written to the staging copy the run swaps in
+        self.city_writer: DbWriter = city_writer
+        self.price_tracker: PriceTracker = price_tracker
+        self.checkpoint: Checkpoint = checkpoint
+        self.crawl_pool: CrawlPool = crawl_pool
+        self.html_executor: HtmlExecutor = html_executor
+        self.check_product_url_for_duplicate = DigestSet()
+        self.seen_pages = DigestSet()
+        # differential: the default city is crawled in full, the other cities only where they differ from it;
+        # full: no mirror shortcut, every category of every city goes through the city pass in full
+        self.city_mode: str = city_mode
+        self.seed_pages = set()
+        # city-free path of a category -> (url path, prices) of its first page in the default city
+        self.first_pages: dict = {}
+        # (category_id, hash) of every default city card, as long as the catalog, spilled to disk past the budget
+        self.default_listed: Spool = default_listed
+        # city -> hashes listed on the crawled pages of the city
+        self.city_listed: dict = {}
+        # (city, category_id) of the categories taken as mirrors / crawled in full
+        self.mirrored: set = set()
+        self.divergent: set = set()
+        # url path of a default city listing page -> its category_id, tells the category of a city page that failed
+        self.page_categories: dict = {}
+        # (city, category_id) of the city pages that could not be read, category_id None when it is not known
+        self.failed: set = set()
+
+    async def parse(self, category_name_id_map: dict, full_category_urls: list, product_urls: Channel) -> None:
+        try:
+            if not full_category_urls or not category_name_id_map:
+                raise Exception("No full_category_urls or category_name_id_map provided, exiting.")
+
+            # parsing products, every product url goes to the next stage as soon as it is found
+            await self.extract_products(category_link=full_category_urls, product_category_id=category_name_id_map, product_urls=product_urls)
+        finally:
+            await product_urls.close()
 
-    async def parse(self, category_name_id_map: dict, full_category_urls: list) -> list:
-        if not full_category_urls or not category_name_id_map:
-            raise Exception("No full_category_urls or category_name_id_map provided, exiting.")
+        return None
 
-        all_links = await self.extract_pages(full_category_urls=full_category_urls)
+    async def extract_pages(self, pages: list) -> list:
+        new_pages = []
+        for full_url in pages:
+            if full_url not in self.seen_pages:
+                self.seen_pages.add(full_url)
+                new_pages.append(full_url)
+                self.logger.info(f"Added new page to the list: {full_url}")
 
-        # parsing products
-        full_product_urls = []
-        await self.extract_products(category_link=all_links,product_category_id=category_name_id_map, full_product_urls=full_product_urls)
+        return new_pages
 
-        # return product_url
-        return list(set(full_product_urls))
+    async def extract_products(self, category_link: list, product_category_id: dict, product_urls: Channel) -> None:
+        self.logger.info("Starting to extract products...")
+        # the other cities are compared against the default one, so they come second in both modes:
+        # prices and matrix cells of a city are taken before its products are deduplicated
+        default_link = [page for page in category_link if self.city_of(page) == self.DEFAULT_CITY]
+        city_link = [page for page in category_link if self.city_of(page) != self.DEFAULT_CITY]
+        self.seed_pages.update(category_link)
+
+        seeds = await self.restore(product_urls=product_urls)
+        if seeds is None:
+            seeds = default_link
+            self.checkpoint.add('listing', default_link)
+        self.seen_pages.update(category_link)
+        parse_category = partial(self.parse_single_category, product_category_id=product_category_id)
+
+        # pagination found on a page is scheduled into the same window right away
+        async for page, products, next_pages, reference in self.crawl_pool.crawl(parse_category, seeds, window=self.BATCH_SIZE_ASYNC):
+            self.checkpoint.intend('product', [product.product_url for product in products])
+            for product in products:
+                await self.db_writer.put(Product, product)
+                await product_urls.put(product.product_url)
+                self.checkpoint.add('product', [product.product_url])
 
-    async def extract_pages(self, full_category_urls: list) -> list:
-        self.logger.info("Starting to extract pages...")
-        all_pages = full_category_urls.copy()
-        seen = set(all_pages)
+            # the page is done once its products are handed off, so both land in the same checkpoint; its
+            # reference for the city pass goes with it, a resumed run compares the cities against it too
+            self.checkpoint.add('listing', next_pages)
+            self.checkpoint.done('listing', page, result=reference)
 
-        for category_url in full_category_urls:
-            async with self.request_dispatcher.get(category_url) as response:
-                if not response.ok:
-                    self.logger.error(f"Failed to fetch page {category_url}: {response.status}")
-                    continue
-                html_text = await response.text()
+        if city_link:
+            await self.crawl_cities(city_link=city_link, product_category_id=product_category_id, product_urls=product_urls)
+
+        # Info
+        self.logger.info("Products extracted and inserted into the database successfully!")
+        return None
 
-            soup = self.get_bs4_object(content=html_text, markup='html.parser')
+    async def restore(self, product_urls: Channel) -> Optional[list]:
+        """On --resume: the pending listing pages to start from, None for a fresh run."""
+        known_pages = self.checkpoint.items('listing')
+        if not known_pages:
+            return None
 
-            pag_items = soup.select('ul.pagination li.pag a[href]')
-            if not pag_items:
-                continue
+        self.seen_pages.update(known_pages)
+        self.check_product_url_for_duplicate.update(self.url_path(url) for url in self.checkpoint.items('product'))
+        # products found before the crash whose detail page was not finished
+        pending_products = self.checkpoint.items('product', done=False)
+        for url in pending_products:
+            await product_urls.put(url)
 
-            for a_tag in pag_items:
-                href = a_tag.get('href')
-                if not href:
-                    continue
-                full_url = f"{self.URL}{href}"
+        references = 0
+        for page, reference in self.checkpoint.results('listing'):
+            self.keep_reference(page, reference)
+            references += 1
 
-                if full_url not in seen:
-                    seen.add(full_url)
-                    all_pages.append(full_url)
-                    self.logger.info(f"Added new page to the list: {full_url}")
+        pending_pages = self.checkpoint.items('listing', done=False)
+        self.logger.info(f"Resuming: {len(pending_pages)} of {len(known_pages)} listing pages and {len(pending_products)} product pages left, {references} city pass references restored")
+        return pending_pages
 
-        return all_pages
+    async def parse_single_category(self, page: str, product_category_id: dict) -> tuple[tuple[str, list, list, Optional[dict]], list]:
+        try :
+            html_text = await self.request_dispatcher.get_text(page)
+            if html_text is None:
+                return (page, [], [], None), []
 
-    async def extract_products(self, category_link: list, product_category_id: dict, full_product_urls: list) -> None:
-        self.logger.info("Starting to extract products...")
-        all_products = []
-        #  0 -> left_index    len(product_pages) -> size  self.BATCH_SIZE_ASYNC -> range to jump
-        for i in range(0, len(category_link), self.BATCH_SIZE_ASYNC):
-            batch_pages = category_link[i: i + self.BATCH_SIZE_ASYNC]
-            tasks = [self.parse_single_category(page=page, product_category_id=product_category_id, full_product_urls=full_product_urls) for page in batch_pages]
-            products = await asyncio.gather(*tasks)
+            listing = await self.html_executor.run(self.extract_listing, html_text=html_text, page=page)
+            for message in listing['warnings']:
+                self.logger.warning(message)
+
+            next_pages = await self.extract_pages(pages=listing['pages'])
+            products = await self.build_products(category_name=listing['category_name'], cards=listing['cards'], product_category_id=product_category_id)
 
             for product in products:
-                if product:
-                    all_products.extend(product)
+                await self.price_tracker.observe(product, city=self.DEFAULT_CITY)
+
+            # what the other cities are compared against
+            category_id = product_category_id.get(listing['category_name'])
+            reference = {
+                'category_id': category_id,
+                'signature': self.signature(listing['cards']) if page in self.seed_pages else None,
+                'listed': [self.product_url_hash(card['product_url']) for card in listing['cards']] if category_id else []
+            }
+            self.keep_reference(page, reference)
+
+            return (page, products, next_pages, reference), next_pages
+        except Exception as e:
+            self.logger.error(f"Error while parsing single category {page}: {e}")
+            return (page, [], [], None), []
+
+    def keep_reference(self, page: str, reference: dict) -> None:
+        # signatures read back from the checkpoint are JSON lists, the comparison is made on tuples
+        if reference['signature'] is not None:
+            self.first_pages[self.url_path(page)] = tuple((path, tuple(prices)) for path, prices in reference['signature'])
+        self.page_categories[self.url_path(page)] = reference['category_id']
+        if reference['category_id']:
+            self.default_listed.extend((reference['category_id'], product_url_hash) for product_url_hash in reference['listed'])
+
+    async def crawl_cities(self, city_link: list, product_category_id: dict, product_urls: Channel) -> None:
+        """
+        Second pass over the other cities. A city category whose first page lists the same products at the
+        same prices as the default city is taken as a mirror and its pagination is not fetched; the others are
+        crawled in full and only the cells that differ from the default city go to the price matrix. In full
+        city_mode no category is taken as a mirror.
+        Not checkpointed: --resume runs this pass again from the start, against the default city pages of
+        the checkpoint.
+        """
+        parse_city = partial(self.parse_city_page, product_category_id=product_category_id)
+        async for page, products in self.crawl_pool.crawl(parse_city, city_link, window=self.BATCH_SIZE_ASYNC):
+            # products that are not listed in the default city at all
+            self.checkpoint.intend('product', [product.product_url for product in products])
+            for product in products:
+                await self.db_writer.put(Product, product)
+                await product_urls.put(product.product_url)
+                self.checkpoint.add('product', [product.product_url])
 
-            if len(all_products) >= self.BATCH_SIZE_INSERT:
-                await self.db.insert_batch(all_products)
-                all_products.clear()
+        unavailable = self.find_unavailable()
+        for product_url_hash, city in unavailable:
+            await self.city_writer.put(CityPrice, CityPriceRecord(product_url_hash, city, None, None, None, None, False))
 
-        if all_products:
-            await self.db.insert_batch(all_products)
-        # Info
-        self.logger.info("Products extracted and inserted into the database successfully!")
+        self.logger.info(f"Cities: {len(self.mirrored)} of {len(city_link)} categories mirror the default city, {len(self.divergent)} crawled, {len(unavailable)} products unavailable")
+        if self.failed:
+            self.logger.warning(f"Cities: {len(self.failed)} categories with unreadable pages, no product is marked unavailable in them")
         return None
 
-    async def parse_single_category(self, page: str, product_category_id: dict, full_product_urls: list) -> list:
+    def find_unavailable(self) -> set:
+        """
+        (hash, city) of products listed in a category that differs in the city and seen nowhere in it.
+        A category with a page that failed is left out, its products may just be on the missing page.
+        """
+        # a failed page of an unknown category leaves out the whole city
+        unknown = {city for city, category_id in self.failed if category_id is None}
+        unavailable = set()
+        for category_id, product_url_hash in self.default_listed:
+            for city, listed in self.city_listed.items():
+                if city in unknown or (city, category_id) in self.failed:
+                    continue
+                if (city, category_id) in self.divergent and product_url_hash not in listed:
+                    unavailable.add((product_url_hash, city))
+
+        # a product of a mirrored category is available there, whatever its other categories show
+        for category_id, product_url_hash in self.default_listed:
+            for city in self.city_listed:
+                if (city, category_id) in self.mirrored:
+                    unavailable.discard((product_url_hash, city))
+        return unavailable
+
+    async def parse_city_page(self, page: str, product_category_id: dict) -> tuple[tuple[str, list], list]:
         try :
-            async with self.request_dispatcher.get(page) as response:
-                if not response.ok:
-                    self.logger.error(f"Failed to fetch page {page}: {response.status}")
-                    return []
-                html_text = await response.text()
+            html_text = await self.request_dispatcher.get_text(page)
+            if html_text is None:
+                self.city_page_failed(page)
+                return (page, []), []
+
+            listing = await self.html_executor.run(self.extract_listing, html_text=html_text, page=page)
+            for message in listing['warnings']:
+                self.logger.warning(message)
+
+            city = self.city_of(page)
+            category_id = product_category_id.get(listing['category_name'])
+            if self.city_mode == 'differential' and page in self.seed_pages and self.first_pages.get(self.url_path(page)) == self.signature(listing['cards']):
+                self.mirrored.add((city, category_id))
+                return (page, []), []
+
+            if category_id:
+                self.divergent.add((city, category_id))
+            listed = self.city_listed.setdefault(city, DigestSet())
+            for card in listing['cards']:
+                product_url_hash = self.product_url_hash(card['product_url'])
+                # one matrix cell per (product, city), whatever the number of categories listing it
+                if product_url_hash in listed:
+                    continue
+                listed.add(product_url_hash)
+
+                record = CityPriceRecord(product_url_hash, city, *(card[name] for name in self.PRICE_FIELDS), True)
+                await self.price_tracker.observe(record, city=city)
+                if self.price_tracker.last.get((product_url_hash, self.DEFAULT_CITY)) != self.price_tracker.normalize(record[2:-1]):
+                    await self.city_writer.put(CityPrice, record)
+
+            next_pages = await self.extract_pages(pages=listing['pages'])
+            products = await self.build_products(category_name=listing['category_name'], cards=listing['cards'], product_category_id=product_category_id)
+            return (page, products), next_pages
+        except Exception as e:
+            self.logger.error(f"Error while parsing single category {page}: {e}")
+            self.city_page_failed(page)
+            return (page, []), []
+
+    def city_page_failed(self, page: str) -> None:
+        # a category missing a page can't be told apart from one that stopped listing the products
+        self.failed.add((self.city_of(page), self.page_categories.get(self.url_path(page))))
 
-            soup = self.get_bs4_object(content=html_text, markup='html.parser')
+    def signature(self, cards: list) -> tuple:
+        return tuple((self.url_path(card['product_url']), self.price_tracker.normalize([card[name] for name in self.PRICE_FIELDS])) for card in cards)
 
+    @staticmethod
+    def city_of(page: str) -> str:
+        city = re.match(rf'{re.escape(ParserProducts.URL)}/([^/?]+)/products/', page)
+        return city.group(1) if city else ParserProducts.DEFAULT_CITY
+
+    @staticmethod
+    def extract_listing(html_text: str, page: str) -> dict:
+        """Runs in the html executor: plain fields only, dedup and Product are done by the caller."""
+        soup = BeautifulSoup(html_text, html_parser())
+        warnings = []
+
+        pages = [f"{ParserProducts.URL}{a_tag.get('href')}" for a_tag in soup.select('ul.pagination li.pag a[href]') if a_tag.get('href')]
+        category_name, cards = ParserProducts.extract_cards(soup=soup, page=page, warnings=warnings)
+
+        return {'pages': pages, 'category_name': category_name, 'cards': cards, 'warnings': warnings}
+
+    @staticmethod
+    def extract_cards(soup: BeautifulSoup, page: str, warnings: list) -> tuple[Optional[str], list]:
+        try :
             # 1. category name
             category_link = soup.select_one("body > div.section.page > div:nth-child(1) > ul > li:nth-child(3) > a")
             if not category_link or not category_link.text:
-                self.logger.warning(f"No category link found for page {page}")
-                return []
+                warnings.append(f"No category link found for page {page}")
+                return None, []
 
             category_name = normalize_text(text=category_link.text, case='u') if category_link else None
 
             if not category_name:
-                self.logger.error(f"Failed to extract category name from page {page}")
-                return []
-
-            category_id = product_category_id.get(category_name)
-            if not category_id:
-                self.logger.warning(f"Category '{category_name}' not found in product_category_id")
-                return []
+                warnings.append(f"Failed to extract category name from page {page}")
+                return None, []
 
             # 2. find cards with products
             card_blocks = soup.select("div.product_item.share_item")
             if not card_blocks:
-                self.logger.warning(f"No product cards found on page {page}")
-                return []
+                warnings.append(f"No product cards found on page {page}")
+                return category_name, []
 
-            products = []
+            cards = []
 
             for card_block in card_blocks:
                 # 1. title
                 title_tag = card_block.select_one('a.product_name')
                 if not title_tag or not title_tag.text:
-                    self.logger.warning(f"No title found for source_id: {card_block}")
+                    warnings.append(f"No title found for source_id: {card_block}")
                     continue
                 title = normalize_text(text=title_tag.text, case='u')
 
                 # 2. overall pack price
                 overall_pack_price = card_block.select_one('div.product_total_price')
                 if not overall_pack_price or not overall_pack_price.text:
-                    self.logger.warning(f"No overall pack price found! name product: {title}")
+                    warnings.append(f"No overall pack price found! name product: {title}")
                     continue
 
                 overall_pack_price = overall_pack_price.text.replace('тг', '').strip()
                 if not overall_pack_price:
-                    self.logger.warning(f"No overall pack price found for product: {title}")
+                    warnings.append(f"No overall pack price found for product: {title}")
                     continue
 
                 # 3. overall box price
                 overall_box_price = card_block.select_one('div.amount_block[data-type="box"]')
                 if not overall_box_price:
-                    self.logger.warning(f"No overall box price found for product: {title}")
+                    warnings.append(f"No overall box price found for product: {title}")
 
                 overall_box_price = overall_box_price.get('data-box-price') or None
                 if not overall_box_price:
-                    self.logger.warning(f"No overall box price found for product: {title}")
+                    warnings.append(f"No overall box price found for product: {title}")
                     continue
 
                 # 4. per price curr
                 per_price = card_block.select_one('div.share_price span.share_price_current')
                 if not per_price or not per_price.text:
-                    self.logger.warning(f"No per price found for product : {title}")
+                    warnings.append(f"No per price found for product : {title}")
                     continue
                 per_price = per_price.text.strip()
 
                 per_price = re.search(r'\d+', per_price).group(0)
                 if not per_price:
-                    self.logger.warning(f"No overall pack price found for product: {title}")
+                    warnings.append(f"No overall pack price found for product: {title}")
                     continue
 
                 # 5. per discount price
@@ -181,19 +360,7 @@ class ParserProducts(BaseScraperSync):
                 # 6. link to product
                 product_url = card_block.select_one('a.share_img').get('href')
                 if not product_url:
-                    self.logger.warning(f"No product URL found for product: {title}")
-                    continue
-
-                # Check for duplicates in product URLs
-                product_url_check = re.sub(r'.*(?=/products/)', '', product_url)
-                if product_url_check in self.check_product_url_for_duplicate or not product_url_check:
-                    continue
-                self.check_product_url_for_duplicate.add(product_url_check)
-
-                # Product URL hash
-                product_url_hash = self.hash_string(string=product_url_check)
-                if not product_url_hash:
-                    self.logger.error(f"Failed to hash product URL: {product_url_check}")
+                    warnings.append(f"No product URL found for product: {title}")
                     continue
 
                 # 7. source_code
@@ -203,25 +370,61 @@ class ParserProducts(BaseScraperSync):
                 else:
                     source_code = None
 
-                product = Product(
-                    source_code=source_code,
-                    title=title,
-                    category_id=category_id,
-                    overall_pack_price = float(overall_pack_price),
-                    overall_box_price=float(overall_box_price),
-                    per_price=float(per_price),
-                    per_discount_price=per_discount_price,
-                    product_url=f"{self.URL}{product_url}",
-                    product_url_hash = product_url_hash
-                )
-                products.append(product)
-                full_product_urls.append(f"{self.URL}{product_url}")
-
-            return products
+                cards.append({
+                    'source_code': source_code,
+                    'title': title,
+                    'overall_pack_price': float(overall_pack_price),
+                    'overall_box_price': float(overall_box_price),
+                    'per_price': float(per_price),
+                    'per_discount_price': float(per_discount_price) if per_discount_price is not None else None,
+                    'product_url': product_url
+                })
+
+            return category_name, cards
         except Exception as e:
-            self.logger.error(f"Error while parsing single category {page}: {e}")
+            warnings.append(f"Error while parsing single category {page}: {e}")
+            return None, []
+
+    async def build_products(self, category_name: Optional[str], cards: list, product_category_id: dict) -> list:
+        if not category_name:
+            return []
+
+        category_id = product_category_id.get(category_name)
+        if not category_id:
+            self.logger.warning(f"Category '{category_name}' not found in product_category_id")
             return []
 
+        products = []
+        for card in cards:
+            # Check for duplicates in product URLs
+            product_url_check = self.url_path(card['product_url'])
+            if product_url_check in self.check_product_url_for_duplicate or not product_url_check:
+                continue
+            self.check_product_url_for_duplicate.add(product_url_check)
+
+            # Product URL hash
+            product_url_hash = self.hash_string(string=product_url_check)
+            if not product_url_hash:
+                self.logger.error(f"Failed to hash product URL: {product_url_check}")
+                continue
+
+            products.append(ProductRecord(
+                **{**card, 'product_url': f"{self.URL}{card['product_url']}"},
+                category_id=category_id,
+                product_url_hash=product_url_hash
+            ))
+
+        return products
+
+    @staticmethod
+    def url_path(url: str) -> str:
+        # the city prefix is cut: a product, or a listing page, is the same in every city
+        return re.sub(r'.*(?=/products/)', '', url)
+
+    @staticmethod
+    def product_url_hash(product_url: str) -> Optional[str]:
+        return ParserProducts.hash_string(string=ParserProducts.url_path(product_url))
+
     @staticmethod
     def hash_string(string, algorithm="sha256") -> Optional[str]:
         if not isinstance(string, str):
@@ -0,0 +1,73 @@
+import asyncio
+
+from utils import Checkpoint
+
+
+def checkpoint(tmp_path, logger) -> Checkpoint:
+    return Checkpoint(path=str(tmp_path / 'state' / 'checkpoint.sqlite'), logger=logger)
+
+
+def commit(checkpoint: Checkpoint) -> list:
+    barriers = []
+
+    async def barrier():
+        barriers.append(True)
+
+    checkpoint.barrier = barrier
+    asyncio.run(checkpoint.commit())
+    return barriers
+
+
+def test_marks_are_written_only_on_commit(tmp_path, logger):
+    state = checkpoint(tmp_path, logger)
+    state.add('listing', ['page-1', 'page-2'])
+    state.done('listing', 'page-1')
+    assert state.items('listing') == []
+
+    assert commit(state) == [True]
+    assert state.items('listing') == ['page-1', 'page-2']
+    assert state.items('listing', done=True) == ['page-1']
+    assert state.items('listing', done=False) == ['page-2']
+
+
+def test_intent_is_written_right_away(tmp_path, logger):
+    # what --resume rewinds: products written (intended) but not in the frontier yet
+    state = checkpoint(tmp_path, logger)
+    state.intend('product', ['a', 'b'])
+    state.add('product', ['a'])
+    state.close()
+
+    state = checkpoint(tmp_path, logger)
+    assert state.intended('product') == ['a', 'b']
+    assert state.items('product') == []
+
+    commit(state)
+    assert set(state.intended('product')) - set(state.items('product')) == {'a', 'b'}
+
+
+def test_results_come_back_after_a_restart(tmp_path, logger):
+    state = checkpoint(tmp_path, logger)
+    reference = {'category_id': 7, 'signature': (('/products/a', (12.5, None)),), 'listed': ['hash-a']}
+    state.add('listing', ['page-1', 'page-2'])
+    state.done('listing', 'page-1', result=reference)
+    state.done('listing', 'page-2')
+    commit(state)
+    state.close()
+
+    state = checkpoint(tmp_path, logger)
+    assert list(state.results('listing')) == [('page-1', {'category_id': 7, 'signature': [['/products/a', [12.5, None]]], 'listed': ['hash-a']})]
+
+
+def test_reset_starts_a_new_run(tmp_path, logger):
+    state = checkpoint(tmp_path, logger)
+    state.set('categories', {'full_category_urls': ['page-1']})
+    state.intend('product', ['a'])
+    state.add('listing', ['page-1'])
+    state.done('listing', 'page-1', result={'category_id': 7})
+    commit(state)
+
+    state.reset()
+    assert state.get('categories') is None
+    assert state.intended('product') == []
+    assert state.items('listing') == []
+    assert list(state.results('listing')) == []
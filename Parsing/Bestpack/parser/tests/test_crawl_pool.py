@@ -0,0 +1,115 @@
+import asyncio
+
+from utils import CrawlPool
+
+
+class Probe:
+    """Coroutine that records how many of its calls run at the same time."""
+
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+
+    async def __call__(self, item):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.001)
+        self.running -= 1
+        return item
+
+
+def collect(iterator) -> list:
+    async def run():
+        return [result async for result in iterator]
+    return asyncio.run(run())
+
+
+def test_imap_keeps_the_window_full():
+    probe = Probe()
+    results = collect(CrawlPool(window=4).imap(probe, range(20)))
+
+    assert sorted(results) == list(range(20))
+    assert probe.peak == 4
+
+
+def test_call_window_overrides_the_default():
+    probe = Probe()
+    collect(CrawlPool(window=4).imap(probe, range(20), window=2))
+
+    assert probe.peak == 2
+
+
+def test_imap_reads_async_iterators():
+    async def items():
+        for item in range(5):
+            yield item
+
+    assert sorted(collect(CrawlPool().imap(Probe(), items()))) == list(range(5))
+
+
+def test_windows_of_concurrent_stages_add_up():
+    pool = CrawlPool(window=4)
+    probe = Probe()
+
+    async def stage(chunk):
+        return [result async for result in pool.imap(probe, chunk)]
+
+    async def run():
+        return await asyncio.gather(stage(range(10)), stage(range(10, 20)))
+
+    asyncio.run(run())
+    assert probe.peak == 8
+
+
+def test_per_host_limit_is_shared_by_the_stages():
+    pool = CrawlPool(window=4, per_host_limit=3)
+    probe = Probe()
+    urls = [f'https://example.kz/{index}' for index in range(12)]
+
+    async def stage(chunk):
+        return [result async for result in pool.imap(probe, chunk)]
+
+    async def run():
+        # two stages of the same pool: 4 + 4 in their windows, at most 3 on the host
+        return await asyncio.gather(stage(urls[:6]), stage(urls[6:]))
+
+    first, second = asyncio.run(run())
+    assert sorted(first + second) == sorted(urls)
+    assert probe.peak == 3
+
+
+def test_crawl_schedules_follow_ups():
+    async def page(number):
+        # page 1 links to 2 and 3, the others link nowhere
+        await asyncio.sleep(0)
+        return number, [2, 3] if number == 1 else []
+
+    assert sorted(collect(CrawlPool(window=2).crawl(page, [1]))) == [1, 2, 3]
+
+
+def test_an_exception_ends_the_call_and_cancels_the_others():
+    # the contract the parsers rely on: func catches per item, anything it lets through ends the stage
+    cancelled = []
+
+    async def page(number):
+        try:
+            if number == 0:
+                # once the window is full
+                await asyncio.sleep(0.01)
+                raise ValueError('broken page')
+            await asyncio.sleep(1)
+            return number
+        except asyncio.CancelledError:
+            cancelled.append(number)
+            raise
+
+    async def run():
+        return [result async for result in CrawlPool(window=3).imap(page, range(10))]
+
+    try:
+        asyncio.run(run())
+    except ValueError as e:
+        assert str(e) == 'broken page'
+    else:
+        raise AssertionError('the exception of func was swallowed')
+    assert sorted(cancelled) == [1, 2]
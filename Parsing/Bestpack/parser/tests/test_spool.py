@@ -0,0 +1,46 @@
+import os
+
+from utils import Spool
+
+
+def test_small_runs_stay_in_memory(tmp_path):
+    spool = Spool(max_items=10, directory=str(tmp_path))
+    spool.extend(range(5))
+
+    assert list(spool) == [0, 1, 2, 3, 4]
+    assert len(spool) == 5
+    assert spool.connection is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_spilled_items_come_back_in_append_order(tmp_path):
+    spool = Spool(max_items=3, directory=str(tmp_path))
+    spool.extend(range(8))
+
+    assert list(spool) == list(range(8))
+    assert len(spool) == 8
+    assert spool.spilled == 6
+    assert len(spool.items) == 2
+
+
+def test_tuples_come_back_as_lists(tmp_path):
+    spool = Spool(max_items=2, directory=str(tmp_path))
+    spool.extend([(7, 'hash-a'), (7, 'hash-b'), (8, 'hash-c')])
+
+    assert [tuple(item) for item in spool] == [(7, 'hash-a'), (7, 'hash-b'), (8, 'hash-c')]
+
+
+def test_batches_cover_every_item(tmp_path):
+    spool = Spool(max_items=4, directory=str(tmp_path))
+    spool.extend(range(10))
+
+    assert list(spool.batches(3)) == [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9]]
+
+
+def test_close_removes_the_spill_file(tmp_path):
+    spool = Spool(max_items=2, directory=str(tmp_path))
+    spool.extend(range(5))
+    assert len(os.listdir(tmp_path)) == 1
+
+    spool.close()
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,16 @@
+from .bulk_loader import BulkLoader
+from .channel import Channel
+from .characteristic_dictionary import CharacteristicDictionary
+from .checkpoint import Checkpoint
+from .crawl_pool import CrawlPool
+from .db_writer import DbWriter
+from .delta_loader import DeltaLoader
+from .digest_set import DigestSet
+from .file_store import FileStore
+from .html_executor import ExtractionError, HtmlExecutor
+from .http_cache import CachedRequests, HttpCache
+from .markup import configure_html_parser, html_parser
+from .price_tracker import PriceTracker
+from .response_memo import ResponseMemo
+from .spool import Spool
+from .staging_loader import StagingLoader
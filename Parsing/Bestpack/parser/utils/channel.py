@@ -0,0 +1,28 @@
+import asyncio
+from typing import Any
+
+
+class Channel:
+    """
+    Bounded asyncio.Queue between two pipeline stages. put() blocks while the consumer is behind,
+    so memory is capped by `maxsize` instead of catalog size. Single consumer, iterate with `async for`.
+    """
+    _CLOSED = object()
+
+    def __init__(self, maxsize: int = 1000):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    async def put(self, item: Any) -> None:
+        await self._queue.put(item)
+
+    async def close(self) -> None:
+        await self._queue.put(self._CLOSED)
+
+    def __aiter__(self) -> 'Channel':
+        return self
+
+    async def __anext__(self) -> Any:
+        item = await self._queue.get()
+        if item is self._CLOSED:
+            raise StopAsyncIteration
+        return item
@@ -0,0 +1,120 @@
+import asyncio
+import json
+import os
+import sqlite3
+from logging import Logger
+from typing import Any, Awaitable, Callable, Iterable, Iterator, Optional
+
+
+class Checkpoint:
+    """
+    Crash-safe crawl frontier in SQLite: stage data plus pending / done items per kind. Marks are kept
+    in memory and written every `interval` seconds; each commit first awaits `barrier` (DbWriter.flush),
+    so everything a checkpoint calls done is already in the database. Items whose rows are about to be
+    written are recorded right away with intend(), --resume rewinds the rows of the ones not checkpointed.
+    done() can attach a JSON result to an item, committed with its mark and read back with results().
+    """
+
+    def __init__(self, path: str, logger: Logger, interval: float = 60.0):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.logger: Logger = logger
+        self.interval: float = interval
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS frontier ('
+            'kind TEXT NOT NULL, item TEXT NOT NULL, done INTEGER NOT NULL, PRIMARY KEY (kind, item))'
+        )
+        self.connection.execute('CREATE TABLE IF NOT EXISTS intent (kind TEXT NOT NULL, item TEXT NOT NULL, PRIMARY KEY (kind, item))')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS result (kind TEXT NOT NULL, item TEXT NOT NULL, value TEXT NOT NULL, PRIMARY KEY (kind, item))')
+        self.connection.commit()
+        # marks of the next commit
+        self.added: list = []
+        self.completed: list = []
+        self.barrier: Optional[Callable[[], Awaitable[None]]] = None
+        self.ticker: Optional[asyncio.Task] = None
+        self.lock: asyncio.Lock = asyncio.Lock()
+
+    def reset(self) -> None:
+        with self.connection:
+            self.connection.execute('DELETE FROM state')
+            self.connection.execute('DELETE FROM frontier')
+            self.connection.execute('DELETE FROM intent')
+            self.connection.execute('DELETE FROM result')
+
+    def get(self, key: str) -> Any:
+        row = self.connection.execute('SELECT value FROM state WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any) -> None:
+        # stage results are written right away, they are not tied to buffered rows
+        with self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)', (key, json.dumps(value)))
+
+    def items(self, kind: str, done: Optional[bool] = None) -> list:
+        if done is None:
+            rows = self.connection.execute('SELECT item FROM frontier WHERE kind = ? ORDER BY rowid', (kind,))
+        else:
+            rows = self.connection.execute('SELECT item FROM frontier WHERE kind = ? AND done = ? ORDER BY rowid', (kind, int(done)))
+        return [row[0] for row in rows]
+
+    def intend(self, kind: str, items: Iterable[str]) -> None:
+        # committed before the rows go to the DbWriter, unlike add(): a crash can't hide a written row
+        with self.connection:
+            self.connection.executemany('INSERT OR IGNORE INTO intent (kind, item) VALUES (?, ?)', ((kind, item) for item in items))
+
+    def intended(self, kind: str) -> list:
+        return [row[0] for row in self.connection.execute('SELECT item FROM intent WHERE kind = ? ORDER BY rowid', (kind,))]
+
+    def results(self, kind: str) -> Iterator[tuple[str, Any]]:
+        for item, value in self.connection.execute('SELECT item, value FROM result WHERE kind = ? ORDER BY rowid', (kind,)):
+            yield item, json.loads(value)
+
+    def add(self, kind: str, items: Iterable[str]) -> None:
+        self.added.extend((kind, item) for item in items)
+
+    def done(self, kind: str, item: str, result: Any = None) -> None:
+        self.completed.append((kind, item, result))
+
+    def start(self, barrier: Callable[[], Awaitable[None]]) -> None:
+        self.barrier = barrier
+        self.ticker = asyncio.create_task(self.__tick())
+
+    async def stop(self) -> None:
+        if self.ticker is not None:
+            self.ticker.cancel()
+            await asyncio.gather(self.ticker, return_exceptions=True)
+            self.ticker = None
+
+    async def commit(self) -> None:
+        async with self.lock:
+            # marks made while waiting on the barrier belong to the next commit
+            added, self.added = self.added, []
+            completed, self.completed = self.completed, []
+            await self.barrier()
+
+            with self.connection:
+                self.connection.executemany('INSERT OR IGNORE INTO frontier (kind, item, done) VALUES (?, ?, 0)', added)
+                self.connection.executemany(
+                    'INSERT INTO frontier (kind, item, done) VALUES (?, ?, 1) ON CONFLICT (kind, item) DO UPDATE SET done = 1',
+                    ((kind, item) for kind, item, _ in completed)
+                )
+                self.connection.executemany(
+                    'INSERT OR REPLACE INTO result (kind, item, value) VALUES (?, ?, ?)',
+                    ((kind, item, json.dumps(result)) for kind, item, result in completed if result is not None)
+                )
+            self.logger.info(f"Checkpoint: {len(added)} items added, {len(completed)} done")
+
+    def close(self) -> None:
+        self.connection.close()
+
+    async def __tick(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.commit()
+            except Exception as e:
+                # the marks of this commit are lost, their items are crawled again on resume
+                self.logger.error(f"Failed to write checkpoint: {e}")
@@ -0,0 +1,142 @@
+import asyncio
+import time
+from logging import Logger
+from typing import Iterable, Optional
+
+from .bulk_loader import BulkLoader
+
+
+class TableBuffer:
+    def __init__(self, model, max_pending_batches: int):
+        self.model = model
+        self.rows: list = []
+        self.last_flush: float = time.monotonic()
+        # full batches waiting for COPY; put() blocks only when this is full
+        self.batches: asyncio.Queue = asyncio.Queue(maxsize=max_pending_batches)
+        self.task: Optional[asyncio.Task] = None
+        self.rows_written: int = 0
+        self.flushes: int = 0
+        self.flush_seconds: float = 0.0
+        self.max_flush_seconds: float = 0.0
+
+
+class DbWriter:
+    """
+    Background writer on top of BulkLoader. Every table has its own buffer and flush task: rows are
+    collected until `batch_size` or `flush_interval` seconds, then the batch is handed to the task
+    and a new buffer starts filling. Tables are written in parallel over the loader's pool and the
+    crawler only waits when `max_pending_batches` batches of a table are already queued.
+    """
+    _CLOSED = object()
+
+    def __init__(self, loader: BulkLoader, logger: Logger, batch_size: int = 500, flush_interval: float = 5.0, max_pending_batches: int = 4):
+        self.loader: BulkLoader = loader
+        self.logger: Logger = logger
+        self.batch_size: int = batch_size
+        self.flush_interval: float = flush_interval
+        self.max_pending_batches: int = max_pending_batches
+        self.tables: dict = {}
+        self.error: Optional[BaseException] = None
+        self.started: float = time.monotonic()
+        self.ticker: Optional[asyncio.Task] = None
+
+    async def put(self, model, record: tuple) -> None:
+        table = self.__table(model)
+        table.rows.append(record)
+        if len(table.rows) >= self.batch_size:
+            await self.__hand_off(table)
+
+    async def put_many(self, model, records: Iterable[tuple]) -> None:
+        for record in records:
+            await self.put(model, record)
+
+    async def flush(self) -> None:
+        """Hands off every buffer and waits until all queued batches are written."""
+        for table in list(self.tables.values()):
+            await self.__hand_off(table)
+        for table in list(self.tables.values()):
+            await table.batches.join()
+        self.__raise_if_failed()
+
+    async def close(self) -> None:
+        """Flushes what is left, waits for every table and logs the write stats."""
+        if self.ticker is not None:
+            self.ticker.cancel()
+
+        for table in self.tables.values():
+            await self.__hand_off(table)
+            await table.batches.put(self._CLOSED)
+
+        await asyncio.gather(*(table.task for table in self.tables.values()))
+        self.__raise_if_failed()
+        self.report()
+
+    def report(self) -> None:
+        elapsed = time.monotonic() - self.started
+        for table in self.tables.values():
+            average = table.flush_seconds / table.flushes if table.flushes else 0.0
+            self.logger.info(
+                f"{table.model.__tablename__}: {table.rows_written} rows in {table.flushes} flushes, "
+                f"avg flush {average * 1000:.0f} ms, max {table.max_flush_seconds * 1000:.0f} ms, "
+                f"{table.rows_written / elapsed if elapsed else 0:.0f} rows/s over the run"
+            )
+
+    def __table(self, model) -> TableBuffer:
+        self.__raise_if_failed()
+        if model not in self.tables:
+            table = TableBuffer(model=model, max_pending_batches=self.max_pending_batches)
+            table.task = asyncio.create_task(self.__flush_loop(table))
+            self.tables[model] = table
+            if self.ticker is None:
+                self.ticker = asyncio.create_task(self.__tick())
+        return self.tables[model]
+
+    async def __hand_off(self, table: TableBuffer) -> None:
+        if not table.rows:
+            return None
+        batch, table.rows = table.rows, []
+        table.last_flush = time.monotonic()
+        await table.batches.put(batch)
+
+    async def __flush_loop(self, table: TableBuffer) -> None:
+        while True:
+            batch = await table.batches.get()
+            if batch is self._CLOSED:
+                table.batches.task_done()
+                return None
+            try:
+                await self.__write(table, batch)
+            finally:
+                # flush() waits on join()
+                table.batches.task_done()
+
+    async def __write(self, table: TableBuffer, batch: list) -> None:
+        # after a failure keep draining, so producers blocked in put() wake up and see the error
+        if self.error is not None:
+            return None
+
+        started = time.monotonic()
+        try:
+            table.rows_written += await self.loader.copy_records(table.model, batch)
+        except Exception as e:
+            self.logger.error(f"Failed to write {len(batch)} rows into {table.model.__tablename__}: {e}")
+            self.error = e
+            return None
+
+        spent = time.monotonic() - started
+        table.flushes += 1
+        table.flush_seconds += spent
+        table.max_flush_seconds = max(table.max_flush_seconds, spent)
+
+    async def __tick(self) -> None:
+        # time threshold: slow stages don't keep a half-full buffer in memory for the whole run
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            now = time.monotonic()
+            for table in list(self.tables.values()):
+                if table.rows and now - table.last_flush >= self.flush_interval:
+                    await self.__hand_off(table)
+
+    def __raise_if_failed(self) -> None:
+        if self.error is not None:
+            raise RuntimeError("DbWriter stopped after a failed flush") from self.error
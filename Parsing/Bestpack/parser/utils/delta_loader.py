@@ -0,0 +1,153 @@
+import hashlib
+from decimal import Decimal
+from logging import Logger
+from typing import Iterable, Sequence
+
+from sqlalchemy import UniqueConstraint
+
+from .bulk_loader import BulkLoader
+
+
+class DeltaLoader(BulkLoader):
+    """
+    Delta load mode: rows are upserted with INSERT ... ON CONFLICT on the model's unique key, and a
+    row whose fingerprint equals the stored one is not sent at all. Fingerprints of the live tables
+    are read once in open(), so write volume follows the number of changes, not the catalog size.
+    Rows that disappeared from the site are not deleted. Tables outside `models` (the append-only price
+    history) are written with a plain COPY, like BulkLoader does.
+
+    Not for tables a Talend job truncates after consuming them (the *_job TRUNCATE step of the snapshot
+    setup): the next run finds them empty, fingerprints nothing and sends every row again, and the rows
+    kept "because they are unchanged" are gone. Use delta mode only with jobs that read the tables in place.
+    """
+
+    def __init__(self, models: Iterable, logger: Logger, **connection):
+        super().__init__(**connection)
+        self.models: tuple = tuple(models)
+        self.logger: Logger = logger
+        # model -> {key tuple: 8-byte digest of the row}
+        self.fingerprints: dict = {}
+        self.skipped: dict = {}
+
+    async def open(self) -> None:
+        await super().open()
+        for model in self.models:
+            await self.ensure_key(model)
+            self.fingerprints[model] = await self.load_fingerprints(model)
+            self.skipped[model] = 0
+            self.logger.info(f"{model.__tablename__}: {len(self.fingerprints[model])} stored rows fingerprinted")
+            if not self.fingerprints[model]:
+                self.logger.warning(f"{model.__tablename__} is empty: every row is sent again. If a Talend job truncates it, delta mode saves nothing, use snapshot")
+
+    async def close(self) -> None:
+        for model, skipped in self.skipped.items():
+            self.logger.info(f"{model.__tablename__}: {skipped} unchanged rows not sent")
+        await super().close()
+
+    async def rewind(self, model, column: str, drop: Iterable[str]) -> int:
+        if model not in self.models:
+            return await super().rewind(model, column, drop)
+        # upserts are idempotent and the tables hold earlier runs, nothing to roll back
+        return 0
+
+    @staticmethod
+    def key(model) -> tuple:
+        for constraint in model.__table__.constraints:
+            if isinstance(constraint, UniqueConstraint):
+                return tuple(column.name for column in constraint.columns)
+        return tuple(column.name for column in model.__table__.primary_key.columns)
+
+    @staticmethod
+    def fingerprint(values: Sequence) -> bytes:
+        # NUMERIC(10, 2) comes back as Decimal, the parsers produce floats
+        normalized = tuple(round(float(value), 2) if isinstance(value, (float, Decimal)) else value for value in values)
+        return hashlib.blake2b(repr(normalized).encode('utf-8'), digest_size=8).digest()
+
+    async def ensure_key(self, model) -> None:
+        """
+        Unique index the upserts conflict on, built CONCURRENTLY so the live table keeps taking writes.
+        A table with duplicate keys is refused before the build: the index could not be created and the
+        upserts would have nothing to conflict on.
+        """
+        table = model.__table__
+        target = f'{table.schema}.{table.name}'
+        for constraint in table.constraints:
+            if not isinstance(constraint, UniqueConstraint):
+                continue
+
+            key = [column.name for column in constraint.columns]
+            columns = ', '.join(key)
+            async with self.pool.acquire() as connection:
+                valid = await connection.fetchval('SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass($1)', f'{table.schema}.{constraint.name}')
+                if valid:
+                    continue
+                if valid is False:
+                    # left behind by an interrupted concurrent build
+                    await connection.execute(f'DROP INDEX CONCURRENTLY {table.schema}.{constraint.name}')
+
+                # NULL keys never conflict, they can't break the index
+                duplicates = await connection.fetch(
+                    f'SELECT {columns}, count(*) AS copies FROM {target} WHERE {" AND ".join(f"{column} IS NOT NULL" for column in key)} '
+                    f'GROUP BY {columns} HAVING count(*) > 1 ORDER BY count(*) DESC LIMIT 5'
+                )
+                if duplicates:
+                    examples = '; '.join(f"{tuple(row[column] for column in key)} x{row['copies']}" for row in duplicates)
+                    raise ValueError(f"{target} has duplicate ({columns}) keys, e.g. {examples}. Delta mode needs them unique: deduplicate the table or use load_mode snapshot")
+
+                self.logger.info(f"{target}: building unique index {constraint.name} ({columns})")
+                # outside a transaction: asyncpg runs a bare execute() in autocommit
+                await connection.execute(f'CREATE UNIQUE INDEX CONCURRENTLY {constraint.name} ON {target} ({columns})')
+
+    async def load_fingerprints(self, model) -> dict:
+        table = model.__table__
+        columns = self.columns(model)
+        key_index = [columns.index(column) for column in self.key(model)]
+
+        fingerprints = {}
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                async for row in connection.cursor(f'SELECT {", ".join(columns)} FROM {table.schema}.{table.name}', prefetch=10000):
+                    values = tuple(row)
+                    fingerprints[tuple(values[index] for index in key_index)] = self.fingerprint(values)
+        return fingerprints
+
+    async def copy_records(self, model, records: Sequence[tuple]) -> int:
+        if model not in self.models:
+            return await super().copy_records(model, records)
+        if not records:
+            return 0
+
+        columns = self.check_fields(model, records[0])
+        key = self.key(model)
+        key_index = [columns.index(column) for column in key]
+        fingerprints = self.fingerprints[model]
+
+        # last row per key wins, ON CONFLICT can't touch the same row twice in one statement
+        changed = {}
+        for record in records:
+            record_key = tuple(record[index] for index in key_index)
+            digest = self.fingerprint(record)
+            if fingerprints.get(record_key) == digest:
+                self.skipped[model] += 1
+                continue
+            fingerprints[record_key] = digest
+            changed[record_key] = record
+
+        if not changed:
+            return 0
+
+        table = model.__table__
+        target = f'{table.schema}.{table.name}'
+        staging = f'delta_{table.name}'
+        column_list = ', '.join(columns)
+        updates = ', '.join(f'{column} = EXCLUDED.{column}' for column in columns if column not in key)
+
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                await connection.execute(f'CREATE TEMP TABLE {staging} (LIKE {target} INCLUDING DEFAULTS) ON COMMIT DROP')
+                await connection.copy_records_to_table(staging, records=list(changed.values()), columns=columns)
+                await connection.execute(
+                    f'INSERT INTO {target} ({column_list}) SELECT {column_list} FROM {staging} '
+                    f'ON CONFLICT ({", ".join(key)}) DO UPDATE SET {updates}'
+                )
+        return len(changed)
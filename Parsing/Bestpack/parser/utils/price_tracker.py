@@ -0,0 +1,71 @@
+from datetime import datetime
+from decimal import Decimal
+from logging import Logger
+from typing import Optional, Sequence
+
+from .bulk_loader import BulkLoader
+from .db_writer import DbWriter
+
+
+class PriceTracker:
+    """
+    Price change log. The last known prices of every (product key, city) are read from the history
+    table once in open(); observe() compares a product against them and queues a history row through
+    the DbWriter only when a price moved. The record layout is (key, city, *prices, observed_at) and
+    the price fields are taken from the product record by name.
+    """
+
+    def __init__(self, model, record, loader: BulkLoader, db_writer: DbWriter, logger: Logger):
+        self.model = model
+        self.record = record
+        self.loader: BulkLoader = loader
+        self.db_writer: DbWriter = db_writer
+        self.logger: Logger = logger
+        self.key: str = record._fields[0]
+        self.prices: tuple = record._fields[2:-1]
+        # (key, city) -> normalized prices of the last history row
+        self.last: dict = {}
+        # one timestamp per run, a price trend is read run by run
+        self.observed_at: Optional[datetime] = None
+        self.observed: int = 0
+        self.changes: int = 0
+
+    async def open(self) -> None:
+        table = self.model.__table__
+        prices = ', '.join(self.prices)
+
+        await self.loader.create_table(self.model)
+        async with self.loader.pool.acquire() as connection:
+            async with connection.transaction():
+                query = (
+                    f'SELECT DISTINCT ON ({self.key}, city) {self.key}, city, {prices} FROM {table.schema}.{table.name} '
+                    f'ORDER BY {self.key}, city, observed_at DESC, id DESC'
+                )
+                async for row in connection.cursor(query, prefetch=10000):
+                    self.last[(row[0], row[1])] = self.normalize(tuple(row)[2:])
+
+        self.observed_at = datetime.now()
+        self.logger.info(f"{table.name}: last prices of {len(self.last)} products loaded")
+
+    async def observe(self, product: tuple, city: Optional[str] = None) -> None:
+        key = getattr(product, self.key)
+        if key is None:
+            return None
+
+        self.observed += 1
+        prices = tuple(getattr(product, name) for name in self.prices)
+        normalized = self.normalize(prices)
+        if self.last.get((key, city)) == normalized:
+            return None
+
+        self.last[(key, city)] = normalized
+        self.changes += 1
+        await self.db_writer.put(self.model, self.record(key, city, *prices, self.observed_at))
+
+    def report(self) -> None:
+        self.logger.info(f"{self.model.__tablename__}: {self.changes} price changes out of {self.observed} observed products")
+
+    @staticmethod
+    def normalize(prices: Sequence) -> tuple:
+        # NUMERIC(10, 2) comes back as Decimal, the parsers produce floats
+        return tuple(round(float(price), 2) if isinstance(price, (float, Decimal)) else price for price in prices)
@@ -0,0 +1,64 @@
+import asyncio
+import sys
+from collections import OrderedDict
+from logging import Logger
+from typing import Awaitable, Callable, Optional
+
+
+class ResponseMemo:
+    """
+    Run-scoped page bodies keyed by URL. A GET that is already in flight is joined instead of sent
+    again (single flight), a finished one is answered from memory until it is evicted; bodies are
+    kept least recently used first up to `max_bytes`. Failed fetches are not remembered.
+    """
+
+    def __init__(self, logger: Logger, max_bytes: int = 64 * 1024 * 1024):
+        self.logger: Logger = logger
+        self.max_bytes: int = max_bytes
+        self.size: int = 0
+        self.bodies: OrderedDict = OrderedDict()
+        self.in_flight: dict = {}
+        self.hits: int = 0
+        self.joined: int = 0
+        self.misses: int = 0
+
+    async def get(self, url: str, fetch: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+        if url in self.bodies:
+            self.bodies.move_to_end(url)
+            self.hits += 1
+            return self.bodies[url]
+
+        task = self.in_flight.get(url)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self.__fetch(url, fetch))
+            self.in_flight[url] = task
+        else:
+            self.joined += 1
+
+        # a cancelled caller must not cancel the fetch the other callers wait for
+        return await asyncio.shield(task)
+
+    def report(self) -> None:
+        self.logger.info(f"Response memo: {self.hits} hits, {self.joined} joined in flight, {self.misses} fetched, {self.size} bytes kept")
+
+    async def __fetch(self, url: str, fetch: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+        try:
+            body = await fetch()
+        finally:
+            del self.in_flight[url]
+
+        if body is not None:
+            self.__keep(url, body)
+        return body
+
+    def __keep(self, url: str, body: str) -> None:
+        size = sys.getsizeof(body)
+        if size > self.max_bytes:
+            return None
+
+        self.bodies[url] = body
+        self.size += size
+        while self.size > self.max_bytes:
+            _, evicted = self.bodies.popitem(last=False)
+            self.size -= sys.getsizeof(evicted)
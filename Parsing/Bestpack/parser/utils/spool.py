@@ -0,0 +1,69 @@
+import json
+import os
+import sqlite3
+import tempfile
+from itertools import islice
+from typing import Any, Iterable, Iterator, Optional
+
+
+class Spool:
+    """
+    Append-only run accumulator with a memory budget. Items are kept in a list until `max_items` of them
+    are held, then the list is appended to a temporary SQLite file and starts over; iteration yields every
+    item in append order, spilled ones first. Small runs never touch the disk. Items are JSON values,
+    tuples come back as lists.
+    """
+
+    def __init__(self, max_items: int = 100000, directory: Optional[str] = None):
+        self.max_items: int = max_items
+        self.directory: Optional[str] = directory
+        self.items: list = []
+        self.spilled: int = 0
+        self.path: Optional[str] = None
+        self.connection: Optional[sqlite3.Connection] = None
+
+    def __len__(self) -> int:
+        return self.spilled + len(self.items)
+
+    def append(self, item: Any) -> None:
+        self.items.append(item)
+        if len(self.items) >= self.max_items:
+            self.__spill()
+
+    def extend(self, items: Iterable) -> None:
+        for item in items:
+            self.append(item)
+
+    def __iter__(self) -> Iterator:
+        if self.connection is not None:
+            for row in self.connection.execute('SELECT item FROM items ORDER BY rowid'):
+                yield json.loads(row[0])
+        yield from self.items
+
+    def batches(self, size: int) -> Iterator[list]:
+        items = iter(self)
+        while batch := list(islice(items, size)):
+            yield batch
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            os.remove(self.path)
+            self.connection = None
+
+    def __spill(self) -> None:
+        if self.connection is None:
+            if self.directory:
+                os.makedirs(self.directory, exist_ok=True)
+            descriptor, self.path = tempfile.mkstemp(prefix='spool-', suffix='.sqlite', dir=self.directory)
+            os.close(descriptor)
+            self.connection = sqlite3.connect(self.path)
+            # scratch data of one run: nothing to recover after a crash
+            self.connection.execute('PRAGMA journal_mode=OFF')
+            self.connection.execute('PRAGMA synchronous=OFF')
+            self.connection.execute('CREATE TABLE items (item TEXT NOT NULL)')
+
+        with self.connection:
+            self.connection.executemany('INSERT INTO items (item) VALUES (?)', ((json.dumps(item),) for item in self.items))
+        self.spilled += len(self.items)
+        self.items = []
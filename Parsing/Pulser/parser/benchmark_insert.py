@@ -0,0 +1,69 @@
+"""
+ORM insert_batch vs COPY (BulkLoader.copy_records) on the characteristics table.
+
+    python benchmark_insert.py --rows 50000
+
+Uses the database from config.json. Rows are tagged with a unique characteristic name and
+deleted at the end, point it at a development database anyway.
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from functools import partial
+
+from scrapyx import ClientFactory
+
+from models import Characteristic, CharacteristicName, CharacteristicRecord
+from utils import BulkLoader, CharacteristicDictionary
+
+
+def make_rows(marker: str, marker_id: int, rows: int) -> list:
+    return [CharacteristicRecord(-(index // 10 + 1), marker, f'value {index}', marker_id) for index in range(rows)]
+
+
+async def main():
+    arguments = argparse.ArgumentParser()
+    arguments.add_argument('--rows', type=int, default=50000)
+    arguments.add_argument('--batch', type=int, default=500)
+    args = arguments.parse_args()
+
+    factory = ClientFactory(config_path='config.json')
+    with open('config.json') as file:
+        config = json.load(file)
+
+    postgresql_parsing = factory.clients.postgresql.postgresql_parsing
+    bulk_loader = BulkLoader(add_columns=((Characteristic, 'characteristic_id'),), **config['scrapyx']['postgresql']['parsing'])
+    await bulk_loader.open()
+
+    characteristic_dictionary = CharacteristicDictionary(model=CharacteristicName, loader=bulk_loader, logger=factory.clients.logger)
+    await characteristic_dictionary.open()
+
+    marker = f'BENCHMARK {uuid.uuid4()}'
+    table = Characteristic.__table__
+    names = CharacteristicName.__table__
+    marker_id, = await characteristic_dictionary.intern([marker])
+    try:
+        records = make_rows(marker=marker, marker_id=marker_id, rows=args.rows)
+        # the ORM side also pays for building the instances, as the parsers did before
+        runs = (
+            ('orm insert_batch', postgresql_parsing.insert_batch, lambda: [Characteristic(**record._asdict()) for record in records]),
+            ('copy', partial(bulk_loader.copy_records, Characteristic), lambda: records),
+        )
+        for name, insert_batch, build_rows in runs:
+            started = time.perf_counter()
+            rows = build_rows()
+            for index in range(0, len(rows), args.batch):
+                await insert_batch(rows[index:index + args.batch])
+            elapsed = time.perf_counter() - started
+            print(f"{name:18} {args.rows} rows in {elapsed:8.2f} s, {args.rows / elapsed:10.0f} rows/s")
+    finally:
+        async with bulk_loader.pool.acquire() as connection:
+            await connection.execute(f'DELETE FROM {table.schema}.{table.name} WHERE characteristic_id = $1', marker_id)
+            await connection.execute(f'DELETE FROM {names.schema}.{names.name} WHERE id = $1', marker_id)
+        await bulk_loader.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""
+Per-page extraction time of Pulser category pages before and after the single-pass price index.
+
+    python benchmark_listing.py pages/category.html --repeat 5
+    python benchmark_listing.py --synthetic 500 2000 5000
+
+before: ParserProducts.extract_listing with the former lookup, one select_one over the whole
+document per card. after: ParserProducts.extract_listing as it is. Saved pages should be
+?limit=0 category pages; --synthetic builds pages of N cards in the same markup. Both variants
+must return the same cards.
+"""
+import argparse
+import re
+import time
+
+from parsers.parser_products import ParserProducts
+
+CARD = (
+    '<div class="card-deck card-tiles" data-key="{key}"><div class="card">'
+    '<a href="/product/item-{key}"></a><div class="card-title"><a href="/product/item-{key}">Item {key}</a></div>'
+    '</div></div>'
+)
+PRICE = '<span class="dvizh-shop-price dvizh-shop-price-{key}">{price} </span>'
+
+
+class PerCardPrices:
+    """The former lookup: a select_one over the whole document for every card."""
+
+    def __init__(self, soup):
+        self.soup = soup
+
+    def get(self, data_key: str):
+        price_tag = self.soup.select_one(f"span.dvizh-shop-price.dvizh-shop-price-{data_key}")
+        return re.sub(r"\s+", "", price_tag.text) if price_tag else None
+
+
+def synthetic_page(cards: int) -> str:
+    keys = range(1, cards + 1)
+    return (
+        '<html><body><ol><li class="breadcrumb-item active" aria-current="page">Category</li></ol>'
+        + ''.join(CARD.format(key=key) for key in keys)
+        # prices live in a block of their own, like the cart widgets of the real page
+        + '<div>' + ''.join(PRICE.format(key=key, price=1000 + key) for key in keys) + '</div>'
+        + '</body></html>'
+    )
+
+
+def extract(html_text: str, before: bool) -> list:
+    if not before:
+        return ParserProducts.extract_listing(html_text)['cards']
+
+    price_index = ParserProducts.price_index
+    ParserProducts.price_index = staticmethod(PerCardPrices)
+    try:
+        return ParserProducts.extract_listing(html_text)['cards']
+    finally:
+        ParserProducts.price_index = staticmethod(price_index)
+
+
+def measure(html_text: str, before: bool, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        extract(html_text, before)
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    arguments = argparse.ArgumentParser()
+    arguments.add_argument('pages', nargs='*', help='saved ?limit=0 category pages')
+    arguments.add_argument('--synthetic', type=int, nargs='*', default=[], help='card counts of generated pages')
+    arguments.add_argument('--repeat', type=int, default=5)
+    args = arguments.parse_args()
+
+    pages = []
+    for path in args.pages:
+        with open(path, encoding='utf-8') as file:
+            pages.append((path, file.read()))
+    pages.extend((f'synthetic {cards} cards', synthetic_page(cards)) for cards in args.synthetic)
+
+    print(f"{'page':40} {'cards':>6} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for name, html_text in pages:
+        cards = extract(html_text, before=False)
+        if extract(html_text, before=True) != cards:
+            raise SystemExit(f"{name}: before and after return different cards")
+
+        before = measure(html_text, before=True, repeat=args.repeat)
+        after = measure(html_text, before=False, repeat=args.repeat)
+        print(f"{name[-40:]:40} {len(cards):6} {before:10.1f} {after:10.1f} {before / after:7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
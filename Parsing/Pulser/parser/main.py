@@ -1,16 +1,60 @@
 import asyncio
+import json
 from scrapyx import ClientFactory
+from models import Characteristic, CharacteristicName, DetailState, Picture, PriceHistory, PriceHistoryRecord, Product
 from parsers import ParserCategory, ParserProducts, ParserCharacteristicAndPicture
+from utils import BulkLoader, CachedRequests, CharacteristicDictionary, Channel, CrawlPool, DbWriter, DeltaLoader, DetailRefresh, FileStore, HtmlExecutor, HttpCache, PriceTracker, ResponseMemo, Spool, StagingLoader, configure_html_parser
 
 
 async def main():
 
     factory = ClientFactory(config_path='config.json')
+    with open('config.json') as file:
+        config = json.load(file)
 
     logger = factory.clients.logger
-    requests = factory.clients.requests
+    # ETag / Last-Modified of the previous run: unchanged pages and images come back as 304
+    http_cache = HttpCache(path=config['parser']['http_cache_path'], logger=logger)
+    # pages asked for by more than one stage are fetched once per run
+    response_memo = ResponseMemo(logger=logger, max_bytes=config['parser']['response_memo_bytes'])
+    requests = CachedRequests(request_dispatcher=factory.clients.requests, cache=http_cache, logger=logger, memo=response_memo)
     postgresql_parsing = factory.clients.postgresql.postgresql_parsing
-    files = factory.clients.files
+    # products, characteristics and pictures go through COPY, the ORM client keeps the rest.
+    # delta mode upserts only new / changed rows instead of writing the full snapshot (not with the
+    # Talend job that truncates these tables after loading them, see DeltaLoader),
+    # staging mode loads a copy of the tables and swaps it in when the run is complete
+    if config['parser']['load_mode'] == 'delta':
+        bulk_loader = DeltaLoader(models=(Product, Characteristic, Picture), logger=logger, add_columns=((Characteristic, 'characteristic_id'),), **config['scrapyx']['postgresql']['parsing'])
+    elif config['parser']['load_mode'] == 'staging':
+        bulk_loader = StagingLoader(models=(Product, Characteristic, Picture), logger=logger, add_columns=((Characteristic, 'characteristic_id'),), **config['scrapyx']['postgresql']['parsing'])
+    else:
+        bulk_loader = BulkLoader(add_columns=((Characteristic, 'characteristic_id'),), **config['scrapyx']['postgresql']['parsing'])
+    await bulk_loader.open()
+    # inserts run in the background: one buffer and flush task per table
+    db_writer = DbWriter(loader=bulk_loader, logger=logger, **config['parser']['db_writer'])
+    # price changes against the last known prices go to the append-only history table
+    price_tracker = PriceTracker(model=PriceHistory, record=PriceHistoryRecord, loader=bulk_loader, db_writer=db_writer, logger=logger)
+    await price_tracker.open()
+    # characteristic rows carry the id of the name, new names are added page by page
+    characteristic_dictionary = CharacteristicDictionary(model=CharacteristicName, loader=bulk_loader, logger=logger)
+    await characteristic_dictionary.open()
+    # detail pages of products whose listing is unchanged are refetched only every max_age_days; their rows
+    # come back from the detail state, the live tables are truncated by Pulser_Job after every run
+    detail_refresh = DetailRefresh(model=DetailState, loader=bulk_loader, logger=logger, skipped=Spool(**config['parser']['spool']), **config['parser']['detail_refresh'])
+    await detail_refresh.open()
+    # images are streamed to disk by FileStore instead of scrapyx Files.write_file
+    files = FileStore(**config['scrapyx']['files'])
+
+    # one pool per run: host limits are shared by every stage. Every stage crawls the same site and each
+    # stage has a window of its own, so per_host_limit is the only cap on the total load put on the site
+    crawl_pool = CrawlPool(**config['parser']['crawl_pool'])
+
+    # before the executors: their workers take the builder of this process
+    configure_html_parser(config['parser']['html_parser'])
+
+    # html parsing per parser: 0 workers parses on the event loop, otherwise in a process pool
+    products_executor = HtmlExecutor(workers=config['parser']['html_workers']['products'])
+    characteristic_and_pictures_executor = HtmlExecutor(workers=config['parser']['html_workers']['characteristic_and_pictures'])
 
     parser_categories = ParserCategory(
         logger=logger,
@@ -22,23 +66,50 @@ async def main():
         logger=logger,
         request_dispatcher=requests,
         database=postgresql_parsing,
-        files=files
+        db_writer=db_writer,
+        characteristic_dictionary=characteristic_dictionary,
+        detail_refresh=detail_refresh,
+        files=files,
+        crawl_pool=crawl_pool,
+        html_executor=characteristic_and_pictures_executor
     )
 
     parser_product = ParserProducts(
         logger=logger,
         request_dispatcher=requests,
-        database=postgresql_parsing
+        database=postgresql_parsing,
+        db_writer=db_writer,
+        price_tracker=price_tracker,
+        detail_refresh=detail_refresh,
+        crawl_pool=crawl_pool,
+        html_executor=products_executor,
+        stream_listings=config['parser']['stream_listings']
     )
 
     await postgresql_parsing.inspect_parser_status()
 
     product_category = await parser_categories.parse()
-    product_url = await parser_product.parse(product_category_id=product_category)
-
-    await parser_characteristic_and_pictures.parse(product_url=product_url)
+    # listing -> detail -> media stages overlap, connected by bounded channels
+    product_url = Channel(maxsize=1000)
+    await asyncio.gather(
+        parser_product.parse(product_category_id=product_category, product_url=product_url),
+        parser_characteristic_and_pictures.parse(product_url=product_url)
+    )
 
+    # every buffered row has to be in the database before the run is marked successful
+    await db_writer.close()
+    await bulk_loader.finish()
+    await detail_refresh.save()
+    detail_refresh.report()
+    detail_refresh.close()
+    price_tracker.report()
+    characteristic_dictionary.report()
+    response_memo.report()
     await postgresql_parsing.parsed_successfully()
+    http_cache.close()
+    await bulk_loader.close()
+    products_executor.close()
+    characteristic_and_pictures_executor.close()
 
 
 if __name__ == '__main__':
@@ -1,5 +1,9 @@
 from .category import Category
 from .characteristic import Characteristic
+from .characteristic_name import CharacteristicName
+from .detail_state import DetailState
 from .picture import Picture
+from .price_history import PriceHistory
 from .product import Product
-from .source import Source
\ No newline at end of file
+from .records import CharacteristicRecord, PictureRecord, PriceHistoryRecord, ProductRecord
+from .source import Source
@@ -1,5 +1,5 @@
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import BIGINT, TEXT, INTEGER
+from sqlalchemy import BIGINT, TEXT, INTEGER, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column
 
 Base = declarative_base()
@@ -7,20 +7,25 @@ Base = declarative_base()
 class Characteristic(Base):
 
     __tablename__ = "pulser_characteristics"
-    __table_args__ = {'schema': 'marketplaces'}
+    # conflict key of the delta load mode (DeltaLoader)
+    __table_args__ = (UniqueConstraint('source_id', 'characteristic', name='pulser_characteristics_source_id_characteristic_key'), {'schema': 'marketplaces'})
 
     id: Mapped[int] = mapped_column(BIGINT, primary_key=True, autoincrement=True)
     source_id: Mapped[int] = mapped_column(INTEGER)
     characteristic: Mapped[str] = mapped_column(TEXT)
     value: Mapped[str] = mapped_column(TEXT)
+    # id in the pulser_characteristic_names dictionary. The name stays in characteristic for the Talend
+    # jobs that read it; tables made before the dictionary get this column in BulkLoader.open() (add_columns)
+    characteristic_id: Mapped[int] = mapped_column(INTEGER)
 
     def __repr__(self):
         return  f"Characteristic(id={self.id!r}, " \
                 f"source_id={self.source_id!r}, " \
                 f"characteristic={self.characteristic!r}, " \
-                f"value={self.value!r})"
+                f"value={self.value!r}, " \
+                f"characteristic_id={self.characteristic_id!r})"
 
 
     @staticmethod
-    async def fill_characteristic(source_id:int, characteristic: str, value: str):
-        return Characteristic(source_id=source_id, characteristic=characteristic, value=value)
\ No newline at end of file
+    async def fill_characteristic(source_id:int, characteristic: str, value: str, characteristic_id: int):
+        return Characteristic(source_id=source_id, characteristic=characteristic, value=value, characteristic_id=characteristic_id)
\ No newline at end of file
@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import INTEGER, TEXT, TIMESTAMP
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+Base = declarative_base()
+
+
+class DetailState(Base):
+    __tablename__ = "pulser_detail_state"
+    # listing fingerprint of a product at the time its detail page was last parsed, with the rows the page gave
+    __table_args__ = {'schema': 'marketplaces'}
+
+    source_id: Mapped[int] = mapped_column(INTEGER, primary_key=True)
+    fingerprint: Mapped[str] = mapped_column(TEXT)
+    fetched_at: Mapped[datetime] = mapped_column(TIMESTAMP)
+    # [characteristic, value, characteristic_id] lists and image urls of the page, replayed while the product is skipped
+    characteristics: Mapped[list] = mapped_column(JSONB, nullable=True)
+    pictures: Mapped[list] = mapped_column(JSONB, nullable=True)
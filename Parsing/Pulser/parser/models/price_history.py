@@ -0,0 +1,21 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import BIGINT, INTEGER, TEXT, TIMESTAMP, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+Base = declarative_base()
+
+
+class PriceHistory(Base):
+    __tablename__ = "pulser_price_history"
+    # append-only: a row is written only when the prices of (product, city) changed since the last one
+    __table_args__ = (Index('pulser_price_history_source_id_city_observed_at_idx', 'source_id', 'city', 'observed_at'), {'schema': 'marketplaces'})
+
+    id: Mapped[int] = mapped_column(BIGINT, primary_key=True, autoincrement=True)
+    source_id: Mapped[int] = mapped_column(INTEGER)
+    # NULL for sites with a single price list
+    city: Mapped[Optional[str]] = mapped_column(TEXT, nullable=True)
+    price: Mapped[int] = mapped_column(INTEGER)
+    observed_at: Mapped[datetime] = mapped_column(TIMESTAMP)
@@ -0,0 +1,33 @@
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+
+# Rows of the extraction layer. Field order is the column order of the table (without the
+# autoincrement id), so a record is handed to BulkLoader.copy_records as is.
+
+class ProductRecord(NamedTuple):
+    source_id: int
+    title: str
+    category_id: int
+    price: int
+    product_url: str
+
+
+class CharacteristicRecord(NamedTuple):
+    source_id: int
+    characteristic: str
+    value: str
+    characteristic_id: int
+
+
+class PictureRecord(NamedTuple):
+    source_id: int
+    image_url: str
+    path: str
+
+
+class PriceHistoryRecord(NamedTuple):
+    source_id: int
+    city: Optional[str]
+    price: int
+    observed_at: datetime
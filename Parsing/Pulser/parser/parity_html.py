@@ -0,0 +1,68 @@
+"""
+Extraction output of the bs4 tree builders on saved Pulser pages, compared field by field with html.parser.
+
+    python parity_html.py listing=pages/category.html product=pages/product.html
+
+Run it on freshly saved pages before setting parser.html_parser to another builder: the builders repair
+broken markup differently, so a selector can match other elements (the product page reads the
+characteristics table by position, nth-child). Exits non-zero on any difference.
+"""
+import argparse
+
+from parsers.parser_characteristic_and_pictures import ParserCharacteristicAndPicture
+from parsers.parser_products import ParserProducts
+from utils import ExtractionError, configure_html_parser
+from utils.markup import HTML_PARSERS, resolve_html_parser
+
+# page is the saved path, it only stands in for the url in messages
+EXTRACT = {
+    'listing': lambda html_text, page: ParserProducts.extract_listing(html_text),
+    'product': ParserCharacteristicAndPicture.extract_product,
+}
+
+
+def extract(kind: str, html_text: str, page: str, builder: str):
+    configure_html_parser(builder)
+    try:
+        return EXTRACT[kind](html_text, page)
+    except ExtractionError as error:
+        return f'ExtractionError: {error}'
+
+
+def differences(old, new, path: str = '') -> list:
+    """Paths where the two outputs differ, with both values."""
+    if isinstance(old, dict) and isinstance(new, dict):
+        return [line for key in sorted(old.keys() | new.keys(), key=str) for line in differences(old.get(key), new.get(key), f'{path}.{key}')]
+    if isinstance(old, (list, tuple)) and isinstance(new, (list, tuple)) and len(old) == len(new):
+        return [line for index, (a, b) in enumerate(zip(old, new)) for line in differences(a, b, f'{path}[{index}]')]
+    return [] if old == new else [f'{path or "."}: {old!r} != {new!r}']
+
+
+def main():
+    arguments = argparse.ArgumentParser()
+    arguments.add_argument('pages', nargs='+', help='kind=path, kind is one of: ' + ', '.join(EXTRACT))
+    arguments.add_argument('--against', default='html.parser', help='builder the others are compared with')
+    args = arguments.parse_args()
+
+    builders = [name for name in HTML_PARSERS if name != args.against and resolve_html_parser(name) == name]
+    failed = False
+
+    for page in args.pages:
+        kind, path = page.split('=', 1)
+        with open(path, encoding='utf-8') as file:
+            html_text = file.read()
+
+        expected = extract(kind, html_text, path, args.against)
+        for builder in builders:
+            found = differences(expected, extract(kind, html_text, path, builder))
+            print(f"{path[-40:]:40} {builder:12} {'same' if not found else f'{len(found)} differences'}")
+            for line in found:
+                print(f'    {line}')
+            failed = failed or bool(found)
+
+    if failed:
+        raise SystemExit(f"extraction differs from {args.against}, keep parser.html_parser at {args.against!r}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,26 +1,27 @@
 from logging import Logger
 from scrapyx.base import BaseScraperSync
-from scrapyx.clients import Requests, PostgreSQL
+from scrapyx.clients import PostgreSQL
 from scrapyx.utils import normalize_text
 
 from models import Category
+from utils import CachedRequests, html_parser
 
 class ParserCategory(BaseScraperSync):
     url = "https://pulser.kz/"
     category_id_counter = 1
 
-    def __init__(self, request_dispatcher: Requests, logger: Logger, database: PostgreSQL):
-        self.request_dispatcher: Requests = request_dispatcher
+    def __init__(self, request_dispatcher: CachedRequests, logger: Logger, database: PostgreSQL):
+        self.request_dispatcher: CachedRequests = request_dispatcher
         self.logger: Logger = logger
         self.db: PostgreSQL = database
         self.category_for_product = {}
 
     async def parse(self) -> dict:
-        async with self.request_dispatcher.get(self.url) as response:
-            if not response.ok:
-                self.logger.exception(f"Failed to get categories from  {response.URL}: {response.status}")
-            response = await response.text()
-
+        # ParserProducts reads the same home page, the run's response memo fetches it once
+        response = await self.request_dispatcher.get_text(self.url, shared=True)
+        if response is None:
+            self.logger.error(f"Failed to get categories from {self.url}")
+            return self.category_for_product
 
         categories = await self.extract_categories(response)
         # Insert
@@ -33,7 +34,7 @@ class ParserCategory(BaseScraperSync):
 
 
     async def extract_categories(self, html_text) -> list:
-        soup = self.get_bs4_object(html_text, 'html.parser')
+        soup = self.get_bs4_object(html_text, html_parser())
 
         # take elements
         category_elements = soup.select("li.nav-item.dropdown")
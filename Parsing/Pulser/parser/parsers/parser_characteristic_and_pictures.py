@@ -1,181 +1,189 @@
 import asyncio
 import re
 import uuid
+from functools import partial
 from pathlib import Path
 from logging import Logger
 from urllib.parse import urlparse
 from uuid import NAMESPACE_URL
-from typing import Optional
-from scrapyx.clients import Requests, Files, PostgreSQL
+from typing import AsyncIterable, Optional
+from bs4 import BeautifulSoup
+from aiohttp import ClientResponse
+from scrapyx.clients import PostgreSQL
 from scrapyx.base import BaseScraperSync
-from models import Characteristic, Picture, Source
+from models import Characteristic, CharacteristicRecord, Picture, PictureRecord, Source
+from utils import CachedRequests, CharacteristicDictionary, Channel, CrawlPool, DbWriter, DigestSet, DetailRefresh, ExtractionError, FileStore, HtmlExecutor, html_parser
 from scrapyx.utils import normalize_text
 
 
 class ParserCharacteristicAndPicture(BaseScraperSync):
     BATCH_SIZE_ASYNC = 20
-    BATCH_SIZE_INSERT = 500
+    QUEUE_SIZE = 1000
     URL = "https://pulser.kz/"
     SOURCE_NAME = "Pulser"
     source_folder = None
     trash_image_url = ('https://pulser.kz/gallery/images/image-by-item-and-alias?item=&dirtyAlias=placeHolder.png')
 
-    def __init__(self, request_dispatcher: Requests, logger: Logger, database: PostgreSQL, files: Files):
-        self.request_dispatcher: Requests = request_dispatcher
+    def __init__(self, request_dispatcher: CachedRequests, logger: Logger, database: PostgreSQL, db_writer: DbWriter, characteristic_dictionary: CharacteristicDictionary, detail_refresh: DetailRefresh, files: FileStore, crawl_pool: CrawlPool, html_executor: HtmlExecutor):
+        self.request_dispatcher: CachedRequests = request_dispatcher
         self.logger: Logger = logger
         self.db: PostgreSQL = database
-        self.file = files
-        self.unique_urls = set()
-        self.all_pictures = []
-
-    async def parse(self, product_url) -> None:
-        # characteristic
-        await self.extract_characteristic(product_url)
+        self.db_writer: DbWriter = db_writer
+        self.characteristic_dictionary: CharacteristicDictionary = characteristic_dictionary
+        self.detail_refresh: DetailRefresh = detail_refresh
+        self.file: FileStore = files
+        self.crawl_pool: CrawlPool = crawl_pool
+        self.html_executor: HtmlExecutor = html_executor
+        self.unique_urls = DigestSet()
+
+    async def parse(self, product_url: AsyncIterable[str]) -> None:
+        self.source_folder = await self.find_source_id()
+        if not self.source_folder:
+            self.logger.error(f"Source '{self.SOURCE_NAME}' not found in the database.")
 
-        # pictures
-        await self.parse_pictures(self.all_pictures)
-        self.all_pictures.clear()
+        # pictures are downloaded while characteristic pages are still being parsed
+        pictures = Channel(maxsize=self.QUEUE_SIZE)
+        await asyncio.gather(
+            self.extract_characteristic(product_url, pictures=pictures),
+            self.parse_pictures(pictures)
+        )
 
         # Info
         self.logger.info(f"Characteristics and Pictures parsed successfully and inserted into database!")
 
-    async def extract_characteristic(self, product_links: list) -> None:
-        if not product_links:
-            self.logger.error("No product links provided for characteristic and pictures extraction.")
-            return None
-
-        product_characteristics = []
-
-        for i in range(0, len(product_links), self.BATCH_SIZE_ASYNC):
-            batch = product_links[i : i + self.BATCH_SIZE_ASYNC]
+    async def extract_characteristic(self, product_links: AsyncIterable[str], pictures: Channel) -> None:
+        products_parsed = 0
 
-            tasks = [self.parse_single_product(link) for link in batch]
-            products_chars = await asyncio.gather(*tasks)
-
-            for product_char in products_chars:
-                if product_char:
-                    product_characteristics.extend(product_char)
-
-            if len(product_characteristics) >= self.BATCH_SIZE_INSERT:
-                await self.db.insert_batch(product_characteristics)
-                product_characteristics.clear()
+        try:
+            async for product_char, product_pictures in self.crawl_pool.imap(self.parse_single_product, product_links, window=self.BATCH_SIZE_ASYNC):
+                products_parsed += 1
+                # rows are flushed in the background, the crawl only waits when the buffer is full
+                await self.db_writer.put_many(Characteristic, product_char)
+
+                for picture in product_pictures:
+                    await pictures.put(picture)
+
+            # products skipped by the detail refresh: the page is replayed from the detail state, its pictures
+            # are downloaded (a 304 on an unchanged image) and deduplicated like those of a fetched page
+            async for source_id, characteristics, image_urls in self.detail_refresh.stored():
+                await self.db_writer.put_many(Characteristic, [CharacteristicRecord(source_id, *values) for values in characteristics])
+                for image_url in image_urls:
+                    await pictures.put({'source_id': source_id, 'image_url': image_url})
+        finally:
+            await pictures.close()
+
+        if not products_parsed and not self.detail_refresh.replayed:
+            self.logger.error("No product links provided for characteristic and pictures extraction.")
 
-        if product_characteristics:
-            await self.db.insert_batch(product_characteristics)
         return None
 
-    async def parse_single_product(self, url) -> list:
+    async def parse_single_product(self, url) -> tuple[list, list]:
         try:
-            async with self.request_dispatcher.get(url) as response:
-                if not response.ok:
-                    self.logger.warning(f"Failed to get product {url} with status {response.status}")
-                    return []
-                response = await response.text()
-
-            soup = self.get_bs4_object(response, 'html.parser')
-
-            # take product code
-            product_code_link = soup.select_one("body > main > div > section > div.row > div:nth-child(2) > div > div:nth-child(1) > div > div:nth-child(2) > small")
-            match = re.search(r"(\d+)", product_code_link.text) if product_code_link else None
-
-            if not match:
-                self.logger.error(f"Failed to get product code {url}")
-                return []
-
-            source_id = int(match.group(1))
-
-            product_characteristics = []
-            # take product characteristics
-            take_characteristics = soup.select("div.row.no-gutters")
-            if not take_characteristics:
-                self.logger.error(f"Failed to get product characteristics {url}")
-                return []
-
-            check_duplicate = set()
-            for characteristic in take_characteristics:
-                key = characteristic.select_one("div.col-sm-3")
-                value = characteristic.select_one("div.col-sm-9")
-
-                if not key or not value or not key.text or not value.text:
-                    continue
-
-                key_text = normalize_text(key.text, 'u')
-                value_text = normalize_text(value.text, 'u')
-
-                if key_text == 'НАЗВАНИЕ ПРОДУКТА' or key_text in check_duplicate:
-                    continue
-
-                product_characteristics.append(await Characteristic.fill_characteristic(
-                    source_id=source_id,
-                    characteristic=key_text,
-                    value=value_text
-                ))
-                check_duplicate.add(key_text)
-
-            # take images
-            image_link = soup.select("li.img-cardpreview")
-            if not image_link:
-                self.logger.error(f"Failed to get product images {url}")
-                return product_characteristics
-
-            for image in image_link:
-                curr_image = image.find('img').get('src')
-                if not curr_image:
-                    continue
-
-                self.all_pictures.append({
-                    "source_id": source_id,
-                    "image_url": f"https://pulser.kz{curr_image}"
-                })
-
-            return product_characteristics
+            response = await self.request_dispatcher.get_text(url)
+            if response is None:
+                return [], []
+
+            page = await self.html_executor.run(self.extract_product, html_text=response, url=url)
+            for message in page['warnings']:
+                self.logger.error(message)
+
+            characteristic_ids = await self.characteristic_dictionary.intern([key_text for key_text, _ in page['characteristics']])
+            product_characteristics = [
+                CharacteristicRecord(page['source_id'], name, value_text, characteristic_id)
+                for characteristic_id, (name, value_text) in zip(characteristic_ids, page['characteristics'])
+            ]
+
+            await self.detail_refresh.done(url, product_characteristics, [picture['image_url'] for picture in page['pictures']])
+            return product_characteristics, page['pictures']
+        except ExtractionError as e:
+            self.logger.error(str(e))
+            return [], []
         except Exception as e:
             self.logger.exception(f"Error while parsing product {url}: {e}")
-            return []
+            return [], []
 
-    # picture part
-    async def parse_pictures(self, pictures_info: list) -> None:
-        if not pictures_info:
-            self.logger.exception("No pictures to process.")
-            return None
+    @staticmethod
+    def extract_product(html_text: str, url: str) -> dict:
+        """Runs in the html executor: plain fields only, Characteristic is built by the caller."""
+        soup = BeautifulSoup(html_text, html_parser())
+        warnings = []
 
-        tasks = []
-        pictures = []
+        # take product code
+        product_code_link = soup.select_one("body > main > div > section > div.row > div:nth-child(2) > div > div:nth-child(1) > div > div:nth-child(2) > small")
+        match = re.search(r"(\d+)", product_code_link.text) if product_code_link else None
 
-        self.source_folder = await self.find_source_id()
-        if not self.source_folder:
-            self.logger.error(f"Source '{self.SOURCE_NAME}' not found in the database.")
-            return None
+        if not match:
+            raise ExtractionError(f"Failed to get product code {url}")
+
+        source_id = int(match.group(1))
 
+        product_characteristics = []
+        # take product characteristics
+        take_characteristics = soup.select("div.row.no-gutters")
+        if not take_characteristics:
+            raise ExtractionError(f"Failed to get product characteristics {url}")
 
-        for pic in pictures_info:
-            product_code = pic['source_id']
-            image_url = pic['image_url']
-            if not product_code or not image_url or not isinstance(product_code, int) or image_url in self.trash_image_url:
-                self.logger.error(f"Invalid product code or image URL or trash image: {product_code}, {image_url}")
+        check_duplicate = set()
+        for characteristic in take_characteristics:
+            key = characteristic.select_one("div.col-sm-3")
+            value = characteristic.select_one("div.col-sm-9")
+
+            if not key or not value or not key.text or not value.text:
                 continue
 
-            # ext = os.path.splitext(urlparse(image_url).path)[1].lstrip('.') or 'jpg'
-            ext = Path(urlparse(image_url).path).suffix.lstrip('.') or 'jpg'
+            key_text = normalize_text(key.text, 'u')
+            value_text = normalize_text(value.text, 'u')
+
+            if key_text == 'НАЗВАНИЕ ПРОДУКТА' or key_text in check_duplicate:
+                continue
 
-            tasks.append(self.process_file(product_code=int(product_code), url=image_url, extension=ext))
+            product_characteristics.append((key_text, value_text))
+            check_duplicate.add(key_text)
 
-            if len(tasks) >= self.BATCH_SIZE_ASYNC:
-                pictures += await self.filter_urls(await asyncio.gather(*tasks, return_exceptions=True))
-                tasks.clear()
+        # take images
+        pictures_info = []
+        image_link = soup.select("li.img-cardpreview")
+        if not image_link:
+            warnings.append(f"Failed to get product images {url}")
 
-            if len(pictures) >= self.BATCH_SIZE_INSERT:
-                await self.db.insert_batch(pictures)
-                pictures.clear()
+        for image in image_link:
+            curr_image = image.find('img').get('src')
+            if not curr_image:
+                continue
 
-        if tasks:
-            pictures += await self.filter_urls(await asyncio.gather(*tasks))
+            pictures_info.append({
+                "source_id": source_id,
+                "image_url": f"https://pulser.kz{curr_image}"
+            })
 
-        if pictures:
-            await self.db.insert_batch(pictures)
+        return {'source_id': source_id, 'characteristics': product_characteristics, 'pictures': pictures_info, 'warnings': warnings}
+
+    # picture part
+    async def parse_pictures(self, pictures_info: AsyncIterable[dict]) -> None:
+        if not self.source_folder:
+            # keep draining the channel so the characteristic stage never blocks on it
+            async for _ in pictures_info:
+                pass
+            return None
+
+        async for picture in self.crawl_pool.imap(self.process_picture, pictures_info, window=self.BATCH_SIZE_ASYNC, key=lambda pic: pic['image_url']):
+            if picture:
+                await self.db_writer.put(Picture, picture)
 
         return None
 
+    async def process_picture(self, pic: dict) -> Optional[PictureRecord]:
+        product_code = pic['source_id']
+        image_url = pic['image_url']
+        if not product_code or not image_url or not isinstance(product_code, int) or image_url in self.trash_image_url:
+            self.logger.error(f"Invalid product code or image URL or trash image: {product_code}, {image_url}")
+            return None
+
+        # ext = os.path.splitext(urlparse(image_url).path)[1].lstrip('.') or 'jpg'
+        ext = Path(urlparse(image_url).path).suffix.lstrip('.') or 'jpg'
+
+        return await self.process_file(product_code=int(product_code), url=image_url, extension=ext)
+
 
     async def find_source_id(self) -> Optional[str]:
         sources = await self.db.select_all(Source)
@@ -185,22 +193,18 @@ class ParserCharacteristicAndPicture(BaseScraperSync):
         return None
 
 
-    async def process_file(self, product_code: int, url: str, extension: str) -> Optional[Picture]:
+    async def process_file(self, product_code: int, url: str, extension: str) -> Optional[PictureRecord]:
         try:
-            async with self.request_dispatcher.get(url=url, raise_on_status=False, log_info=False) as response:
-                if response.status != 200:
-                    return None
-                content = await response.read()
-
-            # Сформировать путь и сохранить файл
-            path = await self.download_file(source_folder=self.source_folder, product_code=product_code, extension=extension, content=content)
+            # Сформировать путь и сохранить файл потоком; 304 — берём путь из прошлого запуска
+            save = partial(self.download_file, source_folder=self.source_folder, product_code=product_code, extension=extension)
+            path = await self.request_dispatcher.download(url=url, save=save, reuse=self.file.exists, log_info=False)
 
             if not path or path in self.unique_urls:
                 return None
 
             self.unique_urls.add(path)
 
-            return await Picture.fill_picture(
+            return PictureRecord(
                 source_id=product_code,
                 image_url=url,
                 path=path
@@ -209,21 +213,15 @@ class ParserCharacteristicAndPicture(BaseScraperSync):
             self.logger.exception(f"Failed to process file {url}: {e}")
             return None
 
-    async def download_file(self, source_folder: str, product_code: int, extension: str, content: [str | bytes]) -> Optional[str]:
+    async def download_file(self, source_folder: str, product_code: int, extension: str, response: ClientResponse) -> Optional[str]:
         folder = await self.__generate_uuid(str(product_code))
-        filename = await self.__generate_uuid(str(content))
-        path = await self.file.write_file(
-            filename=str(f"{filename}.{extension}"),
+        path = await self.file.save(
+            response=response,
             path=f"{source_folder}/{folder}",
-            content=content,
-            return_type='r'
+            extension=f".{extension}"
         )
         return path
 
     @staticmethod
     async def __generate_uuid(name: str) -> str:
-        return str(uuid.uuid5(namespace=NAMESPACE_URL, name=name))
-
-    @staticmethod
-    async def filter_urls(urls: list):
-        return [u for u in urls if u is not None]
\ No newline at end of file
+        return str(uuid.uuid5(namespace=NAMESPACE_URL, name=name))
\ No newline at end of file
@@ -1,51 +1,70 @@
 import asyncio
 import re
+from contextlib import aclosing
+from functools import partial
 from logging import Logger
+from typing import AsyncIterator, Optional
 
+from aiohttp import ClientConnectionError, ClientPayloadError
 from bs4 import BeautifulSoup
-from scrapyx.clients import Requests, PostgreSQL
+from scrapyx.clients import PostgreSQL
 from scrapyx.utils import normalize_text
 from scrapyx.base import BaseScraperSync
 
-from models import Product
+from models import Product, ProductRecord
+from utils import CachedRequests, Channel, CrawlPool, DbWriter, DetailRefresh, DigestSet, HtmlExecutor, HtmlStream, PriceTracker, html_parser
 
 
 class ParserProducts(BaseScraperSync):
     BATCH_SIZE_ASYNC = 10
-    BATCH_SIZE_INSERT = 500
     url = "https://pulser.kz"
-
-    def __init__(self, request_dispatcher: Requests, logger: Logger, database: PostgreSQL):
-        self.request_dispatcher: Requests = request_dispatcher
+    # the price of a card is a span somewhere else in the page, tagged with the card's data-key
+    PRICE_CLASS = "dvizh-shop-price-"
+    # elements the streaming listing parser looks at
+    STREAM_TAGS = ('li', 'span', 'div')
+    # tries of a streamed page whose body breaks off
+    STREAM_ATTEMPTS = 2
+
+    def __init__(self, request_dispatcher: CachedRequests, logger: Logger, database: PostgreSQL, db_writer: DbWriter, price_tracker: PriceTracker, detail_refresh: DetailRefresh, crawl_pool: CrawlPool, html_executor: HtmlExecutor, stream_listings: bool = True):
+        self.request_dispatcher: CachedRequests = request_dispatcher
         self.logger: Logger = logger
         self.db: PostgreSQL = database
+        self.db_writer: DbWriter = db_writer
+        self.price_tracker: PriceTracker = price_tracker
+        self.detail_refresh: DetailRefresh = detail_refresh
+        self.crawl_pool: CrawlPool = crawl_pool
+        self.html_executor: HtmlExecutor = html_executor
         self.product_category_id = dict()
-        self.product_url = []
-
-    async def parse(self, product_category_id) -> list:
-        async with self.request_dispatcher.get(self.url) as response:
-            if not response.ok:
+        # ?limit=0 pages are parsed chunk by chunk instead of as one tree in the html executor
+        self.stream_listings: bool = stream_listings
+        # source_id is the primary key: a product listed in two categories would abort the whole COPY
+        self.seen_source_ids = DigestSet()
+
+    async def parse(self, product_category_id, product_url: Channel) -> None:
+        try:
+            response = await self.request_dispatcher.get_text(self.url, shared=True)
+            if response is None:
                 self.logger.error("Failed to get URL {}".format(self.url))
-                return []
-            response = await response.text()
+                return None
 
-        # link to categories
-        category_links = await self.extract_category_links(response)
-        if not category_links:
-            self.logger.exception("No category links found, exiting.")
-            return []
+            # link to categories
+            category_links = await self.extract_category_links(response)
+            if not category_links:
+                self.logger.exception("No category links found, exiting.")
+                return None
 
-        self.logger.info(f"category_links : {category_links}")
+            self.logger.info(f"category_links : {category_links}")
 
-        # parsing products
-        await self.extract_products(product_category_page=category_links,product_category_id=product_category_id)
+            # parsing products, every product url goes to the next stage as soon as it is found
+            await self.extract_products(product_category_page=category_links, product_category_id=product_category_id, product_url=product_url)
+        finally:
+            await product_url.close()
 
-        # return product_url
-        return self.product_url
+        return None
 
 
     async def extract_category_links(self, html_text) -> list:
-        soup = self.get_bs4_object(html_text, 'html.parser')
+        soup = self.get_bs4_object(html_text, html_parser())
 
         # take category links
         category_links = soup.select("li.nav-item.dropdown div.dropdown-menu a.nav-link")
@@ -66,47 +85,253 @@ class ParserProducts(BaseScraperSync):
         return all_categories
 
 
-    async def extract_products(self, product_category_page: list, product_category_id: dict) -> None:
+    async def extract_products(self, product_category_page: list, product_category_id: dict, product_url: Channel) -> None:
         self.product_category_id = product_category_id
         self.logger.info("Starting to extract products...")
-        all_products = []
-
-        #  0 -> left_index    len(product_pages) -> size  self.BATCH_SIZE_ASYNC -> range to jump
-        for left_index in range(0, len(product_category_page), self.BATCH_SIZE_ASYNC):
+        parse_category = partial(self.stream_category, product_url=product_url) if self.stream_listings else self.parse_single_category
 
-            batch_pages = product_category_page[left_index: left_index + self.BATCH_SIZE_ASYNC]
-            tasks = [self.parse_single_category(page) for page in batch_pages]
-            products = await asyncio.gather(*tasks)
+        # keeps BATCH_SIZE_ASYNC category pages in flight, a slow page no longer stalls the others
+        async for products in self.crawl_pool.imap(parse_category, product_category_page, window=self.BATCH_SIZE_ASYNC):
+            await self.hand_off(products=products, product_url=product_url)
 
-            for product in products:
-                if product:
-                    all_products.extend(product)
+        # Info
+        self.logger.info("Products extracted and inserted into the database successfully!")
+        return None
 
-            if len(all_products) >= self.BATCH_SIZE_INSERT:
-                await self.db.insert_batch(all_products)
-                all_products.clear()
+    async def hand_off(self, products: list, product_url: Channel) -> None:
+        for product in products:
+            if product.source_id in self.seen_source_ids:
+                continue
+            self.seen_source_ids.add(product.source_id)
+            await self.db_writer.put(Product, product)
+            await self.price_tracker.observe(product)
+            # the detail page is fetched again only for new / changed products and on the refresh cadence
+            if self.detail_refresh.wanted(product):
+                await product_url.put(product.product_url)
+
+    async def stream_category(self, page: str, product_url: Channel) -> list:
+        """
+        Streaming parse_single_category: the body is fed to an HtmlStream chunk by chunk and every card is
+        handed off as soon as it closes, so a page never exists as a whole string or tree. A card whose price
+        span comes later in the page waits for it as a plain dict; special-category cards (div.maincard) are
+        held until the page shows it has no regular cards. A body that breaks off is streamed again from the
+        start, the cards already handed off are skipped by seen_source_ids.
+        """
+        for attempt in range(1, self.STREAM_ATTEMPTS + 1):
+            try :
+                await self.stream_page(page=page, product_url=product_url)
+                return []
+            except (ClientPayloadError, ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt < self.STREAM_ATTEMPTS:
+                    self.logger.warning(f"Body of {page} broke off ({e!r}), streaming it again")
+                else:
+                    self.logger.error(f"Page {page} is partial, its body broke off {attempt} times ({e!r}): the cards after the break are missing")
+            except Exception as e:
+                self.logger.error(f"Error while parsing single category {page}: {e}")
+                return []
+        return []
+
+    async def stream_page(self, page: str, product_url: Channel) -> None:
+        category_id = None
+        prices, waiting, main_cards = {}, [], []
+        has_cards = received = False
+        stream = HtmlStream(extract=self.extract_streamed, tags=self.STREAM_TAGS)
+
+        async with aclosing(self.request_dispatcher.stream(page)) as chunks:
+            async for kind, value, warnings in self.stream_events(stream=stream, chunks=chunks):
+                for message in warnings:
+                    self.logger.warning(message)
+
+                if kind == 'category':
+                    category_id = self.product_category_id.get(value)
+                    if not category_id:
+                        self.logger.warning(f"Category '{value}' not found in product_category_id")
+                        return None
+                elif kind == 'price':
+                    prices.setdefault(*value)
+                elif kind == 'card' and value:
+                    has_cards = True
+                    waiting.append(value)
+                elif kind == 'main_card' and value:
+                    main_cards.append(value)
+                elif kind == 'chunk':
+                    received = True
+                    if category_id and waiting:
+                        warnings = []
+                        ready, waiting = self.join_prices(cards=waiting, prices=prices, warnings=warnings)
+                        for message in warnings:
+                            self.logger.warning(message)
+                        await self.hand_off(products=[ProductRecord(category_id=category_id, **card) for card in ready], product_url=product_url)
+
+        # the fetch failed, stream() has logged it
+        if not received:
+            return None
+        if not category_id:
+            self.logger.error(f"Failed to extract category name from page {page}")
+            return None
+
+        for card in waiting:
+            self.logger.warning(f"No price or invalid price for data-key {card['data_key']} (source_id: {card['source_id']})")
+        if not has_cards:
+            self.logger.warning(f"Using the special category cards of {page}")
+            await self.hand_off(products=[ProductRecord(category_id=category_id, **card) for card in main_cards], product_url=product_url)
+        return None
 
-        if all_products:
-            await self.db.insert_batch(all_products)
+    @staticmethod
+    async def stream_events(stream: HtmlStream, chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[str, object, list]]:
+        """The (kind, value, warnings) of the whole body, the ones close() finds at the end included; ('chunk', None, []) follows the events of each chunk."""
+        fed = False
+        async for chunk in chunks:
+            fed = True
+            for event in stream.feed(chunk):
+                yield event
+            yield 'chunk', None, []
+
+        if fed:
+            for event in stream.close():
+                yield event
+            yield 'chunk', None, []
+
+    @staticmethod
+    def join_prices(cards: list, prices: dict, warnings: list) -> tuple[list, list]:
+        """Cards whose price is known by now (ready) and the ones still waiting for their price span."""
+        ready, waiting = [], []
+        for card in cards:
+            price_text = card['price'] if card['price'] is not None else prices.get(card['data_key'])
+            if price_text is None:
+                waiting.append(card)
+            elif not price_text.isdigit():
+                warnings.append(f"No price or invalid price for data-key {card['data_key']} (source_id: {card['source_id']})")
+            else:
+                ready.append({key: value for key, value in card.items() if key != 'data_key'} | {'price': int(price_text)})
+        return ready, waiting
+
+    @staticmethod
+    def extract_streamed(element) -> Optional[tuple[str, object, list]]:
+        """HtmlStream callback: (kind, value, warnings) of a closed element, None for elements the listing doesn't use."""
+        classes = (element.get('class') or '').split()
+        warnings = []
+
+        if element.tag == 'li' and 'breadcrumb-item' in classes and 'active' in classes and element.get('aria-current') == 'page':
+            return 'category', normalize_text(element.text_content(), 'u'), warnings
+
+        if element.tag == 'span' and 'dvizh-shop-price' in classes:
+            # a span inside a card is read with its card
+            if any(ParserProducts.is_card(ancestor) for ancestor in element.iterancestors('div')):
+                return None
+            data_key = next((name[len(ParserProducts.PRICE_CLASS):] for name in classes if name.startswith(ParserProducts.PRICE_CLASS)), None)
+            if data_key is None:
+                return None
+            return 'price', (data_key, re.sub(r"\s+", "", element.text_content())), warnings
+
+        if element.tag == 'div' and 'card-deck' in classes and 'card-tiles' in classes:
+            return 'card', ParserProducts.extract_card_element(element, warnings), warnings
+
+        if element.tag == 'div' and 'maincard' in classes:
+            return 'main_card', ParserProducts.extract_main_card_element(element, warnings), warnings
 
-        # Info
-        self.logger.info("Products extracted and inserted into the database successfully!")
         return None
 
+    @staticmethod
+    def is_card(element) -> bool:
+        classes = (element.get('class') or '').split()
+        return 'maincard' in classes or ('card-deck' in classes and 'card-tiles' in classes)
+
+    @staticmethod
+    def with_class(*names: str) -> str:
+        # xpath for the css class selector .name
+        return ' and '.join(f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')" for name in names)
+
+    @staticmethod
+    def extract_card_element(card_block, warnings: list) -> Optional[dict]:
+        """extract_listing of a single lxml card; the price is None when its span is outside the card."""
+        with_class = ParserProducts.with_class
+
+        data_key = card_block.get("data-key")
+        if not data_key:
+            warnings.append("Card block missing data-key")
+            return None
+
+        card = next(iter(card_block.xpath(f".//div[{with_class('card')}]")), None)
+        if card is None:
+            warnings.append("Missing .card inside .card-deck")
+            return None
+
+        link_to_product = next(iter(card.xpath(".//a[starts-with(@href, '/product/')]")), None)
+        if link_to_product is None:
+            warnings.append("No product link found in card")
+            return None
+
+        link_to_source = link_to_product.get("href")
+        match = re.search(r"-(\d+)$", link_to_source)
+        if not match:
+            warnings.append(f"Can't extract source_id from href: {link_to_source}")
+            return None
+
+        source_id = int(match.group(1))
+
+        title_tag = next(iter(card.xpath(f".//div[{with_class('card-title')}]//a")), None)
+        if title_tag is None:
+            warnings.append(f"No title found for source_id: {source_id}")
+            return None
+        title = normalize_text(title_tag.text_content().strip(), 'u')
+
+        price_tag = next(iter(card_block.xpath(f".//span[{with_class('dvizh-shop-price', ParserProducts.PRICE_CLASS + data_key)}]")), None)
+
+        return {
+            'data_key': data_key,
+            'source_id': source_id,
+            'title': title,
+            'price': re.sub(r"\s+", "", price_tag.text_content()) if price_tag is not None else None,
+            'product_url': f"{ParserProducts.url}{link_to_source}"
+        }
+
+    @staticmethod
+    def extract_main_card_element(card, warnings: list) -> Optional[dict]:
+        """parse_special_category of a single lxml div.maincard."""
+        with_class = ParserProducts.with_class
+
+        product_code_link = next(iter(card.xpath(f".//div[{with_class('col-6', 'mcard-small')}]/small")), None)
+        product_code = re.search(r"(\d+)", product_code_link.text_content()) if product_code_link is not None else None
+        if not product_code:
+            warnings.append("No product code found on card method : extract_main_card_element")
+            return None
+
+        title_link = next(iter(card.xpath(f".//div[{with_class('card-title')}]//a[starts-with(@href, '/product/')]")), None)
+        if title_link is None:
+            warnings.append(f"No product title found on card in method : extract_main_card_element {product_code.group(1)}")
+            return None
+
+        price_link = next(iter(card.xpath(f".//span[{with_class('dvizh-shop-price')}]")), None)
+        price = re.sub(r"\s+", "", price_link.text_content()) if price_link is not None else None
+        if not price or not price.isdigit():
+            warnings.append(f"No price found on card in method : extract_main_card_element {product_code.group(1)}")
+            return None
+
+        product_name = title_link.get('href')
+        if not product_name:
+            warnings.append(f"No product name found on card in method : extract_main_card_element {product_code.group(1)}")
+            return None
+
+        return {
+            'source_id': int(product_code.group(1)),
+            'title': title_link.text_content().strip(),
+            'price': int(price),
+            'product_url': f"{ParserProducts.url}{product_name}"
+        }
+
     async def parse_single_category(self, page: str) -> list:
         try :
-            async with self.request_dispatcher.get(page) as response:
-                if not response.ok:
-                    self.logger.error(f"Failed to fetch page {page}: {response.status}")
-                    return []
-                response = await response.text()
+            response = await self.request_dispatcher.get_text(page)
+            if response is None:
+                return []
 
-            soup = self.get_bs4_object(response, 'html.parser')
+            listing = await self.html_executor.run(self.extract_listing, html_text=response)
+            for message in listing['warnings']:
+                self.logger.warning(message)
 
             # 1. category name
-            category_link = soup.select_one('li.breadcrumb-item.active[aria-current="page"]')
-            category_name = normalize_text(category_link.text, 'u') if category_link else None
-
+            category_name = listing['category_name']
             if not category_name:
                 self.logger.error(f"Failed to extract category name from page {page}")
                 return []
@@ -116,100 +341,109 @@ class ParserProducts(BaseScraperSync):
                 self.logger.warning(f"Category '{category_name}' not found in product_category_id")
                 return []
 
-            # 2. find cards with products
-            card_blocks = soup.select("div.card-deck.card-tiles")
-            if not card_blocks:
-                self.logger.warning(f"Sending soup to method : parse_special_category")
-                # Special category html handling
-                return await self.parse_special_category(soup= soup)
-
-            products = []
-
-            for card_block in card_blocks:
-                # data-key → Needed to extract price
-                data_key = card_block.get("data-key")
-                if not data_key:
-                    self.logger.warning("Card block missing data-key")
-                    continue
-
-                card = card_block.select_one("div.card")
-                if not card:
-                    self.logger.warning("Missing .card inside .card-deck")
-                    continue
-
-                # 1. link to product
-                link_to_product = card.select_one("a[href^='/product/']")
-                if not link_to_product:
-                    self.logger.warning("No product link found in card")
-                    continue
+            return [ProductRecord(category_id=category_id, **card) for card in listing['cards']]
+        except Exception as e:
+            self.logger.error(f"Error while parsing single category {page}: {e}")
+            return []
 
-                link_to_source = link_to_product.get("href")
-                match = re.search(r"-(\d+)$", link_to_source)
-                if not match:
-                    self.logger.warning(f"Can't extract source_id from href: {link_to_source}")
-                    continue
+    @staticmethod
+    def extract_listing(html_text: str) -> dict:
+        """Runs in the html executor: plain fields only, Product is built by the caller."""
+        soup = BeautifulSoup(html_text, html_parser())
+        warnings = []
+
+        category_link = soup.select_one('li.breadcrumb-item.active[aria-current="page"]')
+        category_name = normalize_text(category_link.text, 'u') if category_link else None
+        if not category_name:
+            return {'category_name': None, 'cards': [], 'warnings': warnings}
+
+        # 2. find cards with products
+        card_blocks = soup.select("div.card-deck.card-tiles")
+        if not card_blocks:
+            warnings.append(f"Sending soup to method : parse_special_category")
+            # Special category html handling
+            cards = ParserProducts.parse_special_category(soup=soup, category_name=category_name, warnings=warnings)
+            return {'category_name': category_name, 'cards': cards, 'warnings': warnings}
+
+        cards = []
+        prices = ParserProducts.price_index(soup)
+
+        for card_block in card_blocks:
+            # data-key → Needed to extract price
+            data_key = card_block.get("data-key")
+            if not data_key:
+                warnings.append("Card block missing data-key")
+                continue
 
-                source_id = int(match.group(1))
+            card = card_block.select_one("div.card")
+            if not card:
+                warnings.append("Missing .card inside .card-deck")
+                continue
 
-                # 2. title
-                title_tag = card.select_one("div.card-title a")
-                if not title_tag:
-                    self.logger.warning(f"No title found for source_id: {source_id}")
-                    continue
-                title = normalize_text(title_tag.text.strip(), 'u')
+            # 1. link to product
+            link_to_product = card.select_one("a[href^='/product/']")
+            if not link_to_product:
+                warnings.append("No product link found in card")
+                continue
 
-                # 3. price
-                price_tag = soup.select_one(f"span.dvizh-shop-price.dvizh-shop-price-{data_key}")
-                price_text = re.sub(r"\s+", "", price_tag.text) if price_tag else None
+            link_to_source = link_to_product.get("href")
+            match = re.search(r"-(\d+)$", link_to_source)
+            if not match:
+                warnings.append(f"Can't extract source_id from href: {link_to_source}")
+                continue
 
-                if not price_text or not price_text.isdigit():
-                    self.logger.warning(f"No price or invalid price for data-key {data_key} (source_id: {source_id})")
-                    continue
+            source_id = int(match.group(1))
 
-                # 4. URL to product
-                product_url = f"{self.url}{link_to_source}"
+            # 2. title
+            title_tag = card.select_one("div.card-title a")
+            if not title_tag:
+                warnings.append(f"No title found for source_id: {source_id}")
+                continue
+            title = normalize_text(title_tag.text.strip(), 'u')
 
-                if not product_url:
-                    self.logger.warning(f"Product URL is empty for source_id: {source_id}")
-                    continue
+            # 3. price
+            price_text = prices.get(data_key)
 
-                product = await Product.fill_products(
-                    source_id=source_id,
-                    title=title,
-                    category_id=category_id,
-                    price=int(price_text),
-                    product_url=product_url
-                )
-                products.append(product)
-                self.product_url.append(product_url)
+            if not price_text or not price_text.isdigit():
+                warnings.append(f"No price or invalid price for data-key {data_key} (source_id: {source_id})")
+                continue
 
-            return products
-        except Exception as e:
-            self.logger.error(f"Error while parsing single category {page}: {e}")
-            return []
+            # 4. URL to product
+            product_url = f"{ParserProducts.url}{link_to_source}"
 
+            if not product_url:
+                warnings.append(f"Product URL is empty for source_id: {source_id}")
+                continue
 
-    async def parse_special_category(self, soup: BeautifulSoup) -> list:
+            cards.append({
+                'source_id': source_id,
+                'title': title,
+                'price': int(price_text),
+                'product_url': product_url
+            })
+
+        return {'category_name': category_name, 'cards': cards, 'warnings': warnings}
+
+    @staticmethod
+    def price_index(soup: BeautifulSoup) -> dict:
+        """data-key -> price text of the page in one pass; a select_one per card rescans the whole ?limit=0 page."""
+        prices = {}
+        for price_tag in soup.select("span.dvizh-shop-price"):
+            for class_name in price_tag.get("class", ()):
+                if class_name.startswith(ParserProducts.PRICE_CLASS):
+                    # the first span of a key wins, as with select_one
+                    prices.setdefault(class_name[len(ParserProducts.PRICE_CLASS):], re.sub(r"\s+", "", price_tag.text))
+        return prices
+
+
+    @staticmethod
+    def parse_special_category(soup: BeautifulSoup, category_name: str, warnings: list) -> list:
         try :
-            # link to category name (String)
-            category_link = soup.select_one('li.breadcrumb-item.active[aria-current="page"]')
-            category_name = normalize_text(category_link.text.strip(), 'u') if category_link else None
-
-            if not category_name:
-                self.logger.error(f"Failed to extract category name from soup in method : parse_special_category")
-                return []
-
-            # get category id from product_category
-            category_id = self.product_category_id.get(category_name)
-
-            if not category_id:
-                self.logger.warning(f"Not found category_id for category in method : parse_special_category {category_name}")
-                return []
-
             # take elements
             cards = soup.select("div.maincard")
             if not cards:
-                self.logger.warning(f"No product cards found in soup im method : parse_special_category {category_name} >> reason : {soup.select_one('#w1 > div').text}")
+                reason = soup.select_one('#w1 > div')
+                warnings.append(f"No product cards found in soup im method : parse_special_category {category_name} >> reason : {reason.text if reason else None}")
                 return []
 
             products = []
@@ -220,7 +454,7 @@ class ParserProducts(BaseScraperSync):
                 product_code = re.search(r"(\d+)", product_code_link.text) if product_code_link else None
 
                 if not product_code:
-                    self.logger.warning(f"No product code found on card method : parse_special_category {card}")
+                    warnings.append(f"No product code found on card method : parse_special_category {card}")
                     continue
 
                 product_code = int(product_code.group(1))
@@ -228,7 +462,7 @@ class ParserProducts(BaseScraperSync):
                 # 2. take title
                 title_link = card.select_one("div.card-title a[href^='/product/']")
                 if not title_link:
-                    self.logger.warning(f"No product title found on card in method : parse_special_category {card}")
+                    warnings.append(f"No product title found on card in method : parse_special_category {card}")
                     continue
 
                 title = title_link.text.strip()
@@ -237,28 +471,23 @@ class ParserProducts(BaseScraperSync):
                 price_link = card.select_one("span.dvizh-shop-price")
                 price = re.sub(r"\s+", "", price_link.text) if price_link else None
                 if not price:
-                    self.logger.warning(f"No price found on card in method : parse_special_category  {card}")
+                    warnings.append(f"No price found on card in method : parse_special_category  {card}")
                     continue
 
                 # 4. take product_url
                 product_name = title_link.get('href')
                 if not product_name:
-                    self.logger.warning(f"No product name found on card in method : parse_special_category {card}")
+                    warnings.append(f"No product name found on card in method : parse_special_category {card}")
                     continue
 
-                product_url = f"{self.url}{product_name}"
-
-                product = await Product.fill_products(
-                    source_id=product_code,
-                    title=title,
-                    category_id=category_id,
-                    price=int(price),
-                    product_url=product_url
-                )
-                products.append(product)
-                self.product_url.append(product_url)
+                products.append({
+                    'source_id': product_code,
+                    'title': title,
+                    'price': int(price),
+                    'product_url': f"{ParserProducts.url}{product_name}"
+                })
 
             return products
         except Exception as e:
-            self.logger.error(f"Error while parsing special category: {e}")
+            warnings.append(f"Error while parsing special category: {e}")
             return []
@@ -0,0 +1,50 @@
+import asyncio
+
+from utils import Channel
+
+
+def test_items_come_out_in_order_until_close():
+    async def run():
+        channel = Channel(maxsize=10)
+        for item in range(3):
+            await channel.put(item)
+        await channel.close()
+        return [item async for item in channel]
+
+    assert asyncio.run(run()) == [0, 1, 2]
+
+
+def test_put_waits_for_the_consumer():
+    async def run():
+        channel = Channel(maxsize=2)
+        await channel.put('a')
+        await channel.put('b')
+
+        blocked = asyncio.ensure_future(channel.put('c'))
+        await asyncio.sleep(0.01)
+        waited = not blocked.done()
+
+        assert await channel.__anext__() == 'a'
+        await asyncio.wait_for(blocked, timeout=1)
+        return waited
+
+    assert asyncio.run(run())
+
+
+def test_producer_and_consumer_overlap():
+    async def produce(channel):
+        try:
+            for item in range(100):
+                await channel.put(item)
+        finally:
+            await channel.close()
+
+    async def consume(channel):
+        return [item async for item in channel]
+
+    async def run():
+        channel = Channel(maxsize=5)
+        _, consumed = await asyncio.gather(produce(channel), consume(channel))
+        return consumed
+
+    assert asyncio.run(run()) == list(range(100))
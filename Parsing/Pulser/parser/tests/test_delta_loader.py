@@ -0,0 +1,97 @@
+import asyncio
+from datetime import datetime
+from decimal import Decimal
+
+from conftest import CONNECTION
+from models import PriceHistory, PriceHistoryRecord, Product, ProductRecord
+from utils import DbWriter, DeltaLoader
+
+
+def product(price: int) -> ProductRecord:
+    return ProductRecord(1001, 'Box 40x30', 7, price, 'https://pulser.kz/product/box-40x30')
+
+
+def delta_loader(logger, pool, stored=()) -> DeltaLoader:
+    loader = DeltaLoader(models=(Product,), logger=logger, **CONNECTION)
+    loader.pool = pool
+    pool.connection.rows = list(stored)
+    return loader
+
+
+def open_loader(loader: DeltaLoader) -> None:
+    # open() without create_pool: the fake pool is in place already
+    async def run():
+        for model in loader.models:
+            loader.fingerprints[model] = await loader.load_fingerprints(model)
+            loader.skipped[model] = 0
+    asyncio.run(run())
+
+
+def test_key_is_the_unique_constraint():
+    assert DeltaLoader.key(Product) == ('source_id',)
+
+
+def test_fingerprint_ignores_numeric_representation():
+    assert DeltaLoader.fingerprint(('A-1', Decimal('12.50'))) == DeltaLoader.fingerprint(('A-1', 12.5))
+    assert DeltaLoader.fingerprint(('A-1', 12.5)) != DeltaLoader.fingerprint(('A-1', 12.51))
+
+
+def test_unchanged_rows_are_not_sent(logger, pool):
+    loader = delta_loader(logger, pool, stored=[tuple(product(1250))])
+    open_loader(loader)
+
+    written = asyncio.run(loader.copy_records(Product, [product(1250)]))
+
+    assert written == 0
+    assert loader.skipped[Product] == 1
+    assert pool.connection.copied == []
+
+
+def test_changed_rows_are_upserted_once_per_key(logger, pool):
+    loader = delta_loader(logger, pool, stored=[tuple(product(1250))])
+    open_loader(loader)
+
+    written = asyncio.run(loader.copy_records(Product, [product(1300), product(1400)]))
+
+    assert written == 1
+    (staging, records, columns), = pool.connection.copied
+    assert staging == 'delta_pulser_products'
+    assert records == [product(1400)]
+    assert 'ON CONFLICT (source_id)' in pool.connection.executed[-1][0]
+
+
+def test_price_history_is_copied_in_delta_mode(logger, pool):
+    # the history table is not a delta model: no key, autoincrement id, written by the same DbWriter
+    loader = delta_loader(logger, pool)
+    open_loader(loader)
+    record = PriceHistoryRecord(1001, None, 1250, datetime(2026, 10, 1, 3, 0))
+
+    async def run():
+        writer = DbWriter(loader=loader, logger=logger)
+        await writer.put(PriceHistory, record)
+        await writer.close()
+    asyncio.run(run())
+
+    assert pool.connection.copied == [('pulser_price_history', [record], PriceHistoryRecord._fields)]
+
+
+def test_price_history_is_rewound_in_delta_mode(logger, pool):
+    loader = delta_loader(logger, pool)
+
+    asyncio.run(loader.rewind(PriceHistory, 'source_id', ['1001']))
+    dropped = asyncio.run(loader.rewind(Product, 'source_id', ['1001']))
+
+    assert dropped == 0
+    (query, args), = pool.connection.executed
+    assert query.startswith('DELETE FROM marketplaces.pulser_price_history')
+    assert args == (['1001'],)
+
+
+def test_ensure_key_leaves_primary_keys_alone(logger, pool):
+    # source_id is the primary key, the upserts conflict on it without a unique index of their own
+    loader = delta_loader(logger, pool)
+
+    asyncio.run(loader.ensure_key(Product))
+
+    assert DeltaLoader.key(Product) == ('source_id',)
+    assert pool.connection.executed == []
@@ -0,0 +1,68 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from models import CharacteristicRecord, DetailState, ProductRecord
+from utils import DetailRefresh, Spool
+
+
+class Loader:
+    def __init__(self, pool):
+        self.pool = pool
+
+
+def product(price: int) -> ProductRecord:
+    return ProductRecord(1001, 'Box 40x30', 7, price, 'https://pulser.kz/product/box-40x30')
+
+
+def detail_refresh(logger, pool, **options) -> DetailRefresh:
+    return DetailRefresh(model=DetailState, loader=Loader(pool), logger=logger, skipped=Spool(), **options)
+
+
+def test_unchanged_recent_products_are_skipped(logger, pool):
+    refresh = detail_refresh(logger, pool)
+    refresh.state[1001] = (DetailRefresh.fingerprint('Box 40x30', 1250, product(1250).product_url), refresh.started_at - timedelta(days=1))
+
+    assert not refresh.wanted(product(1250))
+    assert refresh.wanted(product(1300))
+    assert list(refresh.skipped) == [1001]
+
+
+def test_old_or_disabled_state_is_fetched_again(logger, pool):
+    fingerprint = DetailRefresh.fingerprint('Box 40x30', 1250, product(1250).product_url)
+
+    refresh = detail_refresh(logger, pool, max_age_days=7)
+    refresh.state[1001] = (fingerprint, datetime.now() - timedelta(days=8))
+    assert refresh.wanted(product(1250))
+
+    refresh = detail_refresh(logger, pool, enabled=False)
+    refresh.state[1001] = (fingerprint, datetime.now())
+    assert refresh.wanted(product(1250))
+
+
+def test_done_stores_the_page_it_was_given(logger, pool):
+    refresh = detail_refresh(logger, pool)
+    refresh.wanted(product(1250))
+    characteristics = [CharacteristicRecord(1001, 'ЦВЕТ', 'БЕЛЫЙ', 3)]
+    image_urls = ['https://pulser.kz/images/1.jpg', 'https://pulser.kz/images/2.jpg']
+
+    asyncio.run(refresh.done(product(1250).product_url, characteristics, image_urls))
+    asyncio.run(refresh.done('https://pulser.kz/product/not-wanted', characteristics, image_urls))
+    asyncio.run(refresh.flush())
+
+    (query, (source_id, stored_characteristics, stored_images)), = pool.connection.executed
+    assert query.startswith('INSERT INTO marketplaces.pulser_detail_state')
+    assert (source_id, json.loads(stored_characteristics), json.loads(stored_images)) == (1001, [['ЦВЕТ', 'БЕЛЫЙ', 3]], image_urls)
+    assert refresh.done_ids == {1001: refresh.fingerprint('Box 40x30', 1250, product(1250).product_url)}
+
+
+def test_stored_pages_of_the_skipped_products(logger, pool):
+    refresh = detail_refresh(logger, pool)
+    refresh.skipped.append(1001)
+    pool.connection.rows = [(1001, json.dumps([['ЦВЕТ', 'БЕЛЫЙ', 3]]), json.dumps(['https://pulser.kz/images/1.jpg']))]
+
+    async def run():
+        return [page async for page in refresh.stored()]
+
+    assert asyncio.run(run()) == [(1001, [['ЦВЕТ', 'БЕЛЫЙ', 3]], ['https://pulser.kz/images/1.jpg'])]
+    assert refresh.replayed == 1
@@ -0,0 +1,74 @@
+import asyncio
+
+from bs4 import BeautifulSoup
+
+from benchmark_listing import CARD, PRICE, PerCardPrices, synthetic_page
+from parsers.parser_products import ParserProducts
+from utils import HtmlStream, html_parser
+
+
+def streamed_cards(html_text: str, chunk_size: int) -> tuple:
+    """category name and cards of a page fed to HtmlStream in chunks of chunk_size bytes."""
+    body = html_text.encode('utf-8')
+
+    async def chunks():
+        for start in range(0, len(body), chunk_size):
+            yield body[start:start + chunk_size]
+
+    async def collect():
+        category, prices, cards = None, {}, []
+        stream = HtmlStream(extract=ParserProducts.extract_streamed, tags=ParserProducts.STREAM_TAGS)
+        async for kind, value, warnings in ParserProducts.stream_events(stream=stream, chunks=chunks()):
+            if kind == 'category':
+                category = value
+            elif kind == 'price':
+                prices.setdefault(*value)
+            elif kind == 'card' and value:
+                cards.append(value)
+        ready, waiting = ParserProducts.join_prices(cards=cards, prices=prices, warnings=[])
+        assert waiting == []
+        return category, ready
+
+    return asyncio.run(collect())
+
+
+def test_price_index_matches_per_card_lookup():
+    html_text = synthetic_page(50) + PRICE.format(key=7, price=1)
+    soup = BeautifulSoup(html_text, html_parser())
+
+    prices = ParserProducts.price_index(soup)
+    lookup = PerCardPrices(soup)
+
+    assert prices == {str(key): lookup.get(str(key)) for key in range(1, 51)}
+    # the first span of a key wins
+    assert prices['7'] == '1007'
+
+
+def test_extract_listing_same_cards_with_either_lookup():
+    html_text = synthetic_page(50)
+
+    cards = ParserProducts.extract_listing(html_text)['cards']
+    price_index = ParserProducts.price_index
+    ParserProducts.price_index = staticmethod(PerCardPrices)
+    try:
+        assert ParserProducts.extract_listing(html_text)['cards'] == cards
+    finally:
+        ParserProducts.price_index = staticmethod(price_index)
+
+    assert len(cards) == 50
+    assert cards[0] == {'source_id': 1, 'title': 'Item 1', 'price': 1001, 'product_url': 'https://pulser.kz/product/item-1'}
+
+
+def test_streamed_cards_match_extract_listing():
+    html_text = synthetic_page(40)
+    listing = ParserProducts.extract_listing(html_text)
+
+    for chunk_size in (7, 256, len(html_text)):
+        assert streamed_cards(html_text, chunk_size) == (listing['category_name'], listing['cards'])
+
+
+def test_streamed_price_inside_card():
+    card = CARD.format(key=3).replace('</div></div>', PRICE.format(key=3, price=990) + '</div></div>', 1)
+    html_text = synthetic_page(2).replace('</body>', card + '</body>')
+
+    assert streamed_cards(html_text, 32) == ('Category', ParserProducts.extract_listing(html_text)['cards'])
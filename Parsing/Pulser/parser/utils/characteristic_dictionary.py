@@ -0,0 +1,58 @@
+import asyncio
+from logging import Logger
+from typing import Sequence
+
+from .bulk_loader import BulkLoader
+
+
+class CharacteristicDictionary:
+    """
+    Interned characteristic names. The name -> id map is read from the dictionary table once in
+    open(); intern() returns ids from memory and inserts the unknown names of a page in one
+    statement, so characteristic rows carry an integer id instead of repeating the name.
+    """
+
+    def __init__(self, model, loader: BulkLoader, logger: Logger):
+        self.model = model
+        self.loader: BulkLoader = loader
+        self.logger: Logger = logger
+        self.ids: dict = {}
+        self.added: int = 0
+        # two pages with the same new name must not both pay for the round trip
+        self.lock: asyncio.Lock = asyncio.Lock()
+
+    async def open(self) -> None:
+        table = self.model.__table__
+        await self.loader.create_table(self.model)
+        async with self.loader.pool.acquire() as connection:
+            rows = await connection.fetch(f'SELECT id, name FROM {table.schema}.{table.name}')
+
+        self.ids = {row['name']: row['id'] for row in rows}
+        self.logger.info(f"{table.name}: {len(self.ids)} characteristic names loaded")
+
+    async def intern(self, names: Sequence[str]) -> list:
+        if any(name not in self.ids for name in names):
+            async with self.lock:
+                missing = list(dict.fromkeys(name for name in names if name not in self.ids))
+                if missing:
+                    await self.extend(missing)
+
+        return [self.ids[name] for name in names]
+
+    async def extend(self, names: list) -> None:
+        table = self.model.__table__
+        target = f'{table.schema}.{table.name}'
+        async with self.loader.pool.acquire() as connection:
+            # another process may have added some of them, ON CONFLICT keeps its ids and RETURNING skips them
+            added = await connection.fetch(f'INSERT INTO {target} (name) SELECT unnest($1::text[]) ON CONFLICT (name) DO NOTHING RETURNING id, name', names)
+            rows = list(added)
+            existing = set(names) - {row['name'] for row in added}
+            if existing:
+                rows += await connection.fetch(f'SELECT id, name FROM {target} WHERE name = ANY($1::text[])', list(existing))
+
+        for row in rows:
+            self.ids[row['name']] = row['id']
+        self.added += len(added)
+
+    def report(self) -> None:
+        self.logger.info(f"{self.model.__tablename__}: {len(self.ids)} names, {self.added} added in this run")
@@ -0,0 +1,107 @@
+import asyncio
+from collections import deque
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable, Optional, Union
+from urllib.parse import urlparse
+
+
+class CrawlPool:
+    """
+    Sliding-window scheduler: each imap() / crawl() call keeps up to `window` coroutines of its own in
+    flight and starts the next one as soon as any of them finishes, instead of waiting for a whole
+    gather() slice. Stages that run at the same time each have their own window, so the total in flight
+    is the sum of their windows; the host semaphores of `per_host_limit` are the only cap shared by every
+    stage that uses the same pool.
+
+    `func` is expected not to raise: an exception propagates out of the iteration and cancels every other
+    coroutine of the call, which ends the stage. The parsers catch and log per item and return an empty
+    result instead, so one bad page costs only that page.
+    """
+
+    def __init__(self, window: int = 20, per_host_limit: Optional[int] = None):
+        # default window of a call that does not pass its own
+        self.window: int = window
+        self.per_host_limit: Optional[int] = per_host_limit
+        self._hosts: dict[str, asyncio.Semaphore] = {}
+
+    async def imap(self, func: Callable[[Any], Awaitable[Any]], items: Union[Iterable, AsyncIterable], window: Optional[int] = None, key: Optional[Callable[[Any], str]] = None) -> AsyncIterator:
+        """
+        Yields func(item) results in completion order. `items` may be a list or an async iterator.
+        An exception of func is raised here and the other coroutines of the call are cancelled.
+        """
+        window = window or self.window
+        source = items.__aiter__() if hasattr(items, '__aiter__') else self.__to_async(items).__aiter__()
+        pending = set()
+        feed = None
+
+        try:
+            while True:
+                if feed is None and source is not None and len(pending) < window:
+                    feed = asyncio.ensure_future(source.__anext__())
+
+                waiting = pending | {feed} if feed is not None else pending
+                if not waiting:
+                    return
+
+                done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+
+                if feed in done:
+                    done.discard(feed)
+                    try:
+                        item = feed.result()
+                        pending.add(asyncio.ensure_future(self.__run(func, item, key)))
+                    except StopAsyncIteration:
+                        source = None
+                    feed = None
+
+                for task in done:
+                    pending.discard(task)
+                    yield task.result()
+        finally:
+            for task in pending | ({feed} if feed is not None else set()):
+                task.cancel()
+
+    async def crawl(self, func: Callable[[Any], Awaitable[tuple[Any, Iterable]]], seeds: Iterable, window: Optional[int] = None, key: Optional[Callable[[Any], str]] = None) -> AsyncIterator:
+        """
+        Like imap, but func returns (result, follow_ups) and follow-ups are scheduled in the same window.
+        An exception of func is raised here and the other coroutines of the call are cancelled.
+        """
+        window = window or self.window
+        frontier = deque(seeds)
+        pending = set()
+
+        try:
+            while frontier or pending:
+                while frontier and len(pending) < window:
+                    pending.add(asyncio.ensure_future(self.__run(func, frontier.popleft(), key)))
+
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    result, follow_ups = task.result()
+                    frontier.extend(follow_ups or ())
+                    yield result
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def __run(self, func: Callable[[Any], Awaitable[Any]], item: Any, key: Optional[Callable[[Any], str]]) -> Any:
+        host = self.__host_semaphore(key(item) if key else item)
+        if host is None:
+            return await func(item)
+
+        async with host:
+            return await func(item)
+
+    def __host_semaphore(self, url: Any) -> Optional[asyncio.Semaphore]:
+        if not self.per_host_limit or not isinstance(url, str):
+            return None
+
+        host = urlparse(url).netloc
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._hosts[host]
+
+    @staticmethod
+    async def __to_async(items: Iterable) -> AsyncIterator:
+        for item in items:
+            yield item
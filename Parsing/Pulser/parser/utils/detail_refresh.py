@@ -0,0 +1,129 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+from logging import Logger
+from typing import AsyncIterator
+
+from .bulk_loader import BulkLoader
+from .spool import Spool
+
+
+class DetailRefresh:
+    """
+    Refresh policy of the detail stage. The listing fingerprint (title, price, url) each product had when
+    its detail page was last parsed is read from the state table in open(); wanted() lets a product through
+    only when it is new, its fingerprint changed or its detail page is older than `max_age_days`, so
+    unchanged products are refreshed once per cadence, spread over the runs. With enabled=False every
+    product is wanted.
+
+    The Talend jobs empty the product tables after every run, so the characteristics and pictures of a
+    skipped product cannot be kept in the live tables. The state table holds what the page gave instead:
+    done() stores the characteristics and image urls of a parsed page, stored() reads them back for the
+    skipped products and save() writes the fingerprints once the rows are in. Works in every load mode.
+    """
+    FLUSH_EVERY = 1000
+    REPLAY_BATCH = 1000
+
+    def __init__(self, model, loader: BulkLoader, logger: Logger, skipped: Spool, enabled: bool = True, max_age_days: float = 7.0):
+        self.model = model
+        self.loader: BulkLoader = loader
+        self.logger: Logger = logger
+        self.enabled: bool = enabled
+        self.max_age: timedelta = timedelta(days=max_age_days)
+        # source_id -> (fingerprint, fetched_at) of the last parsed detail page
+        self.state: dict = {}
+        # product url -> (source_id, fingerprint) of the products sent to the detail stage
+        self.wanted_urls: dict = {}
+        self.done_ids: dict = {}
+        # source_ids whose stored pages are replayed, as many as the catalog on a quiet night
+        self.skipped: Spool = skipped
+        self.replayed: int = 0
+        self.started_at: datetime = datetime.now()
+        # parsed pages waiting to be stored
+        self.pages: list = []
+
+    async def open(self) -> None:
+        table = self.model.__table__
+        await self.loader.create_table(self.model)
+        for column in ('characteristics', 'pictures'):
+            await self.loader.add_column(self.model, column)
+        async with self.loader.pool.acquire() as connection:
+            async with connection.transaction():
+                # a product without stored rows is always fetched, there would be nothing to replay for it
+                query = f'SELECT source_id, fingerprint, fetched_at FROM {table.schema}.{table.name} WHERE characteristics IS NOT NULL'
+                async for row in connection.cursor(query, prefetch=10000):
+                    self.state[row[0]] = (row[1], row[2])
+
+        self.logger.info(f"{table.name}: detail state of {len(self.state)} products loaded")
+
+    def wanted(self, product: tuple) -> bool:
+        fingerprint = self.fingerprint(product.title, product.price, product.product_url)
+        stored = self.state.get(product.source_id)
+        if self.enabled and stored and stored[0] == fingerprint and self.started_at - stored[1] < self.max_age:
+            self.skipped.append(product.source_id)
+            return False
+
+        self.wanted_urls[product.product_url] = (product.source_id, fingerprint)
+        return True
+
+    async def done(self, url: str, characteristics: list, image_urls: list) -> None:
+        """Marks a parsed page and stores what it gave, before its pictures are downloaded."""
+        if url not in self.wanted_urls:
+            return None
+
+        source_id, fingerprint = self.wanted_urls.pop(url)
+        self.done_ids[source_id] = fingerprint
+        self.pages.append((source_id, json.dumps([list(record[1:]) for record in characteristics]), json.dumps(image_urls)))
+        if len(self.pages) >= self.FLUSH_EVERY:
+            await self.flush()
+
+    async def flush(self) -> None:
+        pages, self.pages = self.pages, []
+        if not pages:
+            return None
+
+        table = self.model.__table__
+        async with self.loader.pool.acquire() as connection:
+            await connection.executemany(
+                f'INSERT INTO {table.schema}.{table.name} (source_id, characteristics, pictures) VALUES ($1, $2::jsonb, $3::jsonb) '
+                f'ON CONFLICT (source_id) DO UPDATE SET characteristics = EXCLUDED.characteristics, pictures = EXCLUDED.pictures',
+                pages
+            )
+
+    async def stored(self) -> AsyncIterator[tuple[int, list, list]]:
+        """
+        (source_id, [characteristic, value, characteristic_id] lists, image urls) of the skipped products,
+        read once the listing is done. The pictures go through the media stage like those of a fetched page.
+        """
+        table = self.model.__table__
+        async with self.loader.pool.acquire() as connection:
+            for batch in self.skipped.batches(self.REPLAY_BATCH):
+                rows = await connection.fetch(f'SELECT source_id, characteristics, pictures FROM {table.schema}.{table.name} WHERE source_id = ANY($1::integer[])', batch)
+                self.replayed += len(rows)
+                for source_id, characteristics, image_urls in rows:
+                    yield source_id, json.loads(characteristics), json.loads(image_urls)
+
+    async def save(self) -> None:
+        await self.flush()
+        table = self.model.__table__
+        async with self.loader.pool.acquire() as connection:
+            await connection.execute(
+                f'INSERT INTO {table.schema}.{table.name} (source_id, fingerprint, fetched_at) '
+                f'SELECT unnest($1::integer[]), unnest($2::text[]), $3 '
+                f'ON CONFLICT (source_id) DO UPDATE SET fingerprint = EXCLUDED.fingerprint, fetched_at = EXCLUDED.fetched_at',
+                list(self.done_ids), list(self.done_ids.values()), self.started_at
+            )
+
+    def close(self) -> None:
+        self.skipped.close()
+
+    def report(self) -> None:
+        wanted = len(self.done_ids) + len(self.wanted_urls)
+        self.logger.info(
+            f"{self.model.__tablename__}: {wanted} detail pages requested, {len(self.skipped)} unchanged products skipped "
+            f"({self.replayed} replayed from the state table), {len(self.wanted_urls)} failed"
+        )
+
+    @staticmethod
+    def fingerprint(*values) -> str:
+        return hashlib.blake2b(repr(values).encode('utf-8'), digest_size=8).hexdigest()
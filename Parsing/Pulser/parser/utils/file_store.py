@@ -0,0 +1,53 @@
+import hashlib
+import os
+import uuid
+from typing import Optional
+
+import aiofiles
+import aiofiles.os
+from aiohttp import ClientResponse
+
+
+class FileStore:
+    """
+    Streams response bodies to disk. Chunks are hashed while they are written to a temp file,
+    then the file is renamed atomically to a content-addressed name, so the body is never held in memory.
+    File names keep the uuid5 shape, but the SHA-1 is now taken over the raw bytes instead of str(content):
+    every file stored before gets a new name and is stored once more the first time it is downloaded again.
+    """
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, base_path: str, folder: str):
+        self.base_path: str = base_path
+        self.folder: str = folder
+
+    async def save(self, response: ClientResponse, path: str, extension: str) -> Optional[str]:
+        directory = os.path.join(self.base_path, self.folder, path)
+        await aiofiles.os.makedirs(directory, exist_ok=True)
+
+        hasher = hashlib.sha1(uuid.NAMESPACE_URL.bytes)
+        temp_path = os.path.join(directory, f".{uuid.uuid4().hex}.part")
+
+        try:
+            async with aiofiles.open(temp_path, 'wb') as file:
+                async for chunk in response.content.iter_chunked(self.CHUNK_SIZE):
+                    hasher.update(chunk)
+                    await file.write(chunk)
+
+            filename = f"{uuid.UUID(bytes=hasher.digest()[:16], version=5)}{extension}"
+            target_path = os.path.join(directory, filename)
+
+            # same content already stored: drop the temp file instead of rewriting it
+            if await aiofiles.os.path.exists(target_path):
+                await aiofiles.os.remove(temp_path)
+            else:
+                await aiofiles.os.replace(temp_path, target_path)
+        except BaseException:
+            if await aiofiles.os.path.exists(temp_path):
+                await aiofiles.os.remove(temp_path)
+            raise
+
+        return os.path.join(self.folder, path, filename)
+
+    async def exists(self, path: str) -> bool:
+        return await aiofiles.os.path.exists(os.path.join(self.base_path, path))
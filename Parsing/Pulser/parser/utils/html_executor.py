@@ -0,0 +1,42 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+from .markup import configure_html_parser, html_parser
+
+
+class ExtractionError(Exception):
+    """A required field is missing on the page; the message is logged by the caller."""
+
+
+class HtmlExecutor:
+    """
+    Runs pure extract functions (html text in, plain records out). With `workers` > 0 they go to a
+    ProcessPoolExecutor, so a large page is tree-built on another core while the loop keeps reading
+    responses. With 0 workers they run inline on the loop. Workers use the html_parser() of the process
+    that creates the executor.
+    """
+
+    def __init__(self, workers: int = 0):
+        self.workers: int = workers
+        # forkserver: workers don't inherit the loop, aiohttp session and gRPC threads of the crawler
+        # and re-import utils.markup, the initializer hands them the configured builder
+        self.pool: Optional[ProcessPoolExecutor] = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('forkserver'),
+            initializer=configure_html_parser,
+            initargs=(html_parser(),),
+        ) if workers else None
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        if self.pool is None:
+            return func(*args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, partial(func, *args, **kwargs))
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
@@ -0,0 +1,40 @@
+from typing import Any, Callable, Iterable, Optional
+
+from lxml import etree, html
+
+
+class HtmlStream:
+    """
+    Incremental HTML parser over lxml's HTMLPullParser. feed() takes body chunks as they arrive and
+    calls `extract` on every closed element of `tags`; an element it returns a value for is consumed
+    and dropped from the tree together with everything before it, so only the open part of the page
+    stays in memory.
+    """
+
+    def __init__(self, extract: Callable[[Any], Optional[Any]], tags: Iterable[str], encoding: str = 'utf-8'):
+        self.extract: Callable[[Any], Optional[Any]] = extract
+        self.parser = etree.HTMLPullParser(events=('end',), tag=tuple(tags), encoding=encoding)
+        # lxml.html elements: text_content() like bs4's .text
+        self.parser.set_element_class_lookup(html.HtmlElementClassLookup())
+
+    def feed(self, chunk: bytes) -> list:
+        self.parser.feed(chunk)
+        return self.__collect()
+
+    def close(self) -> list:
+        self.parser.close()
+        return self.__collect()
+
+    def __collect(self) -> list:
+        values = []
+        for _, element in self.parser.read_events():
+            value = self.extract(element)
+            if value is None:
+                continue
+
+            values.append(value)
+            # everything before a consumed element is closed and was already offered to extract
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+        return values
@@ -0,0 +1,180 @@
+import os
+import sqlite3
+import zlib
+from logging import Logger
+from typing import AsyncIterator, Awaitable, Callable, NamedTuple, Optional
+
+from scrapyx.clients import Requests
+
+from .response_memo import ResponseMemo
+
+
+class CachedEntry(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    # zlib-compressed payload, payload decompresses it on access
+    blob: bytes
+
+    @property
+    def payload(self) -> str:
+        return zlib.decompress(self.blob).decode('utf-8')
+
+
+class HttpCache:
+    """
+    Persistent HTTP validator store keyed by URL. Next to ETag / Last-Modified it keeps the payload
+    of the previous run: the stored file path for images, the page body for HTML.
+    The file may be shared by the coordinator and workers of a distributed run: every write is its own
+    short transaction, a locked database is waited for BUSY_TIMEOUT seconds and then the entry is skipped,
+    the cache only saves requests.
+    """
+    BUSY_TIMEOUT = 5.0
+
+    def __init__(self, path: str, logger: Logger):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.logger: Logger = logger
+        self.connection = sqlite3.connect(path, timeout=self.BUSY_TIMEOUT)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS validators ('
+                'url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, payload BLOB NOT NULL)'
+            )
+        self.skipped_writes = 0
+
+    def get(self, url: str) -> Optional[CachedEntry]:
+        try:
+            row = self.connection.execute('SELECT etag, last_modified, payload FROM validators WHERE url = ?', (url,)).fetchone()
+        except sqlite3.OperationalError as e:
+            self.logger.warning(f"HTTP cache read failed for {url}, fetching it in full: {e}")
+            return None
+        if not row:
+            return None
+        return CachedEntry(etag=row[0], last_modified=row[1], blob=row[2])
+
+    def store(self, url: str, etag: Optional[str], last_modified: Optional[str], payload: str) -> None:
+        self.store_compressed(url=url, etag=etag, last_modified=last_modified, blob=zlib.compress(payload.encode('utf-8')))
+
+    def store_compressed(self, url: str, etag: Optional[str], last_modified: Optional[str], blob: bytes) -> None:
+        # without validators the server can't answer 304, nothing to remember
+        if not etag and not last_modified:
+            return None
+
+        try:
+            # committed right away: an open write transaction would lock out the other processes
+            with self.connection:
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO validators (url, etag, last_modified, payload) VALUES (?, ?, ?, ?)',
+                    (url, etag, last_modified, blob)
+                )
+        except sqlite3.OperationalError as e:
+            # the next run fetches the page in full
+            self.skipped_writes += 1
+            self.logger.warning(f"HTTP cache write skipped for {url}: {e}")
+
+    def close(self) -> None:
+        if self.skipped_writes:
+            self.logger.warning(f"HTTP cache: {self.skipped_writes} entries not stored, the database was locked")
+        self.connection.close()
+
+    @staticmethod
+    def conditions(entry: Optional[CachedEntry]) -> dict:
+        headers = {}
+        if entry and entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry and entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+
+class CachedRequests:
+    """
+    Sits in front of request_dispatcher.get: sends If-None-Match / If-Modified-Since for URLs seen
+    in a previous run and reuses the stored path / page body when the server answers 304.
+    get_text(shared=True) goes through the run's ResponseMemo, so the stages asking for the same page share
+    one request; pages read once (listings, products) are not kept. get() is passed through unchanged.
+    """
+
+    def __init__(self, request_dispatcher: Requests, cache: HttpCache, logger: Logger, memo: Optional[ResponseMemo] = None):
+        self.request_dispatcher: Requests = request_dispatcher
+        self.cache: HttpCache = cache
+        self.logger: Logger = logger
+        self.memo: Optional[ResponseMemo] = memo
+
+    def get(self, *args, **kwargs):
+        return self.request_dispatcher.get(*args, **kwargs)
+
+    async def get_text(self, url: str, shared: bool = False, **kwargs) -> Optional[str]:
+        # extra request options may change the body, those calls are not shared
+        if not shared or self.memo is None or kwargs:
+            return await self.fetch_text(url, **kwargs)
+        return await self.memo.get(url, lambda: self.fetch_text(url))
+
+    async def fetch_text(self, url: str, **kwargs) -> Optional[str]:
+        entry = self.cache.get(url)
+        headers = {**kwargs.pop('headers', {}), **self.cache.conditions(entry)}
+
+        async with self.request_dispatcher.get(url, headers=headers, raise_on_status=False, **kwargs) as response:
+            if response.status == 304 and entry:
+                return entry.payload
+            if not response.ok:
+                self.logger.error(f"Failed to fetch page {url}: {response.status}")
+                return None
+            html_text = await response.text()
+
+        self.cache.store(url=url, etag=response.headers.get('ETag'), last_modified=response.headers.get('Last-Modified'), payload=html_text)
+        return html_text
+
+    async def stream(self, url: str, chunk_size: int = 64 * 1024, **kwargs) -> AsyncIterator[bytes]:
+        """get_text for pages too large to hold: yields the utf-8 body chunk by chunk, nothing when the fetch failed."""
+        entry = self.cache.get(url)
+        headers = {**kwargs.pop('headers', {}), **self.cache.conditions(entry)}
+
+        async with self.request_dispatcher.get(url, headers=headers, raise_on_status=False, **kwargs) as response:
+            if response.status == 304 and entry:
+                # decompressed piece by piece, the stored page is never held whole
+                decompressor = zlib.decompressobj()
+                for start in range(0, len(entry.blob), chunk_size):
+                    data = entry.blob[start:start + chunk_size]
+                    while data:
+                        chunk = decompressor.decompress(data, chunk_size)
+                        data = decompressor.unconsumed_tail
+                        if chunk:
+                            yield chunk
+                tail = decompressor.flush()
+                if tail:
+                    yield tail
+                return
+            if not response.ok:
+                self.logger.error(f"Failed to fetch page {url}: {response.status}")
+                return
+
+            # the body is kept for the next run compressed only, never as a whole string
+            compressor = zlib.compressobj()
+            compressed = []
+            async for chunk in response.content.iter_chunked(chunk_size):
+                compressed.append(compressor.compress(chunk))
+                yield chunk
+            compressed.append(compressor.flush())
+
+        self.cache.store_compressed(url=url, etag=response.headers.get('ETag'), last_modified=response.headers.get('Last-Modified'), blob=b''.join(compressed))
+
+    async def download(self, url: str, save: Callable[..., Awaitable[Optional[str]]], reuse: Callable[[str], Awaitable[bool]], **kwargs) -> Optional[str]:
+        entry = self.cache.get(url)
+        # the stored file is gone: ask for the full body again
+        if entry and not await reuse(entry.payload):
+            entry = None
+
+        headers = {**kwargs.pop('headers', {}), **self.cache.conditions(entry)}
+
+        async with self.request_dispatcher.get(url=url, headers=headers, raise_on_status=False, **kwargs) as response:
+            if response.status == 304 and entry:
+                return entry.payload
+            if response.status != 200:
+                return None
+            path = await save(response=response)
+
+        if path:
+            self.cache.store(url=url, etag=response.headers.get('ETag'), last_modified=response.headers.get('Last-Modified'), payload=path)
+        return path
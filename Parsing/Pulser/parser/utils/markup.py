@@ -0,0 +1,32 @@
+from typing import Optional
+
+from bs4.builder import builder_registry
+
+# fastest first; every builder gives the same BeautifulSoup API, so select()/select_one() selectors stay unchanged
+HTML_PARSERS = ('lxml', 'html.parser')
+
+
+def resolve_html_parser(preferred: Optional[str] = None) -> str:
+    """First tree builder bs4 can load, `preferred` is tried before HTML_PARSERS."""
+    for name in ((preferred,) if preferred else ()) + HTML_PARSERS:
+        if builder_registry.lookup(name) is not None:
+            return name
+    return 'html.parser'
+
+
+# the builders repair broken markup differently, so positional selectors (nth-child, >) can match other
+# elements: the configured builder is used as is, parity_html.py tells whether a switch keeps the output
+HTML_PARSER = 'html.parser'
+
+
+def configure_html_parser(name: str) -> str:
+    """Sets the builder of html_parser() for this process, config parser.html_parser."""
+    global HTML_PARSER
+    if builder_registry.lookup(name) is None:
+        raise ValueError(f"html_parser {name!r} is not installed, bs4 can load: {', '.join(n for n in HTML_PARSERS if resolve_html_parser(n) == n)}")
+    HTML_PARSER = name
+    return name
+
+
+def html_parser() -> str:
+    return HTML_PARSER
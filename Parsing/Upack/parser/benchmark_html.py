@@ -0,0 +1,62 @@
+"""
+Side-by-side parse + select time of the bs4 tree builders on saved Upack pages.
+
+    python benchmark_html.py listing=pages/category.html product=pages/product.html --repeat 20
+
+Selectors mirror parsers/parser_products.py. The match counts must be the same for every builder,
+otherwise a selector depends on how the builder repairs the markup.
+"""
+import argparse
+import time
+
+from bs4 import BeautifulSoup
+
+from utils.markup import HTML_PARSERS, resolve_html_parser
+
+SELECTORS = {
+    'listing': (
+        'div.pagination > div > a:last-child',
+        'div.product-wrapper div.product-wrapper-inner a.catalog-item__inner',
+    ),
+    'product': (
+        'div.card-article--page',
+        'h1.page-title',
+        'ul.Breadcrumbs_breadcrumbs__0II_j li meta[content="3"]',
+        'div.card-panel span.card-price__total > span',
+        'div.card-panel > p',
+        'ul.props-list li.CardPropsItem_card-props__item__s7rU2',
+        "div.card-images--page a[data-fancybox='gallery']",
+    ),
+}
+
+
+def parse_and_select(html_text: str, kind: str, builder: str) -> list:
+    soup = BeautifulSoup(html_text, builder)
+    return [len(soup.select(selector)) for selector in SELECTORS[kind]]
+
+
+def main():
+    arguments = argparse.ArgumentParser()
+    arguments.add_argument('pages', nargs='+', help='kind=path, kind is one of: ' + ', '.join(SELECTORS))
+    arguments.add_argument('--repeat', type=int, default=20)
+    args = arguments.parse_args()
+
+    builders = [name for name in HTML_PARSERS if resolve_html_parser(name) == name]
+    print(f"{'page':40} {'builder':12} {'ms/page':>10} matches")
+
+    for page in args.pages:
+        kind, path = page.split('=', 1)
+        with open(path, encoding='utf-8') as file:
+            html_text = file.read()
+
+        for builder in builders:
+            matches = parse_and_select(html_text, kind, builder)
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                parse_and_select(html_text, kind, builder)
+            elapsed = (time.perf_counter() - started) / args.repeat * 1000
+            print(f"{path[-40:]:40} {builder:12} {elapsed:10.1f} {matches}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,62 @@
+import argparse
 import asyncio
+import json
 from scrapyx import ClientFactory
+from models import Characteristic, CharacteristicName, CrawlQueue, CrawlRun, Picture, PriceHistory, PriceHistoryRecord, Product
 from parsers import ParserCategory, ParserProducts
+from utils import BulkLoader, CachedRequests, CharacteristicDictionary, CrawlPool, DbWriter, DeltaLoader, FileStore, HtmlExecutor, HttpCache, PriceTracker, StagingLoader, WorkQueue, configure_html_parser
 
 
 async def main():
+    arguments = argparse.ArgumentParser()
+    # single: the whole crawl in this process; coordinator / worker: the crawl is shared through the queue table
+    arguments.add_argument('--role', choices=('single', 'coordinator', 'worker'), default='single')
+    args = arguments.parse_args()
+
     factory = ClientFactory(config_path='config.json')
+    with open('config.json') as file:
+        config = json.load(file)
 
     logger = factory.clients.logger
-    requests = factory.clients.requests
+    # ETag / Last-Modified of the previous run: unchanged pages and images come back as 304
+    http_cache = HttpCache(path=config['parser']['http_cache_path'], logger=logger)
+    requests = CachedRequests(request_dispatcher=factory.clients.requests, cache=http_cache, logger=logger)
     postgresql_parsing = factory.clients.postgresql.postgresql_parsing
-    files = factory.clients.files
+    # products, characteristics and pictures go through COPY, the ORM client keeps the rest.
+    # delta mode upserts only new / changed rows instead of writing the full snapshot (not with the
+    # Talend job that truncates these tables after loading them, see DeltaLoader),
+    # staging mode loads a copy of the tables and swaps it in when the run is complete
+    if config['parser']['load_mode'] == 'delta':
+        bulk_loader = DeltaLoader(models=(Product, Characteristic, Picture), logger=logger, add_columns=((Characteristic, 'characteristic_id'),), **config['scrapyx']['postgresql']['parsing'])
+    elif config['parser']['load_mode'] == 'staging':
+        # workers fill the staging tables the coordinator created
+        bulk_loader = StagingLoader(models=(Product, Characteristic, Picture), logger=logger, resume=args.role == 'worker', add_columns=((Characteristic, 'characteristic_id'),), **config['scrapyx']['postgresql']['parsing'])
+    else:
+        bulk_loader = BulkLoader(add_columns=((Characteristic, 'characteristic_id'),), **config['scrapyx']['postgresql']['parsing'])
+    await bulk_loader.open()
+    work_queue = WorkQueue(run_model=CrawlRun, queue_model=CrawlQueue, loader=bulk_loader, source='upack', logger=logger, **config['parser']['queue'])
+    if args.role != 'single':
+        await work_queue.open()
+    # inserts run in the background: one buffer and flush task per table
+    db_writer = DbWriter(loader=bulk_loader, logger=logger, **config['parser']['db_writer'])
+    # price changes against the last known prices go to the append-only history table
+    price_tracker = PriceTracker(model=PriceHistory, record=PriceHistoryRecord, loader=bulk_loader, db_writer=db_writer, logger=logger)
+    await price_tracker.open()
+    # characteristic rows carry the id of the name, new names are added page by page
+    characteristic_dictionary = CharacteristicDictionary(model=CharacteristicName, loader=bulk_loader, logger=logger)
+    await characteristic_dictionary.open()
+    # images are streamed to disk by FileStore instead of scrapyx Files.write_file
+    files = FileStore(**config['scrapyx']['files'])
+
+    # one pool per run: host limits are shared by every stage. Every stage crawls the same site and each
+    # stage has a window of its own, so per_host_limit is the only cap on the total load put on the site
+    crawl_pool = CrawlPool(**config['parser']['crawl_pool'])
+
+    # before the executors: their workers take the builder of this process
+    configure_html_parser(config['parser']['html_parser'])
+
+    # html parsing per parser: 0 workers parses on the event loop, otherwise in a process pool
+    products_executor = HtmlExecutor(workers=config['parser']['html_workers']['products'])
 
     parser_categories = ParserCategory(
         logger=logger,
@@ -21,19 +68,47 @@ async def main():
         logger=logger,
         request_dispatcher=requests,
         database=postgresql_parsing,
-        files=files
+        db_writer=db_writer,
+        price_tracker=price_tracker,
+        characteristic_dictionary=characteristic_dictionary,
+        files=files,
+        crawl_pool=crawl_pool,
+        html_executor=products_executor
     )
 
-    await postgresql_parsing.inspect_parser_status()
+    if args.role == 'worker':
+        state = await work_queue.wait_for_run()
+        await parser_product.work(queue=work_queue, category_name_id_map=state['category_name_id_map'])
+    else:
+        if args.role == 'coordinator':
+            await work_queue.start_run()
+
+        await postgresql_parsing.inspect_parser_status()
 
-    category_name_id_map, category_urls = await parser_categories.parse()
+        category_name_id_map, category_urls = await parser_categories.parse()
 
-    if not category_urls or not category_name_id_map:
-        raise Exception('No parser category urls or category_name_id_map provided')
+        if not category_urls or not category_name_id_map:
+            raise Exception('No parser category urls or category_name_id_map provided')
 
-    await parser_product.parse(category_urls=category_urls, category_name_id_map=category_name_id_map)
+        if args.role == 'coordinator':
+            # the workers crawl, the run is complete when the queue is drained
+            await work_queue.put('listing', category_urls)
+            await work_queue.seal({'category_name_id_map': category_name_id_map})
+            await work_queue.wait_drained()
+            await work_queue.finish_run()
+        else:
+            await parser_product.parse(category_urls=category_urls, category_name_id_map=category_name_id_map)
 
-    await postgresql_parsing.parsed_successfully()
+    # every buffered row has to be in the database before the run is marked successful
+    await db_writer.close()
+    price_tracker.report()
+    characteristic_dictionary.report()
+    if args.role != 'worker':
+        await bulk_loader.finish()
+        await postgresql_parsing.parsed_successfully()
+    http_cache.close()
+    await bulk_loader.close()
+    products_executor.close()
 
 
 if __name__ == '__main__':
@@ -1,5 +1,5 @@
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import BIGINT, TEXT
+from sqlalchemy import BIGINT, INTEGER, TEXT, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column
 
 Base = declarative_base()
@@ -7,9 +7,13 @@ Base = declarative_base()
 class Characteristic(Base):
 
     __tablename__ = "upack_characteristics"
-    __table_args__ = {'schema': 'marketplaces'}
+    # conflict key of the delta load mode (DeltaLoader)
+    __table_args__ = (UniqueConstraint('source_code', 'characteristic', name='upack_characteristics_source_code_characteristic_key'), {'schema': 'marketplaces'})
 
     id: Mapped[int] = mapped_column(BIGINT, primary_key=True, autoincrement=True)
     source_code: Mapped[str] = mapped_column(TEXT)
     characteristic: Mapped[str] = mapped_column(TEXT)
-    value: Mapped[str] = mapped_column(TEXT)
\ No newline at end of file
+    value: Mapped[str] = mapped_column(TEXT)
+    # id in the upack_characteristic_names dictionary. The name stays in characteristic for the Talend
+    # jobs that read it; tables made before the dictionary get this column in BulkLoader.open() (add_columns)
+    characteristic_id: Mapped[int] = mapped_column(INTEGER)
\ No newline at end of file
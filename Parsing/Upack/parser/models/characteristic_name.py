@@ -0,0 +1,13 @@
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import INTEGER, TEXT
+from sqlalchemy.orm import Mapped, mapped_column
+
+Base = declarative_base()
+
+
+class CharacteristicName(Base):
+    __tablename__ = "upack_characteristic_names"
+    __table_args__ = {'schema': 'marketplaces'}
+
+    id: Mapped[int] = mapped_column(INTEGER, primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(TEXT, unique=True)
@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from sqlalchemy import INTEGER, TEXT, TIMESTAMP, Index
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import Mapped, mapped_column
+
+Base = declarative_base()
+
+
+class CrawlQueue(Base):
+    __tablename__ = "crawl_queue"
+    __table_args__ = (Index('crawl_queue_source_status_idx', 'source', 'status'), {'schema': 'marketplaces'})
+
+    source: Mapped[str] = mapped_column(TEXT, primary_key=True)
+    # 'listing' or 'product'
+    kind: Mapped[str] = mapped_column(TEXT, primary_key=True)
+    url: Mapped[str] = mapped_column(TEXT, primary_key=True)
+    # pending -> claimed -> done; a claim older than the lease is taken over by another worker
+    status: Mapped[str] = mapped_column(TEXT)
+    claimed_by: Mapped[str] = mapped_column(TEXT, nullable=True)
+    claimed_at: Mapped[datetime] = mapped_column(TIMESTAMP, nullable=True)
+    attempts: Mapped[int] = mapped_column(INTEGER)
@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from sqlalchemy import BOOLEAN, TEXT, TIMESTAMP
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import Mapped, mapped_column
+
+Base = declarative_base()
+
+
+class CrawlRun(Base):
+    __tablename__ = "crawl_runs"
+    __table_args__ = {'schema': 'marketplaces'}
+
+    # one distributed run per source at a time
+    source: Mapped[str] = mapped_column(TEXT, primary_key=True)
+    started_at: Mapped[datetime] = mapped_column(TIMESTAMP)
+    # workers start claiming once the coordinator has put the seeds
+    seeded: Mapped[bool] = mapped_column(BOOLEAN)
+    # stage results the workers need, e.g. the category name -> id map
+    state: Mapped[dict] = mapped_column(JSONB, nullable=True)
+    finished_at: Mapped[datetime] = mapped_column(TIMESTAMP, nullable=True)
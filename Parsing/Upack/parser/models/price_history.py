@@ -0,0 +1,22 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import BIGINT, NUMERIC, TEXT, TIMESTAMP, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+Base = declarative_base()
+
+
+class PriceHistory(Base):
+    __tablename__ = "upack_price_history"
+    # append-only: a row is written only when the prices of (product, city) changed since the last one
+    __table_args__ = (Index('upack_price_history_source_code_city_observed_at_idx', 'source_code', 'city', 'observed_at'), {'schema': 'marketplaces'})
+
+    id: Mapped[int] = mapped_column(BIGINT, primary_key=True, autoincrement=True)
+    source_code: Mapped[str] = mapped_column(TEXT)
+    # NULL for sites with a single price list
+    city: Mapped[Optional[str]] = mapped_column(TEXT, nullable=True)
+    per_price: Mapped[float] = mapped_column(NUMERIC(10, 2))
+    min_batch_price: Mapped[float] = mapped_column(NUMERIC(10, 2))
+    observed_at: Mapped[datetime] = mapped_column(TIMESTAMP)
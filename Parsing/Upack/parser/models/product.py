@@ -1,5 +1,5 @@
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import TEXT, INTEGER, NUMERIC
+from sqlalchemy import TEXT, INTEGER, NUMERIC, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column
 
 Base = declarative_base()
@@ -7,7 +7,8 @@ Base = declarative_base()
 
 class Product(Base):
     __tablename__ = "upack_products"
-    __table_args__ = {'schema': 'marketplaces'}
+    # conflict key of the delta load mode (DeltaLoader)
+    __table_args__ = (UniqueConstraint('source_code', name='upack_products_source_code_key'), {'schema': 'marketplaces'})
 
     id: Mapped[int] = mapped_column(INTEGER, primary_key=True, autoincrement=True)
     source_code: Mapped[str] = mapped_column(TEXT, nullable=True)
@@ -0,0 +1,38 @@
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+
+# Rows of the extraction layer. Field order is the column order of the table (without the
+# autoincrement id), so a record is handed to BulkLoader.copy_records as is.
+
+class ProductRecord(NamedTuple):
+    source_code: Optional[str]
+    title: str
+    category_id: int
+    product_url: str
+    per_price: float
+    quantity_per_box: int
+    quantity_per_pack: int
+    min_quantity: int
+    min_batch_price: float
+
+
+class CharacteristicRecord(NamedTuple):
+    source_code: str
+    characteristic: str
+    value: str
+    characteristic_id: int
+
+
+class PictureRecord(NamedTuple):
+    source_code: str
+    image_url: str
+    path: str
+
+
+class PriceHistoryRecord(NamedTuple):
+    source_code: str
+    city: Optional[str]
+    per_price: float
+    min_batch_price: float
+    observed_at: datetime
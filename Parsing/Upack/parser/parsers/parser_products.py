@@ -1,250 +1,310 @@
 import asyncio
 import uuid
+from functools import partial
 from logging import Logger
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterable, AsyncIterator, Optional
 import re
 from urllib.parse import urlparse
 from bs4 import BeautifulSoup
-from scrapyx.clients import Requests, PostgreSQL, Files
+from aiohttp import ClientResponse
+from scrapyx.clients import PostgreSQL
 from scrapyx.utils import normalize_text
 from scrapyx.base import BaseScraperSync
 
-from models import Product, Characteristic, Picture, Source
+from models import Characteristic, CharacteristicRecord, Picture, PictureRecord, Product, ProductRecord, Source
+from utils import CachedRequests, CharacteristicDictionary, Channel, CrawlPool, DbWriter, DigestSet, ExtractionError, FileStore, HtmlExecutor, PriceTracker, WorkQueue, html_parser
 
 
 class ParserProducts(BaseScraperSync):
     BATCH_SIZE_ASYNC = 10
-    BATCH_SIZE_INSERT = 500
+    BATCH_SIZE_MEDIA = 20
+    QUEUE_SIZE = 1000
     URL = "https://upack.kz"
     SOURCE_NAME = 'Upack'
     TRASH_CHARACTERISTIC_VALUE = ('НЕ УКАЗАН', '0')
 
-    def __init__(self, request_dispatcher: Requests, logger: Logger, database: PostgreSQL, files: Files):
-        self.request_dispatcher: Requests = request_dispatcher
+    def __init__(self, request_dispatcher: CachedRequests, logger: Logger, database: PostgreSQL, db_writer: DbWriter, characteristic_dictionary: CharacteristicDictionary, price_tracker: PriceTracker, files: FileStore, crawl_pool: CrawlPool, html_executor: HtmlExecutor):
+        self.request_dispatcher: CachedRequests = request_dispatcher
         self.logger: Logger = logger
         self.db: PostgreSQL = database
-        self.file = files
-        self.unique_urls = set()
+        self.db_writer: DbWriter = db_writer
+        self.characteristic_dictionary: CharacteristicDictionary = characteristic_dictionary
+        self.price_tracker: PriceTracker = price_tracker
+        self.file: FileStore = files
+        self.crawl_pool: CrawlPool = crawl_pool
+        self.html_executor: HtmlExecutor = html_executor
+        # resolved on first use, a worker runs extract_products once per claimed batch
+        self.source_folder: Optional[str] = None
+        self.unique_urls = DigestSet()
 
     async def parse(self, category_urls: list, category_name_id_map: dict) -> None:
         self.logger.info("Starting to extract products...")
-        all_category_urls = await self.extract_all_pages(category_urls=category_urls)
+        product_urls = self.extract_product_urls(category_urls=category_urls)
 
-        product_urls = await self.extract_product_url(category_urls=all_category_urls)
-
-        # parsing products
-        await self.extract_products(product_urls=list(set(product_urls)), category_name_id_map=category_name_id_map)
+        # parsing products while listing pages are still being fetched
+        await self.extract_products(product_urls=product_urls, category_name_id_map=category_name_id_map)
 
         return None
 
-    # example for url: https://upack.kz/c/tramontina?page=1&per_page=48
-    async def extract_all_pages(self, category_urls: list) -> list:
-        self.logger.info("Starting to extract pages...")
-        all_pages = category_urls.copy()
-
-        for category_url in category_urls:
-            async with self.request_dispatcher.get(category_url, raise_on_status=False) as response:
-                if not response.ok:
-                    self.logger.error(f"Failed to fetch page {category_url}: {response.status}")
-                    continue
-                html_text = await response.text()
+    async def work(self, queue: WorkQueue, category_name_id_map: dict) -> None:
+        """Distributed mode: claims batches of listing / product pages until the run is drained."""
+        pages_processed = 0
+
+        while True:
+            items = await queue.claim()
+            if items is None:
+                break
+            if not items:
+                # other workers still hold claims that may add pages
+                await asyncio.sleep(queue.poll_interval)
+                continue
 
-            soup = self.get_bs4_object(content=html_text, markup='html.parser')
+            listing_urls = [url for kind, url in items if kind == 'listing']
+            product_urls = [url for kind, url in items if kind == 'product']
 
-            last_page = soup.select_one('div.pagination > div > a:last-child')
+            # listing pages only feed the queue, any worker picks up what they found
+            async for found_urls, next_pages in self.crawl_pool.imap(self.parse_listing_page, listing_urls, window=self.BATCH_SIZE_ASYNC):
+                await queue.put('product', found_urls)
+                await queue.put('listing', next_pages)
 
-            if not last_page or not last_page.text or not last_page.text.isdigit():
-                self.logger.info(f"Failed to extract last page {category_url}")
-                continue
+            if product_urls:
+                await self.extract_products(product_urls=product_urls, category_name_id_map=category_name_id_map)
 
-            for index in range(2, int(last_page.text) + 1):
-                page = category_url.replace('page=1', f'page={index}')
-                all_pages.append(page)
+            # the batch is done once its rows are in the database, a crash before that gives it to another worker
+            await self.db_writer.flush()
+            await queue.complete(items)
+            pages_processed += len(items)
 
-        return all_pages
+        self.logger.info(f"Queue drained, {pages_processed} pages processed by this worker")
+        return None
 
-    async def extract_product_url(self, category_urls: list) -> list:
-        product_urls = []
+    async def extract_product_urls(self, category_urls: list) -> AsyncIterator[str]:
+        self.logger.info("Starting to extract pages...")
+        seen = DigestSet()
 
-        for category_url in category_urls:
-            async with self.request_dispatcher.get(category_url, raise_on_status=False) as response:
-                if not response.ok:
-                    self.logger.error(f"Failed to fetch page {category_url}: {response.status}")
+        # first pages schedule the rest of their pagination into the same window
+        async for product_urls in self.crawl_pool.crawl(self.parse_listing_page, category_urls, window=self.BATCH_SIZE_ASYNC):
+            for product_url in product_urls:
+                if product_url in seen:
                     continue
-                html_text = await response.text()
+                seen.add(product_url)
+                yield product_url
 
-            soup = self.get_bs4_object(content=html_text, markup='html.parser')
+    # example for url: https://upack.kz/c/tramontina?page=1&per_page=48
+    async def parse_listing_page(self, category_url: str) -> tuple[list, list]:
+        try:
+            html_text = await self.request_dispatcher.get_text(category_url)
+            if html_text is None:
+                return [], []
 
-            cards = soup.select('div.product-wrapper div.product-wrapper-inner a.catalog-item__inner')
-            if not cards:
-                self.logger.info(f"Failed to extract cards for url : {category_url}")
-                continue
+            listing = await self.html_executor.run(self.extract_listing, html_text=html_text, category_url=category_url)
+            for message in listing['warnings']:
+                self.logger.info(message)
 
-            for card in cards:
-                url = card.get('href')
-                if not url:
-                    self.logger.info(f"Failed to extract product url from cards : {category_url}")
-                    continue
-                product_urls.append(f'{self.URL}{url}')
+            return listing['product_urls'], listing['next_pages']
+        except Exception as e:
+            # an exception would end the whole listing stage (CrawlPool.crawl)
+            self.logger.error(f"Error while parsing listing page {category_url}: {e}")
+            return [], []
 
-        return product_urls
+    @staticmethod
+    def extract_listing(html_text: str, category_url: str) -> dict:
+        soup = BeautifulSoup(html_text, html_parser())
+        warnings = []
 
-    async def extract_products(self, product_urls: list, category_name_id_map: dict) -> None:
-        if not product_urls:
-            raise Exception('No product urls provided')
+        next_pages = ParserProducts.extract_all_pages(soup=soup, category_url=category_url, warnings=warnings) if 'page=1&' in category_url else []
+        product_urls = ParserProducts.extract_product_url(soup=soup, category_url=category_url, warnings=warnings)
 
-        source_folder = await self.find_source_id()
-        if not source_folder:
-            raise Exception(f"Source '{self.SOURCE_NAME}' not found in the database.")
+        return {'product_urls': product_urls, 'next_pages': next_pages, 'warnings': warnings}
 
-        all_products = []
-        characteristics = []
-        pictures = []
+    @staticmethod
+    def extract_all_pages(soup: BeautifulSoup, category_url: str, warnings: list) -> list:
+        last_page = soup.select_one('div.pagination > div > a:last-child')
 
-        for i in range(0, len(product_urls), self.BATCH_SIZE_ASYNC):
-            batch_pages = product_urls[i: i + self.BATCH_SIZE_ASYNC]
-            tasks = [self.parse_single_product(product_url=product_url, category_name_id_map=category_name_id_map, characteristics=characteristics, pictures=pictures, source_folder=source_folder) for product_url in batch_pages]
-            products = await asyncio.gather(*tasks)
+        if not last_page or not last_page.text or not last_page.text.isdigit():
+            warnings.append(f"Failed to extract last page {category_url}")
+            return []
 
-            for product in products:
-                if product:
-                    all_products.append(product)
+        return [category_url.replace('page=1', f'page={index}') for index in range(2, int(last_page.text) + 1)]
 
-            if len(all_products) >= self.BATCH_SIZE_INSERT:
-                await self.db.insert_batch(data=all_products)
-                all_products.clear()
-                await self.db.insert_batch(data=characteristics)
-                characteristics.clear()
+    @staticmethod
+    def extract_product_url(soup: BeautifulSoup, category_url: str, warnings: list) -> list:
+        product_urls = []
 
-                await self.db.insert_batch(data=pictures)
-                pictures.clear()
+        cards = soup.select('div.product-wrapper div.product-wrapper-inner a.catalog-item__inner')
+        if not cards:
+            warnings.append(f"Failed to extract cards for url : {category_url}")
+            return []
 
-        if all_products:
-            await self.db.insert_batch(data=all_products)
+        for card in cards:
+            url = card.get('href')
+            if not url:
+                warnings.append(f"Failed to extract product url from cards : {category_url}")
+                continue
+            product_urls.append(f'{ParserProducts.URL}{url}')
 
-        if characteristics:
-            await self.db.insert_batch(data=characteristics)
+        return product_urls
 
-        if pictures:
-            await self.db.insert_batch(data=pictures)
+    async def extract_products(self, product_urls: AsyncIterable[str], category_name_id_map: dict) -> None:
+        if self.source_folder is None:
+            self.source_folder = await self.find_source_id()
+        if not self.source_folder:
+            raise Exception(f"Source '{self.SOURCE_NAME}' not found in the database.")
+
+        # images drain in their own stage, product pages finish at HTML speed
+        pictures = Channel(maxsize=self.QUEUE_SIZE)
+        await asyncio.gather(
+            self.extract_product_pages(product_urls=product_urls, category_name_id_map=category_name_id_map, pictures=pictures),
+            self.parse_pictures(pictures_info=pictures, source_folder=self.source_folder)
+        )
 
         # Info
         self.logger.info("Products extracted and inserted into the database successfully!")
         return None
 
-    async def parse_single_product(self, product_url: str, category_name_id_map: dict, characteristics: list, pictures: list, source_folder: str) -> Optional[Product]:
-        try:
-            async with self.request_dispatcher.get(product_url, raise_on_status=False) as response:
-                if not response.ok:
-                    self.logger.error(f"Failed to fetch page {product_url}: {response.status}")
-                    return None
-                html_text = await response.text()
-
-            soup = self.get_bs4_object(content=html_text, markup='html.parser')
-
-            # 1. source code
-            source_code = soup.select_one('div.card-article--page')
-            if not source_code or not source_code.text:
-                self.logger.warning(f"Failed to extract source code for product {product_url}")
-                return None
-            source_code = re.sub(r'[Арт.\s]', '', source_code.get_text())
+    async def extract_product_pages(self, product_urls: AsyncIterable[str], category_name_id_map: dict, pictures: Channel) -> None:
+        pages_parsed = 0
 
-            if not source_code:
-                self.logger.warning(f"Failed to extract source code for product {product_url}")
-                return None
-
-            # 2. title
-            title = soup.select_one('h1.page-title')
-            if not title or not title.text:
-                self.logger.warning(f"Failed to extract title for product {product_url}")
-                return None
-            title = normalize_text(text=title.get_text(), case='u')
-
-            # 3. category id
-            category_tag = soup.select_one('ul.Breadcrumbs_breadcrumbs__0II_j li meta[content="3"]')
-            if not category_tag:
-                self.logger.warning(f"Failed to extract category tag for product {product_url}")
-                return None
-            parent_tag = category_tag.find_parent('li')
-            if not parent_tag:
-                self.logger.warning(
-                    f"Failed to extract parent tag for product {product_url}, source code: {source_code}")
-                return None
-            category_link = parent_tag.select_one('[itemprop="name"]')
-            if not category_link:
-                self.logger.warning(
-                    f"Failed to extract category link for product {product_url}, source code : {source_code}")
-                return None
-            category_name = category_link.get_text()
-            if not category_name:
-                self.logger.warning(
-                    f"Failed to extract category name for product {product_url}, source code: {source_code}")
-                return None
+        parse_product = partial(self.parse_single_product, category_name_id_map=category_name_id_map)
 
-            category_name = normalize_text(text=category_name, case='u')
-            category_id = category_name_id_map.get(category_name)
-            if not category_id:
-                self.logger.warning(f"Failed to extract category id for product {product_url}, source code: {category_name}, category name: {category_name}")
-                return None
+        try:
+            # keeps BATCH_SIZE_ASYNC product pages in flight, a slow page no longer stalls the others
+            async for product, characteristics, product_pictures in self.crawl_pool.imap(parse_product, product_urls, window=self.BATCH_SIZE_ASYNC):
+                pages_parsed += 1
+                # rows are flushed in the background, products and characteristics in parallel
+                if product:
+                    await self.db_writer.put(Product, product)
+                    await self.price_tracker.observe(product)
+                await self.db_writer.put_many(Characteristic, characteristics)
 
-            # 4. Per Price
-            per_price = soup.select_one('div.card-panel span.card-price__total > span')
-            if not per_price:
-                self.logger.warning(f"Failed to extract per-price tag for product {product_url}")
-                return None
-            per_price = float(per_price.get_text())
+                for picture in product_pictures:
+                    await pictures.put(picture)
+        finally:
+            await pictures.close()
 
-            # p tags
-            p_tags = soup.select('div.card-panel > p')
-            # берем p_tags[0], [1], [2]
-            if len(p_tags) < 3:
-                self.logger.warning(f"length of p_tags less than 3 for product {product_url}")
-                return None
+        if not pages_parsed:
+            raise Exception('No product urls provided')
 
-            # 5. quantity per box
-            quantity_per_box = self.extract_digit_from_text(p_tags[0].get_text())
-            if not quantity_per_box:
-                self.logger.warning(f"Failed to extract quantity per box for product {product_url}")
-                return None
+        return None
 
-            # 6. quantity per pack
-            quantity_per_pack = self.extract_digit_from_text(p_tags[1].get_text())
-            if not quantity_per_pack:
-                self.logger.warning(f"Failed to extract quantity per pack for product {product_url}")
-                return None
+    async def parse_single_product(self, product_url: str, category_name_id_map: dict) -> tuple[Optional[ProductRecord], list, list]:
+        try:
+            html_text = await self.request_dispatcher.get_text(product_url)
+            if html_text is None:
+                return None, [], []
 
-            # 7. minimum quantity
-            min_quantity = self.extract_digit_from_text(p_tags[2].get_text())
-            if not min_quantity:
-                self.logger.warning(f"Failed to extract minimum quantity for product {product_url}")
-                return None
+            page = await self.html_executor.run(self.extract_product, html_text=html_text, product_url=product_url)
+            for message in page['warnings']:
+                self.logger.warning(message)
 
-            # 8. minimum batch price
-            min_batch_price = per_price * min_quantity
+            source_code = page['product']['source_code']
+            category_id = category_name_id_map.get(page['category_name'])
+            if not category_id:
+                self.logger.warning(f"Failed to extract category id for product {product_url}, source code: {source_code}, category name: {page['category_name']}")
+                return None, [], []
 
-            product = Product(
-                source_code=source_code,
-                title=title,
-                category_id=category_id,
-                product_url=product_url,
-                per_price=per_price,
-                quantity_per_box=quantity_per_box,
-                quantity_per_pack=quantity_per_pack,
-                min_quantity=min_quantity,
-                min_batch_price=min_batch_price
-            )
+            product = ProductRecord(category_id=category_id, **page['product'])
 
             # characteristic part
-            await self.get_characteristics(source_code=source_code, soup=soup, characteristics=characteristics)
-
-            # picture part
-            await self.get_images(source_code=source_code, soup=soup, pictures=pictures, source_folder=source_folder)
-
-            return product
+            characteristic_ids = await self.characteristic_dictionary.intern([key for key, _ in page['characteristics']])
+            characteristics = [
+                CharacteristicRecord(source_code, name, value, characteristic_id)
+                for characteristic_id, (name, value) in zip(characteristic_ids, page['characteristics'])
+            ]
+
+            # picture part, downloaded later by the media stage
+            return product, characteristics, page['pictures']
+        except ExtractionError as e:
+            self.logger.warning(str(e))
+            return None, [], []
         except Exception as e:
             self.logger.error(f"Error while parsing single product {product_url}: {e}")
-            return None
+            return None, [], []
+
+    @staticmethod
+    def extract_product(html_text: str, product_url: str) -> dict:
+        """Runs in the html executor: plain fields only, Product / Characteristic are built by the caller."""
+        soup = BeautifulSoup(html_text, html_parser())
+        warnings = []
+
+        # 1. source code
+        source_code = soup.select_one('div.card-article--page')
+        if not source_code or not source_code.text:
+            raise ExtractionError(f"Failed to extract source code for product {product_url}")
+        source_code = re.sub(r'[Арт.\s]', '', source_code.get_text())
+
+        if not source_code:
+            raise ExtractionError(f"Failed to extract source code for product {product_url}")
+
+        # 2. title
+        title = soup.select_one('h1.page-title')
+        if not title or not title.text:
+            raise ExtractionError(f"Failed to extract title for product {product_url}")
+        title = normalize_text(text=title.get_text(), case='u')
+
+        # 3. category name, mapped to category id by the caller
+        category_tag = soup.select_one('ul.Breadcrumbs_breadcrumbs__0II_j li meta[content="3"]')
+        if not category_tag:
+            raise ExtractionError(f"Failed to extract category tag for product {product_url}")
+        parent_tag = category_tag.find_parent('li')
+        if not parent_tag:
+            raise ExtractionError(f"Failed to extract parent tag for product {product_url}, source code: {source_code}")
+        category_link = parent_tag.select_one('[itemprop="name"]')
+        if not category_link:
+            raise ExtractionError(f"Failed to extract category link for product {product_url}, source code : {source_code}")
+        category_name = category_link.get_text()
+        if not category_name:
+            raise ExtractionError(f"Failed to extract category name for product {product_url}, source code: {source_code}")
+
+        category_name = normalize_text(text=category_name, case='u')
+
+        # 4. Per Price
+        per_price = soup.select_one('div.card-panel span.card-price__total > span')
+        if not per_price:
+            raise ExtractionError(f"Failed to extract per-price tag for product {product_url}")
+        per_price = float(per_price.get_text())
+
+        # p tags
+        p_tags = soup.select('div.card-panel > p')
+        # берем p_tags[0], [1], [2]
+        if len(p_tags) < 3:
+            raise ExtractionError(f"length of p_tags less than 3 for product {product_url}")
+
+        # 5. quantity per box
+        quantity_per_box = ParserProducts.extract_digit_from_text(p_tags[0].get_text())
+        if not quantity_per_box:
+            raise ExtractionError(f"Failed to extract quantity per box for product {product_url}")
+
+        # 6. quantity per pack
+        quantity_per_pack = ParserProducts.extract_digit_from_text(p_tags[1].get_text())
+        if not quantity_per_pack:
+            raise ExtractionError(f"Failed to extract quantity per pack for product {product_url}")
+
+        # 7. minimum quantity
+        min_quantity = ParserProducts.extract_digit_from_text(p_tags[2].get_text())
+        if not min_quantity:
+            raise ExtractionError(f"Failed to extract minimum quantity for product {product_url}")
+
+        # 8. minimum batch price
+        min_batch_price = per_price * min_quantity
+
+        return {
+            'product': {
+                'source_code': source_code,
+                'title': title,
+                'product_url': product_url,
+                'per_price': per_price,
+                'quantity_per_box': quantity_per_box,
+                'quantity_per_pack': quantity_per_pack,
+                'min_quantity': min_quantity,
+                'min_batch_price': min_batch_price
+            },
+            'category_name': category_name,
+            'characteristics': ParserProducts.get_characteristics(source_code=source_code, soup=soup, warnings=warnings),
+            'pictures': ParserProducts.get_images(source_code=source_code, soup=soup, warnings=warnings),
+            'warnings': warnings
+        }
 
     @staticmethod
     def extract_digit_from_text(text: Optional[str]) -> Optional[int]:
@@ -254,21 +314,22 @@ class ParserProducts(BaseScraperSync):
                 return int(digit)
         return None
 
-    async def get_characteristics(self, source_code: str, soup: BeautifulSoup, characteristics: list) -> None:
+    @staticmethod
+    def get_characteristics(source_code: str, soup: BeautifulSoup, warnings: list) -> list:
+        characteristics = []
         try:
             check_duplicates = set()
             cards = soup.select('ul.props-list li.CardPropsItem_card-props__item__s7rU2')
             if not cards:
-                self.logger.warning(
-                    f'Failed to extract cards in method get_characteristics! source code: {source_code}')
-                return None
+                warnings.append(f'Failed to extract cards in method get_characteristics! source code: {source_code}')
+                return []
 
             for card in cards:
                 key = card.select_one("span.CardPropsItem_card-props__name__rwBE3")
                 value = card.select_one("span.CardPropsItem_card-props__value__1rCme")
 
                 if not key or not value or not key.text or not value.text:
-                    self.logger.warning(f"Failed to extract key or value from characteristics")
+                    warnings.append(f"Failed to extract key or value from characteristics")
                     continue
                 key = key.text.replace('\u2009', ' ')
                 if not key:
@@ -277,41 +338,55 @@ class ParserProducts(BaseScraperSync):
                 key = normalize_text(text=key, case='u')
                 value = normalize_text(text=value.text, case='u')
 
-                if key in check_duplicates or value in self.TRASH_CHARACTERISTIC_VALUE:
+                if key in check_duplicates or value in ParserProducts.TRASH_CHARACTERISTIC_VALUE:
                     continue
                 check_duplicates.add(key)
 
-                characteristics.append(Characteristic(
-                    source_code=source_code,
-                    characteristic=key,
-                    value=value
-                ))
+                characteristics.append((key, value))
         except Exception as e:
-            self.logger.error(f"Error while parsing characteristic! source code:{source_code}, error: {e}")
-            return None
+            warnings.append(f"Error while parsing characteristic! source code:{source_code}, error: {e}")
 
-    async def get_images(self, source_code: str, soup: BeautifulSoup, pictures: list, source_folder: str) -> None:
+        return characteristics
+
+    @staticmethod
+    def get_images(source_code: str, soup: BeautifulSoup, warnings: list) -> list:
         try:
             cards = soup.select("div.card-images--page a[data-fancybox='gallery']")
             if not cards:
-                self.logger.warning(f'Failed to extract cards in method get_images! source code: {source_code}')
-                return None
+                warnings.append(f'Failed to extract cards in method get_images! source code: {source_code}')
+                return []
 
+            pictures_info = []
             for card in cards:
                 image_url = card.get('href')
                 if not image_url or not image_url.startswith("http"):
                     continue
 
-                ext = Path(urlparse(image_url).path).suffix or '.jpg'
+                pictures_info.append({
+                    "source_code": source_code,
+                    "image_url": image_url
+                })
 
-                picture = await self.process_file(source_folder=source_folder, source_code=source_code, url=image_url, extension=ext)
+            return pictures_info
+        except Exception as e:
+            warnings.append(f"Error while parsing image! source code:{source_code}, error: {e}")
+            return []
 
-                if picture:
-                    pictures.append(picture)
+    # picture part
+    async def parse_pictures(self, pictures_info: AsyncIterable[dict], source_folder: str) -> None:
+        process_picture = partial(self.process_picture, source_folder=source_folder)
 
-        except Exception as e:
-            self.logger.error(f"Error while parsing image! source code:{source_code}, error: {e}")
-            return None
+        async for picture in self.crawl_pool.imap(process_picture, pictures_info, window=self.BATCH_SIZE_MEDIA, key=lambda pic: pic['image_url']):
+            if picture:
+                await self.db_writer.put(Picture, picture)
+
+        return None
+
+    async def process_picture(self, pic: dict, source_folder: str) -> Optional[PictureRecord]:
+        image_url = pic['image_url']
+        ext = Path(urlparse(image_url).path).suffix or '.jpg'
+
+        return await self.process_file(source_folder=source_folder, source_code=pic['source_code'], url=image_url, extension=ext)
 
     async def find_source_id(self) -> Optional[str]:
         sources = await self.db.select_all(Source)
@@ -320,22 +395,17 @@ class ParserProducts(BaseScraperSync):
                 return str(source.id)
         return None
 
-    async def process_file(self, source_folder: str, source_code: str, url: str, extension: str) -> Optional[Picture]:
+    async def process_file(self, source_folder: str, source_code: str, url: str, extension: str) -> Optional[PictureRecord]:
         try:
-            async with self.request_dispatcher.get(url=url, raise_on_status=False) as response:
-                if response.status != 200:
-                    return None
-                content = await response.read()
-
-            # build the path and download the file
-            path = await self.download_file(source_folder=source_folder, source_code=source_code, extension=extension,
-                                            content=content)
+            # build the path and stream the file to disk, 304 reuses the path of the previous run
+            save = partial(self.download_file, source_folder=source_folder, source_code=source_code, extension=extension)
+            path = await self.request_dispatcher.download(url=url, save=save, reuse=self.file.exists)
 
             if not path or path in self.unique_urls:
                 return None
 
             self.unique_urls.add(path)
-            return Picture(
+            return PictureRecord(
                 source_code=source_code,
                 image_url=url,
                 path=path
@@ -344,14 +414,12 @@ class ParserProducts(BaseScraperSync):
             self.logger.exception(f"Failed to process file {url}: {e}")
             return None
 
-    async def download_file(self, source_folder: str, source_code: str, extension: str, content: [str | bytes]) -> Optional[str]:
+    async def download_file(self, source_folder: str, source_code: str, extension: str, response: ClientResponse) -> Optional[str]:
         folder = await self.__generate_uuid(source_code)
-        filename = await self.__generate_uuid(str(content))
-        path = await self.file.write_file(
-            filename=str(f"{filename}{extension}"),
+        path = await self.file.save(
+            response=response,
             path=f"{source_folder}/{folder}",
-            content=content,
-            return_type='r'
+            extension=extension
         )
         return path
 
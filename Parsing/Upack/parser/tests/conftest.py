@@ -0,0 +1,79 @@
+import logging
+import os
+import sys
+
+import pytest
+
+# the parser runs from its own folder (python main.py), tests import its packages the same way
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CONNECTION = dict(host='localhost', port=5432, username='parser', password='parser', database='parsing')
+
+
+class FakeTransaction:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class FakeConnection:
+    """Records what a loader sends; fetch / fetchval / cursor answer from `rows`."""
+
+    def __init__(self):
+        self.copied: list = []
+        self.executed: list = []
+        self.rows: list = []
+
+    def transaction(self) -> FakeTransaction:
+        return FakeTransaction()
+
+    async def copy_records_to_table(self, table_name, records, columns, schema_name=None):
+        self.copied.append((table_name, list(records), tuple(columns)))
+
+    async def execute(self, query, *args):
+        self.executed.append((query, args))
+        return 'INSERT 0 0'
+
+    async def executemany(self, query, args):
+        self.executed.extend((query, tuple(arguments)) for arguments in args)
+
+    async def fetch(self, query, *args):
+        return self.rows
+
+    async def fetchval(self, query, *args):
+        return None
+
+    async def cursor(self, query, prefetch=None):
+        for row in self.rows:
+            yield row
+
+
+class FakeAcquire:
+    def __init__(self, connection: FakeConnection):
+        self.connection = connection
+
+    async def __aenter__(self):
+        return self.connection
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class FakePool:
+    def __init__(self):
+        self.connection = FakeConnection()
+
+    def acquire(self) -> FakeAcquire:
+        return FakeAcquire(self.connection)
+
+
+@pytest.fixture
+def logger() -> logging.Logger:
+    return logging.getLogger('tests')
+
+
+@pytest.fixture
+def pool() -> FakePool:
+    return FakePool()
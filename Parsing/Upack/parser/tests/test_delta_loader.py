@@ -0,0 +1,118 @@
+import asyncio
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from conftest import CONNECTION
+from models import PriceHistory, PriceHistoryRecord, Product, ProductRecord
+from utils import DbWriter, DeltaLoader
+
+
+def product(per_price: float) -> ProductRecord:
+    return ProductRecord('A-1', 'Box 40x30', 7, 'https://upack.kz/product/a-1', per_price, 10, 100, 1, per_price * 10)
+
+
+def delta_loader(logger, pool, stored=()) -> DeltaLoader:
+    loader = DeltaLoader(models=(Product,), logger=logger, **CONNECTION)
+    loader.pool = pool
+    pool.connection.rows = list(stored)
+    return loader
+
+
+def open_loader(loader: DeltaLoader) -> None:
+    # open() without create_pool: the fake pool is in place already
+    async def run():
+        for model in loader.models:
+            loader.fingerprints[model] = await loader.load_fingerprints(model)
+            loader.skipped[model] = 0
+    asyncio.run(run())
+
+
+def test_key_is_the_unique_constraint():
+    assert DeltaLoader.key(Product) == ('source_code',)
+
+
+def test_fingerprint_ignores_numeric_representation():
+    assert DeltaLoader.fingerprint(('A-1', Decimal('12.50'))) == DeltaLoader.fingerprint(('A-1', 12.5))
+    assert DeltaLoader.fingerprint(('A-1', 12.5)) != DeltaLoader.fingerprint(('A-1', 12.51))
+
+
+def test_unchanged_rows_are_not_sent(logger, pool):
+    loader = delta_loader(logger, pool, stored=[tuple(product(12.5))])
+    open_loader(loader)
+
+    written = asyncio.run(loader.copy_records(Product, [product(12.5)]))
+
+    assert written == 0
+    assert loader.skipped[Product] == 1
+    assert pool.connection.copied == []
+
+
+def test_changed_rows_are_upserted_once_per_key(logger, pool):
+    loader = delta_loader(logger, pool, stored=[tuple(product(12.5))])
+    open_loader(loader)
+
+    written = asyncio.run(loader.copy_records(Product, [product(13.0), product(14.0)]))
+
+    assert written == 1
+    (staging, records, columns), = pool.connection.copied
+    assert staging == 'delta_upack_products'
+    assert records == [product(14.0)]
+    assert 'ON CONFLICT (source_code)' in pool.connection.executed[-1][0]
+
+
+def test_price_history_is_copied_in_delta_mode(logger, pool):
+    # the history table is not a delta model: no key, autoincrement id, written by the same DbWriter
+    loader = delta_loader(logger, pool)
+    open_loader(loader)
+    record = PriceHistoryRecord('A-1', None, 12.5, 125.0, datetime(2026, 10, 1, 3, 0))
+
+    async def run():
+        writer = DbWriter(loader=loader, logger=logger)
+        await writer.put(PriceHistory, record)
+        await writer.close()
+    asyncio.run(run())
+
+    assert pool.connection.copied == [('upack_price_history', [record], PriceHistoryRecord._fields)]
+
+
+def test_price_history_is_rewound_in_delta_mode(logger, pool):
+    loader = delta_loader(logger, pool)
+
+    asyncio.run(loader.rewind(PriceHistory, 'source_code', ['A-1']))
+    dropped = asyncio.run(loader.rewind(Product, 'source_code', ['A-1']))
+
+    assert dropped == 0
+    (query, args), = pool.connection.executed
+    assert query.startswith('DELETE FROM marketplaces.upack_price_history')
+    assert args == (['A-1'],)
+
+
+def test_ensure_key_builds_the_missing_index(logger, pool):
+    loader = delta_loader(logger, pool)
+
+    asyncio.run(loader.ensure_key(Product))
+
+    query, _ = pool.connection.executed[-1]
+    assert query.startswith('CREATE UNIQUE INDEX CONCURRENTLY')
+
+
+def test_ensure_key_skips_a_valid_index(logger, pool):
+    loader = delta_loader(logger, pool)
+
+    async def valid(query, *args):
+        return True
+    pool.connection.fetchval = valid
+    asyncio.run(loader.ensure_key(Product))
+
+    assert pool.connection.executed == []
+
+
+def test_ensure_key_refuses_duplicate_keys(logger, pool):
+    key = DeltaLoader.key(Product)
+    loader = delta_loader(logger, pool, stored=[dict({column: 'A-1' for column in key}, copies=2)])
+
+    with pytest.raises(ValueError, match='duplicate'):
+        asyncio.run(loader.ensure_key(Product))
+    assert pool.connection.executed == []
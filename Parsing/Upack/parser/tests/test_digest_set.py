@@ -0,0 +1,33 @@
+from utils import DigestSet
+
+
+def test_add_reports_new_keys_only():
+    seen = DigestSet()
+
+    assert seen.add('https://upack.kz/p/1')
+    assert not seen.add('https://upack.kz/p/1')
+    assert seen.add(42)
+    assert len(seen) == 2
+
+
+def test_membership_survives_growing():
+    keys = [f'/var/files/pictures/{index}.jpg' for index in range(5000)]
+    seen = DigestSet(keys, capacity=8)
+
+    assert len(seen) == 5000
+    assert all(key in seen for key in keys)
+    assert not any(f'/var/files/pictures/{index}.jpg' in seen for index in range(5000, 6000))
+    # the load factor stays under MAX_LOAD as the table doubles
+    assert len(seen) <= len(seen.table) * DigestSet.MAX_LOAD
+
+
+def test_ints_and_their_strings_are_the_same_key():
+    # keys are digested through str(), a source_id and its text form count once
+    seen = DigestSet([1001])
+
+    assert '1001' in seen
+    assert not seen.add('1001')
+
+
+def test_digest_never_marks_an_empty_slot():
+    assert all(DigestSet.digest(key) != 0 for key in range(10000))
@@ -0,0 +1,98 @@
+from itertools import islice
+from typing import Iterable, Optional, Sequence
+
+import asyncpg
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+
+class BulkLoader:
+    """
+    COPY ... FROM STDIN writer for the marketplace tables (asyncpg copy_records_to_table).
+    Rows are plain tuples / NamedTuple records in columns(model) order; autoincrement primary keys
+    are left to the database.
+    """
+    REWIND_BATCH = 10000
+
+    def __init__(self, host: str, port: int, username: str, password: str, database: str, pool_size: int = 4, create_models: Iterable = (), add_columns: Iterable = ()):
+        self.connection_params: dict = dict(host=host, port=port, user=username, password=password, database=database)
+        self.pool_size: int = pool_size
+        # tables added by the parser itself, created in open() when missing
+        self.create_models: tuple = tuple(create_models)
+        # (model, column) added by the parser to an existing table, added in open() when missing
+        self.add_columns: tuple = tuple(add_columns)
+        self.pool: Optional[asyncpg.Pool] = None
+        self._columns: dict = {}
+
+    async def open(self) -> None:
+        self.pool = await asyncpg.create_pool(min_size=1, max_size=self.pool_size, **self.connection_params)
+        for model in self.create_models:
+            await self.create_table(model)
+        for model, column in self.add_columns:
+            await self.add_column(model, column)
+
+    async def create_table(self, model) -> None:
+        table = model.__table__
+        dialect = postgresql.dialect()
+        async with self.pool.acquire() as connection:
+            await connection.execute(str(CreateTable(table, if_not_exists=True).compile(dialect=dialect)))
+            for index in table.indexes:
+                await connection.execute(str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect)))
+
+    async def add_column(self, model, column: str) -> None:
+        # nullable and without a default: a catalog change only, the table is not rewritten
+        table = model.__table__
+        column_type = table.columns[column].type.compile(dialect=postgresql.dialect())
+        async with self.pool.acquire() as connection:
+            await connection.execute(f'ALTER TABLE {table.schema}.{table.name} ADD COLUMN IF NOT EXISTS {column} {column_type}')
+
+    async def close(self) -> None:
+        if self.pool is not None:
+            await self.pool.close()
+
+    async def finish(self) -> None:
+        """Called once every row is written; rows already are in the live tables here."""
+        return None
+
+    async def rewind(self, model, column: str, drop: Iterable[str]) -> int:
+        """
+        Deletes the rows whose `column` is in `drop`, used by --resume to drop what the interrupted run wrote
+        after its last checkpoint. Only these keys are touched, rows of earlier runs stay; with a staging
+        loader table_name() points at the staging copy of the run.
+        """
+        table = model.__table__
+        deleted = 0
+        drop = iter(drop)
+        async with self.pool.acquire() as connection:
+            while batch := list(islice(drop, self.REWIND_BATCH)):
+                status = await connection.execute(f'DELETE FROM {table.schema}.{self.table_name(model)} WHERE {column} = ANY($1::text[])', batch)
+                deleted += int(status.split()[-1])
+        return deleted
+
+    def table_name(self, model) -> str:
+        return model.__table__.name
+
+    def columns(self, model) -> tuple:
+        if model not in self._columns:
+            self._columns[model] = tuple(
+                column.name for column in model.__table__.columns
+                if not (column.primary_key and column.autoincrement is True)
+            )
+        return self._columns[model]
+
+    def check_fields(self, model, record: tuple) -> tuple:
+        columns = self.columns(model)
+        fields = getattr(record, '_fields', None)
+        if fields is not None and fields != columns:
+            raise ValueError(f"{type(record).__name__} fields {fields} don't match {model.__tablename__} columns {columns}")
+        return columns
+
+    async def copy_records(self, model, records: Sequence[tuple]) -> int:
+        if not records:
+            return 0
+
+        columns = self.check_fields(model, records[0])
+        table = model.__table__
+        async with self.pool.acquire() as connection:
+            await connection.copy_records_to_table(self.table_name(model), records=records, columns=columns, schema_name=table.schema)
+        return len(records)
@@ -0,0 +1,68 @@
+import hashlib
+import math
+from array import array
+from typing import Iterable, Union
+
+
+class DigestSet:
+    """
+    Run-long dedup set of urls / paths / ids. Keys are stored as 8-byte blake2b digests in an
+    open-addressing array('Q') table: 13-27 bytes per entry instead of the key string plus a set slot.
+    Two keys with the same 64-bit digest count as one, about 1 in 10^7 at a million keys.
+    """
+    MAX_LOAD = 0.6
+
+    def __init__(self, keys: Iterable = (), capacity: int = 1024):
+        size = 1 << max(3, math.ceil(math.log2(capacity / self.MAX_LOAD)))
+        # 0 marks an empty slot, digest() never returns it
+        self.table: array = array('Q', bytes(8 * size))
+        self.shift: int = 64 - size.bit_length() + 1
+        self.count: int = 0
+        self.update(keys)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, key: Union[str, int]) -> bool:
+        digest = self.digest(key)
+        return self.table[self.__slot(digest)] == digest
+
+    def add(self, key: Union[str, int]) -> bool:
+        """Adds the key, False when it was there already."""
+        digest = self.digest(key)
+        slot = self.__slot(digest)
+        if self.table[slot] == digest:
+            return False
+
+        self.table[slot] = digest
+        self.count += 1
+        if self.count > len(self.table) * self.MAX_LOAD:
+            self.__grow()
+        return True
+
+    def update(self, keys: Iterable) -> None:
+        for key in keys:
+            self.add(key)
+
+    @staticmethod
+    def digest(key: Union[str, int]) -> int:
+        digest = int.from_bytes(hashlib.blake2b(str(key).encode('utf-8'), digest_size=8).digest(), 'little')
+        return digest or 1
+
+    def __slot(self, digest: int) -> int:
+        # linear probing from the top bits: the slot holding the digest, or the empty slot it would go to.
+        # With the top bits a grown table is refilled in slot order, the low bits would pile up into runs
+        table = self.table
+        mask = len(table) - 1
+        slot = digest >> self.shift
+        while table[slot] and table[slot] != digest:
+            slot = (slot + 1) & mask
+        return slot
+
+    def __grow(self) -> None:
+        old = self.table
+        self.table = array('Q', bytes(16 * len(old)))
+        self.shift -= 1
+        for digest in old:
+            if digest:
+                self.table[self.__slot(digest)] = digest
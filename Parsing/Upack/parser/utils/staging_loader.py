@@ -0,0 +1,118 @@
+import re
+import time
+from logging import Logger
+from typing import Iterable
+
+from .bulk_loader import BulkLoader
+
+
+class StagingLoader(BulkLoader):
+    """
+    Staging load mode: the run COPYs into UNLOGGED <table>_staging copies of the live tables, created
+    without indexes or constraints. finish() makes them logged, builds the primary key, unique
+    constraints and indexes of the live table once and swaps the tables in one transaction, so readers
+    see either the previous crawl or the complete new one. A failed run leaves the live tables as is.
+    """
+    SUFFIX = '_staging'
+
+    def __init__(self, models: Iterable, logger: Logger, resume: bool = False, **connection):
+        super().__init__(**connection)
+        self.models: tuple = tuple(models)
+        self.logger: Logger = logger
+        # --resume continues filling the staging tables of the interrupted run
+        self.resume: bool = resume
+        # model -> [(kind, staging name, live name)] of the constraints and indexes built in finish()
+        self.renames: dict = {}
+
+    def staged(self, name: str) -> str:
+        # postgres identifiers are cut at 63 bytes
+        return f'{name[:63 - len(self.SUFFIX)]}{self.SUFFIX}'
+
+    def table_name(self, model) -> str:
+        name = model.__table__.name
+        return self.staged(name) if model in self.models else name
+
+    async def open(self) -> None:
+        await super().open()
+        async with self.pool.acquire() as connection:
+            for model in self.models:
+                live, staging = self.targets(model)
+                # a fresh run throws away the leftovers of a failed one
+                if not self.resume:
+                    await connection.execute(f'DROP TABLE IF EXISTS {staging}')
+                await connection.execute(f'CREATE UNLOGGED TABLE IF NOT EXISTS {staging} (LIKE {live} INCLUDING DEFAULTS)')
+
+    async def finish(self) -> None:
+        for model in self.models:
+            started = time.monotonic()
+            await self.build(model)
+            self.logger.info(f"{self.table_name(model)}: indexes built in {time.monotonic() - started:.1f} s")
+
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                for model in self.models:
+                    await self.swap(connection, model)
+
+            for model in self.models:
+                await connection.execute(f'ANALYZE {self.targets(model)[0]}')
+        self.logger.info(f"Swapped in {', '.join(model.__tablename__ for model in self.models)}")
+
+    def targets(self, model) -> tuple[str, str]:
+        table = model.__table__
+        return f'{table.schema}.{table.name}', f'{table.schema}.{self.table_name(model)}'
+
+    async def build(self, model) -> None:
+        live, staging = self.targets(model)
+        renames = []
+
+        async with self.pool.acquire() as connection:
+            await connection.execute(f'ALTER TABLE {staging} SET LOGGED')
+
+            constraints = await connection.fetch(
+                "SELECT conname, pg_get_constraintdef(oid) AS definition FROM pg_constraint "
+                "WHERE conrelid = $1::regclass AND contype IN ('p', 'u')",
+                live
+            )
+            for constraint in constraints:
+                name = self.staged(constraint['conname'])
+                await connection.execute(f'ALTER TABLE {staging} ADD CONSTRAINT {name} {constraint["definition"]}')
+                renames.append(('constraint', name, constraint['conname']))
+
+            # plain indexes, the ones behind constraints are built above
+            indexes = await connection.fetch(
+                "SELECT class.relname AS name, pg_get_indexdef(index.indexrelid) AS definition "
+                "FROM pg_index index JOIN pg_class class ON class.oid = index.indexrelid "
+                "WHERE index.indrelid = $1::regclass "
+                "AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE pg_constraint.conindid = index.indexrelid)",
+                live
+            )
+            for index in indexes:
+                name = self.staged(index['name'])
+                definition = re.sub(r' INDEX \S+ ON ', f' INDEX {name} ON ', index['definition'], count=1)
+                definition = re.sub(r' ON \S+ USING ', f' ON {staging} USING ', definition, count=1)
+                await connection.execute(definition)
+                renames.append(('index', name, index['name']))
+
+        self.renames[model] = renames
+
+    async def swap(self, connection, model) -> None:
+        table = model.__table__
+        live, staging = self.targets(model)
+
+        # the serial default of the copy still uses the live sequence, which would go with DROP TABLE
+        sequences = await connection.fetch(
+            "SELECT attname, pg_get_serial_sequence($1, attname) AS sequence FROM pg_attribute "
+            "WHERE attrelid = $1::regclass AND attnum > 0 AND NOT attisdropped AND attidentity = '' "
+            "AND pg_get_serial_sequence($1, attname) IS NOT NULL",
+            live
+        )
+        for sequence in sequences:
+            await connection.execute(f'ALTER SEQUENCE {sequence["sequence"]} OWNED BY {staging}.{sequence["attname"]}')
+
+        await connection.execute(f'DROP TABLE {live}')
+        await connection.execute(f'ALTER TABLE {staging} RENAME TO {table.name}')
+        for kind, name, original in self.renames.get(model, []):
+            if kind == 'constraint':
+                await connection.execute(f'ALTER TABLE {live} RENAME CONSTRAINT {name} TO {original}')
+            else:
+                await connection.execute(f'ALTER INDEX {table.schema}.{name} RENAME TO {original}')
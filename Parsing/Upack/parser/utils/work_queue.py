@@ -0,0 +1,128 @@
+import asyncio
+import json
+import os
+import socket
+from logging import Logger
+from typing import Iterable, Optional
+
+from .bulk_loader import BulkLoader
+
+
+class WorkQueue:
+    """
+    Postgres-backed crawl queue for the distributed mode. The coordinator starts a run, puts the seed
+    urls and seals it; any number of workers claim batches with FOR UPDATE SKIP LOCKED, put the urls
+    they discover back and mark their batch done after its rows are written. A claim older than
+    `lease` seconds is taken over, an url that failed `max_attempts` times is given up. The run is
+    complete when nothing is pending or claimed.
+    """
+
+    def __init__(self, run_model, queue_model, loader: BulkLoader, source: str, logger: Logger, batch_size: int = 50, lease: float = 600.0, poll_interval: float = 5.0, max_attempts: int = 3):
+        self.run_model = run_model
+        self.queue_model = queue_model
+        self.loader: BulkLoader = loader
+        self.source: str = source
+        self.logger: Logger = logger
+        self.batch_size: int = batch_size
+        self.lease: float = float(lease)
+        self.poll_interval: float = float(poll_interval)
+        self.max_attempts: int = max_attempts
+        self.worker: str = f'{socket.gethostname()}-{os.getpid()}'
+        self.runs: str = f'{run_model.__table__.schema}.{run_model.__table__.name}'
+        self.queue: str = f'{queue_model.__table__.schema}.{queue_model.__table__.name}'
+
+    async def open(self) -> None:
+        for model in (self.run_model, self.queue_model):
+            await self.loader.create_table(model)
+
+    # coordinator side
+    async def start_run(self) -> None:
+        async with self.loader.pool.acquire() as connection:
+            async with connection.transaction():
+                await connection.execute(f'DELETE FROM {self.queue} WHERE source = $1', self.source)
+                await connection.execute(
+                    f'INSERT INTO {self.runs} (source, started_at, seeded, state, finished_at) VALUES ($1, now(), false, NULL, NULL) '
+                    f'ON CONFLICT (source) DO UPDATE SET started_at = now(), seeded = false, state = NULL, finished_at = NULL',
+                    self.source
+                )
+
+    async def seal(self, state: dict) -> None:
+        async with self.loader.pool.acquire() as connection:
+            await connection.execute(f'UPDATE {self.runs} SET seeded = true, state = $2::jsonb WHERE source = $1', self.source, json.dumps(state))
+        self.logger.info(f"Run of {self.source} is seeded, workers can start")
+
+    async def wait_drained(self) -> None:
+        while True:
+            remaining = await self.remaining()
+            if not remaining:
+                return None
+            self.logger.info(f"{self.source}: {remaining} urls left in the queue")
+            await asyncio.sleep(self.poll_interval)
+
+    async def finish_run(self) -> None:
+        async with self.loader.pool.acquire() as connection:
+            failed = await connection.fetchval(f"SELECT count(*) FROM {self.queue} WHERE source = $1 AND status <> 'done'", self.source)
+            await connection.execute(f'UPDATE {self.runs} SET finished_at = now() WHERE source = $1', self.source)
+        if failed:
+            self.logger.warning(f"{self.source}: {failed} urls given up after {self.max_attempts} attempts")
+
+    # worker side
+    async def wait_for_run(self) -> dict:
+        """Blocks until the coordinator has sealed a run and returns its state."""
+        while True:
+            async with self.loader.pool.acquire() as connection:
+                state = await connection.fetchval(
+                    f'SELECT state FROM {self.runs} WHERE source = $1 AND seeded AND finished_at IS NULL', self.source
+                )
+            if state is not None:
+                return json.loads(state)
+            await asyncio.sleep(self.poll_interval)
+
+    async def put(self, kind: str, urls: Iterable[str]) -> None:
+        urls = list(urls)
+        if not urls:
+            return None
+
+        # the primary key dedups urls found by several workers
+        async with self.loader.pool.acquire() as connection:
+            await connection.execute(
+                f"INSERT INTO {self.queue} (source, kind, url, status, attempts) "
+                f"SELECT $1, $2, unnest($3::text[]), 'pending', 0 ON CONFLICT DO NOTHING",
+                self.source, kind, urls
+            )
+
+    async def claim(self) -> Optional[list]:
+        """Next batch of (kind, url); [] while other workers may still add urls, None when the run is drained."""
+        async with self.loader.pool.acquire() as connection:
+            rows = await connection.fetch(
+                f"UPDATE {self.queue} SET status = 'claimed', claimed_by = $2, claimed_at = now(), attempts = attempts + 1 "
+                f"WHERE (source, kind, url) IN ("
+                f"SELECT source, kind, url FROM {self.queue} "
+                f"WHERE source = $1 AND attempts < $5 "
+                f"AND (status = 'pending' OR (status = 'claimed' AND claimed_at < now() - make_interval(secs => $3))) "
+                # product pages first, they hold the rows; listings only add more work
+                f"ORDER BY kind = 'listing' LIMIT $4 FOR UPDATE SKIP LOCKED"
+                f") RETURNING kind, url",
+                self.source, self.worker, self.lease, self.batch_size, self.max_attempts
+            )
+        if rows:
+            return [(row['kind'], row['url']) for row in rows]
+        return None if not await self.remaining() else []
+
+    async def complete(self, items: Iterable[tuple[str, str]]) -> None:
+        items = list(items)
+        async with self.loader.pool.acquire() as connection:
+            await connection.execute(
+                f"UPDATE {self.queue} SET status = 'done' "
+                f"WHERE source = $1 AND claimed_by = $2 AND (kind, url) IN (SELECT * FROM unnest($3::text[], $4::text[]))",
+                self.source, self.worker, [kind for kind, _ in items], [url for _, url in items]
+            )
+
+    async def remaining(self) -> int:
+        async with self.loader.pool.acquire() as connection:
+            # a claim on its last attempt counts until its lease runs out
+            return await connection.fetchval(
+                f"SELECT count(*) FROM {self.queue} WHERE source = $1 AND (status = 'pending' OR (status = 'claimed' "
+                f"AND (attempts < $2 OR claimed_at >= now() - make_interval(secs => $3))))",
+                self.source, self.max_attempts, self.lease
+            )